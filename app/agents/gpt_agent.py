@@ -1,4 +1,3 @@
-import json
 import os
 import requests
 from datetime import datetime
@@ -36,26 +35,17 @@ def format_task_details(task: Task) -> str:
             status = f"📅 Due: {task.due_date.strftime('%Y-%m-%d %H:%M')}"
         details.append(status)
     
+    # tags and mini_tasks arrive already decoded
     if task.tags:
-        try:
-            tags_list = json.loads(task.tags)
-            if tags_list:
-                details.append(f"Tags: {', '.join(tags_list)}")
-        except (json.JSONDecodeError, TypeError):
-            pass
+        details.append(f"Tags: {', '.join(task.tags)}")
     
     if task.mini_tasks:
-        try:
-            mini_tasks_dict = json.loads(task.mini_tasks)
-            if mini_tasks_dict:
-                completed_mini = sum(1 for done in mini_tasks_dict.values() if done)
-                total_mini = len(mini_tasks_dict)
-                details.append(f"Sub-tasks: {completed_mini}/{total_mini} completed")
-                for mini_task, is_done in mini_tasks_dict.items():
-                    status_icon = "✅" if is_done else "⏳"
-                    details.append(f"  {status_icon} {mini_task}")
-        except (json.JSONDecodeError, TypeError):
-            pass
+        completed_mini = sum(1 for done in task.mini_tasks.values() if done)
+        total_mini = len(task.mini_tasks)
+        details.append(f"Sub-tasks: {completed_mini}/{total_mini} completed")
+        for mini_task, is_done in task.mini_tasks.items():
+            status_icon = "✅" if is_done else "⏳"
+            details.append(f"  {status_icon} {mini_task}")
     
     details.append(f"Created: {task.created_at.strftime('%Y-%m-%d %H:%M')}")
     
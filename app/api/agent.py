@@ -4,21 +4,31 @@ from datetime import datetime
 from sqlmodel import Session
 import logging
 import time
-from ..db.session import get_session
+from ..db.session import get_read_session, use_primary_after_write
 from ..services.task_service import TaskService
 from ..models.user_model import User
-from ..api.dependencies import get_current_user
+from ..api.dependencies import get_current_user, token_cache
 from ..agents.gpt_agent import get_project_summary_cached, get_task_recommendations_cached
 from ..cache.redis_cache import cache
+from ..cache.user_cache import user_cache
+from ..api.rate_limit import rate_limit_by_user, limit_agent_concurrency
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/agent", tags=["AI Agent"])
 
-# Dependency injection function
-def get_task_service(session: Session = Depends(get_session)) -> TaskService:
+# LLM calls are the expensive part of the agent; every AI endpoint shares one
+# rate limit per user and a cap on concurrent calls
+ai_limits = [Depends(rate_limit_by_user("agent", "rate_limit_agent")), Depends(limit_agent_concurrency)]
+
+# Dependency injection function; the agent only reads, so it uses replicas
+def get_task_service(
+    session: Session = Depends(get_read_session),
+    current_user: User = Depends(get_current_user)
+) -> TaskService:
+    use_primary_after_write(session, current_user.id)
     return TaskService(session)
 
-@router.get("/summary", response_model=Dict[str, Any])
+@router.get("/summary", response_model=Dict[str, Any], dependencies=ai_limits)
 async def get_project_summary_endpoint(
     task_service: TaskService = Depends(get_task_service),
     current_user: User = Depends(get_current_user)
@@ -34,41 +44,35 @@ async def get_project_summary_endpoint(
     logger.info(f"AI Summary requested for user '{current_user.username}'")
     try:
         start_time = time.time()
-        # Get all tasks for the current user
-        tasks = task_service.get_all_tasks(current_user.id)
-        logger.info(f"Retrieved {len(tasks)} tasks for summary for user '{current_user.username}'")
-        
-        if not tasks:
+        # Counts come from the user's counters row; tasks are only loaded for the prompt
+        stats = task_service.get_counts(current_user.id)
+        metadata = {
+            "total_tasks": stats.total,
+            "completed_tasks": stats.completed,
+            "pending_tasks": stats.pending,
+            "completion_rate": stats.completion_rate
+        }
+
+        if not stats.total:
             return {
                 "summary": "No tasks found. Start by creating some tasks to get a summary.",
-                "metadata": {
-                    "total_tasks": 0,
-                    "completed_tasks": 0,
-                    "pending_tasks": 0,
-                    "completion_rate": 0
-                },
+                "metadata": metadata,
                 "generated_at": datetime.utcnow().isoformat(),
                 "prompt_type": "project_summary"
             }
 
+        tasks = task_service.get_all_tasks(current_user.id)
+        logger.info(f"Retrieved {len(tasks)} tasks for summary for user '{current_user.username}'")
+
         # Get cached or fresh summary
         summary = await get_project_summary_cached(tasks)
         
-        # Prepare response with metadata
-        completed_tasks = len([t for t in tasks if t.completed])
-        pending_tasks = len(tasks) - completed_tasks
-        
         end_time = time.time()
-        logger.info(f"AI Summary generated for user '{current_user.username}' - {completed_tasks} completed, {pending_tasks} pending. Time taken: {end_time - start_time:.2f} seconds")
+        logger.info(f"AI Summary generated for user '{current_user.username}' - {stats.completed} completed, {stats.pending} pending. Time taken: {end_time - start_time:.2f} seconds")
         
         return {
             "summary": summary,
-            "metadata": {
-                "total_tasks": len(tasks),
-                "completed_tasks": completed_tasks,
-                "pending_tasks": pending_tasks,
-                "completion_rate": round(completed_tasks / len(tasks) * 100, 1) if tasks else 0
-            },
+            "metadata": metadata,
             "generated_at": datetime.utcnow().isoformat(),
             "prompt_type": "project_summary"
         }
@@ -80,7 +84,7 @@ async def get_project_summary_endpoint(
             detail=f"Failed to generate project summary: {str(e)}"
         )
 
-@router.get("/recommendations", response_model=Dict[str, Any])
+@router.get("/recommendations", response_model=Dict[str, Any], dependencies=ai_limits)
 async def get_task_recommendations_endpoint(
     task_service: TaskService = Depends(get_task_service),
     current_user: User = Depends(get_current_user)
@@ -97,42 +101,34 @@ async def get_task_recommendations_endpoint(
     logger.info(f"AI Recommendations requested for user '{current_user.username}'")
     try:
         start_time = time.time()
-        # Get all tasks for the current user
-        tasks = task_service.get_all_tasks(current_user.id)
-        logger.info(f"Retrieved {len(tasks)} tasks for recommendations for user '{current_user.username}'")
+        # Counts come from one aggregate query; tasks are only loaded for the prompt
+        stats = task_service.get_stats(current_user.id)
+        metadata = {
+            "pending_tasks": stats.pending,
+            "high_priority_tasks": stats.high_priority_pending,
+            "overdue_tasks": stats.overdue
+        }
 
-        if not tasks:
+        if not stats.total:
             return {
                 "recommendations": "No tasks found. Add some tasks to get recommendations.",
-                "metadata": {
-                    "pending_tasks": 0,
-                    "high_priority_tasks": 0,
-                    "overdue_tasks": 0
-                },
+                "metadata": metadata,
                 "generated_at": datetime.utcnow().isoformat(),
                 "prompt_type": "task_recommendations"
             }
 
+        tasks = task_service.get_all_tasks(current_user.id)
+        logger.info(f"Retrieved {len(tasks)} tasks for recommendations for user '{current_user.username}'")
+
         # Get cached or fresh recommendations
         recommendations = await get_task_recommendations_cached(tasks)
         
-        # Analyze pending tasks for metadata
-        pending_tasks = [t for t in tasks if not t.completed]
-        high_priority_tasks = len([t for t in pending_tasks if t.priority and t.priority.lower() == "high"])
-        
-        now = datetime.utcnow()
-        overdue_task_count = sum(1 for task in pending_tasks if task.due_date and task.due_date < now)
-        
         end_time = time.time()
-        logger.info(f"AI Recommendations generated for user '{current_user.username}' - {len(pending_tasks)} pending, {high_priority_tasks} high priority, {overdue_task_count} overdue. Time taken: {end_time - start_time:.2f} seconds")
+        logger.info(f"AI Recommendations generated for user '{current_user.username}' - {stats.pending} pending, {stats.high_priority_pending} high priority, {stats.overdue} overdue. Time taken: {end_time - start_time:.2f} seconds")
         
         return {
             "recommendations": recommendations,
-            "metadata": {
-                "pending_tasks": len(pending_tasks),
-                "high_priority_tasks": high_priority_tasks,
-                "overdue_tasks": overdue_task_count
-            },
+            "metadata": metadata,
             "generated_at": datetime.utcnow().isoformat(),
             "prompt_type": "task_recommendations"
         }
@@ -147,7 +143,8 @@ async def get_task_recommendations_endpoint(
 @router.get("/cache/stats")
 async def get_cache_stats():
     """
-    Get Redis cache statistics and health status.
+    Get Redis cache statistics and health status, plus the hit and miss
+    counters of the in-process token and user caches.
     """
     logger.info("Cache stats requested")
     try:
@@ -155,6 +152,7 @@ async def get_cache_stats():
         logger.info(f"Cache stats retrieved - {stats.get('total_keys', 0)} keys, connected: {stats.get('connected', False)}")
         return {
             "cache_stats": stats,
+            "auth_cache_stats": {"tokens": token_cache.stats(), "users": user_cache.stats()},
             "service": "Redis Cache",
             "timestamp": datetime.utcnow().isoformat()
         }
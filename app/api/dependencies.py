@@ -1,13 +1,17 @@
+import hashlib
+import time
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
-from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 from app.core.config import settings
-from app.db.session import get_session
+from app.db.session import get_async_session, use_primary_after_write
 from app.models.user_model import User
 from app.schemas.user_schema import TokenData
-from app.repositories import user_repository
+from app.repositories import async_user_repository
+from app.cache.memory_cache import TTLCache
+from app.cache.user_cache import get_cached_user, cache_user
 import logging
 
 # This dependency will look for a token in the Authorization header
@@ -16,7 +20,41 @@ oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/users/login")
 
 logger = logging.getLogger(__name__)
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_session)) -> User:
+# Verified tokens by digest; each entry lives until its token's exp
+token_cache = TTLCache(maxsize=settings.token_cache_size, ttl=0)
+
+
+def decode_token(token: str) -> TokenData | None:
+    """
+    Verify a JWT and return its claims, or None if it is invalid or incomplete.
+    Verified tokens are cached until they expire, so a token sent with every
+    request of a session is only checked once.
+    """
+    key = hashlib.sha256(token.encode()).digest()
+    if settings.token_cache_enabled:
+        token_data = token_cache.get(key)
+        if token_data is not None:
+            return token_data
+
+    try:
+        payload = jwt.decode(token, settings.jwt_secret_key, algorithms=[settings.jwt_algorithm])
+    except JWTError:
+        logger.error("Token validation failed")
+        return None
+    username: str = payload.get("sub")
+    user_id: int = payload.get("id")
+    if username is None or user_id is None:
+        logger.warning("Token payload missing username or user ID")
+        return None
+    token_data = TokenData(username=username, id=user_id)
+
+    expires_at = payload.get("exp")
+    if settings.token_cache_enabled and expires_at is not None:
+        token_cache.set(key, token_data, ttl=expires_at - time.time())
+    return token_data
+
+
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_session)) -> User:
     """
     Dependency to get the current user from a JWT token.
     Verifies the token, decodes it, and fetches the user from the database.
@@ -27,22 +65,21 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    try:
-        payload = jwt.decode(token, settings.jwt_secret_key, algorithms=[settings.jwt_algorithm])
-        username: str = payload.get("sub")
-        user_id: int = payload.get("id")
-        if username is None or user_id is None:
-            logger.warning("Token payload missing username or user ID")
-            raise credentials_exception
-        token_data = TokenData(username=username, id=user_id)
-    except JWTError:
-        logger.error("Token validation failed")
+    token_data = decode_token(token)
+    if token_data is None:
         raise credentials_exception
-    
-    user = user_repository.get_user_by_id(session=db, user_id=token_data.id)
+
+    user = get_cached_user(token_data.id)
     if user is None:
-        logger.warning(f"User not found for ID: {token_data.id}")
-        raise credentials_exception
-    
-    logger.info(f"Current user retrieved: {user.username} (ID: {user.id})")
+        user = await async_user_repository.get_user_by_id(session=db, user_id=token_data.id)
+        if user is None:
+            logger.warning(f"User not found for ID: {token_data.id}")
+            raise credentials_exception
+        # Detach the user so a rollback of the request's writes cannot expire it;
+        # reloading an expired attribute is not possible outside the async session
+        db.expunge(user)
+        cache_user(user)
+    use_primary_after_write(db, user.id)
+
+    logger.debug(f"Current user retrieved: {user.username} (ID: {user.id})")
     return user
@@ -0,0 +1,121 @@
+import hashlib
+import json
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Optional
+from fastapi import Depends, Header, HTTPException, Request, Response, status
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import event
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.core.config import settings
+from app.db.session import get_async_session
+from app.models.user_model import User
+from app.repositories import idempotency_repository
+from app.api.dependencies import get_current_user
+
+logger = logging.getLogger(__name__)
+
+
+class Idempotency:
+    """
+    Idempotency-Key handling for one write request. Handlers return replay()
+    when it is not None, and call complete() with their result; a request
+    that never completes (e.g. it failed) releases its key for a retry.
+    Without the header every method is a no-op.
+    """
+
+    def __init__(self, session: AsyncSession, user_id: int, key: Optional[str], fingerprint: str):
+        self.session = session
+        self.user_id = user_id
+        self.key = key
+        self.fingerprint = fingerprint
+        self.reserved = False
+        self.completed = False
+
+    async def replay(self) -> Optional[Response]:
+        """Reserve the key, or return the stored response of an earlier request with it."""
+        if self.key is None:
+            return None
+        expires_at = datetime.utcnow() + timedelta(seconds=settings.idempotency_ttl_seconds)
+        if await idempotency_repository.reserve_key(self.session, self.user_id, self.key, self.fingerprint, expires_at):
+            self._reserve()
+            return None
+
+        record = await idempotency_repository.get_record(self.session, self.user_id, self.key)
+        if record is None:
+            # Expired and purged between the two statements; run as a new request
+            return await self.replay()
+        if record.fingerprint != self.fingerprint:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail="Idempotency-Key was already used for a different request"
+            )
+        if record.status_code is None and record.committed:
+            # The write went through but its response was lost; running it again would repeat it
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="The request with this Idempotency-Key was applied, but its response is not available"
+            )
+        if record.status_code is None:
+            # Still running, or abandoned by a request that crashed mid-way
+            stale_before = datetime.utcnow() - timedelta(seconds=settings.idempotency_lock_seconds)
+            if await idempotency_repository.take_over_key(self.session, self.user_id, self.key, stale_before):
+                self._reserve()
+                return None
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="A request with this Idempotency-Key is still in progress",
+                headers={"Retry-After": "1"}
+            )
+
+        logger.info(f"Replaying response for Idempotency-Key '{self.key}' of user {self.user_id}")
+        return Response(
+            content=record.response_body,
+            status_code=record.status_code,
+            media_type="application/json",
+            headers={"Idempotent-Replayed": "true"}
+        )
+
+    def _reserve(self) -> None:
+        self.reserved = True
+        # Flag the key in the same transaction as the handler's write
+        event.listen(self.session.sync_session, "before_commit", self._mark_committed)
+
+    def _mark_committed(self, session) -> None:
+        if session.info.get("wrote") and not self.completed:
+            idempotency_repository.mark_committed(session, self.user_id, self.key)
+
+    async def complete(self, result: Any, status_code: int = status.HTTP_200_OK) -> None:
+        """Store the response of the request for replay."""
+        if not self.reserved:
+            return
+        body = json.dumps(jsonable_encoder(result), separators=(",", ":"))
+        self.completed = True
+        await idempotency_repository.complete_key(self.session, self.user_id, self.key, status_code, body)
+
+    async def release(self) -> None:
+        if not self.reserved:
+            return
+        event.remove(self.session.sync_session, "before_commit", self._mark_committed)
+        if not self.completed:
+            await idempotency_repository.release_key(self.session, self.user_id, self.key)
+        self.reserved = False
+
+
+async def get_idempotency(
+    request: Request,
+    idempotency_key: Optional[str] = Header(None, max_length=255),
+    session: AsyncSession = Depends(get_async_session),
+    current_user: User = Depends(get_current_user)
+):
+    """Dependency for write handlers that accept an Idempotency-Key header."""
+    body = await request.body()
+    fingerprint = hashlib.sha256(
+        request.method.encode() + b" " + request.url.path.encode() + b"\n" + body
+    ).hexdigest()
+    idempotency = Idempotency(session, current_user.id, idempotency_key, fingerprint)
+    try:
+        yield idempotency
+    finally:
+        await idempotency.release()
@@ -0,0 +1,204 @@
+import ipaddress
+import logging
+import math
+import threading
+import time
+from collections import defaultdict
+from functools import lru_cache
+from typing import Callable
+from fastapi import Depends, HTTPException, Request, status
+
+from app.cache.memory_cache import TTLCache
+from app.cache.redis_cache import cache
+from app.core.config import settings
+from app.models.user_model import User
+from app.api.dependencies import get_current_user
+
+logger = logging.getLogger(__name__)
+
+PERIODS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+
+
+def parse_rate(rate: str) -> tuple[int, float] | None:
+    """Parse a limit like "10/minute" into (burst, tokens per second); an empty string means no limit."""
+    if not rate:
+        return None
+    count, _, period = rate.partition("/")
+    if period not in PERIODS or int(count) <= 0:
+        raise ValueError(f"Invalid rate limit: {rate!r}")
+    return int(count), int(count) / PERIODS[period]
+
+
+class MemoryTokenBuckets:
+    """
+    Token buckets kept in this process. A bucket is dropped once it would be
+    full again, since a missing bucket counts as full.
+    """
+
+    def __init__(self, maxsize: int = 100000):
+        self._buckets = TTLCache(maxsize=maxsize, ttl=0)
+        self._lock = threading.Lock()
+
+    def take(self, key: str, capacity: int, rate: float) -> float:
+        """Take one token; returns 0 if allowed, else the seconds until a token is available."""
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated_at = self._buckets.get(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated_at) * rate)
+            if tokens < 1:
+                return (1 - tokens) / rate
+            self._buckets.set(key, (tokens - 1, now), ttl=(capacity - tokens + 1) / rate)
+            return 0
+
+    def clear(self) -> None:
+        self._buckets.clear()
+
+
+# Refill and take atomically, so every app instance shares one bucket per key
+TAKE_TOKEN_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated_at')
+local tokens = tonumber(bucket[1]) or capacity
+local updated_at = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - updated_at) * rate)
+if tokens < 1 then
+    return tostring((1 - tokens) / rate)
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens - 1), 'updated_at', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+return '0'
+"""
+
+
+class RedisTokenBuckets:
+    """Token buckets in Redis, shared by every app instance; falls back to memory when Redis is down."""
+
+    def __init__(self, fallback: MemoryTokenBuckets):
+        self.fallback = fallback
+        self._script = None
+
+    def take(self, key: str, capacity: int, rate: float) -> float:
+        if not cache.redis_client:
+            return self.fallback.take(key, capacity, rate)
+        try:
+            if self._script is None:
+                self._script = cache.redis_client.register_script(TAKE_TOKEN_SCRIPT)
+            return float(self._script(keys=[f"rate_limit:{key}"], args=[capacity, rate, time.time()]))
+        except Exception as e:
+            logger.warning(f"Redis rate limit failed, using in-memory buckets: {e}")
+            return self.fallback.take(key, capacity, rate)
+
+
+memory_buckets = MemoryTokenBuckets()
+redis_buckets = RedisTokenBuckets(memory_buckets)
+
+
+@lru_cache(maxsize=8)
+def _trusted_networks(proxies: tuple[str, ...]) -> list:
+    return [ipaddress.ip_network(proxy, strict=False) for proxy in proxies]
+
+
+def _is_trusted_proxy(address: str) -> bool:
+    try:
+        ip = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(ip in network for network in _trusted_networks(tuple(settings.trusted_proxies)))
+
+
+def client_ip(request: Request) -> str:
+    """
+    The client's IP address. A request from a trusted proxy is attributed to
+    the nearest address in X-Forwarded-For that is not a trusted proxy itself;
+    addresses further left could be forged by the client.
+    """
+    address = request.client.host if request.client else "unknown"
+    if not _is_trusted_proxy(address):
+        return address
+    forwarded = [hop.strip() for hop in request.headers.get("x-forwarded-for", "").split(",") if hop.strip()]
+    for hop in reversed(forwarded):
+        address = hop
+        if not _is_trusted_proxy(hop):
+            break
+    return address
+
+
+def _check_rate(scope: str, rate_setting: str, client_key: str) -> None:
+    limit = parse_rate(getattr(settings, rate_setting))
+    if limit is None or not settings.rate_limit_enabled:
+        return
+    buckets = redis_buckets if settings.rate_limit_backend == "redis" else memory_buckets
+    wait = buckets.take(f"{scope}:{client_key}", *limit)
+    if wait > 0:
+        logger.warning(f"Rate limit exceeded for {scope} by {client_key}")
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many requests, please retry later",
+            headers={"Retry-After": str(math.ceil(wait))},
+        )
+
+
+def rate_limit_by_ip(scope: str, rate_setting: str) -> Callable:
+    """
+    Dependency limiting requests to a route per client IP, with the rate
+    (e.g. "10/minute") read from the named setting on each request.
+    """
+    def dependency(request: Request) -> None:
+        _check_rate(scope, rate_setting, client_ip(request))
+    return dependency
+
+
+def rate_limit_by_user(scope: str, rate_setting: str) -> Callable:
+    """Dependency limiting requests to a route per authenticated user."""
+    def dependency(current_user: User = Depends(get_current_user)) -> None:
+        _check_rate(scope, rate_setting, f"user-{current_user.id}")
+    return dependency
+
+
+class InFlightLimiter:
+    """Counts each user's running requests in this process."""
+
+    def __init__(self):
+        self._in_flight: dict[int, int] = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def acquire(self, user_id: int, limit: int) -> bool:
+        with self._lock:
+            if self._in_flight[user_id] >= limit:
+                return False
+            self._in_flight[user_id] += 1
+            return True
+
+    def release(self, user_id: int) -> None:
+        with self._lock:
+            self._in_flight[user_id] -= 1
+            if self._in_flight[user_id] <= 0:
+                del self._in_flight[user_id]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._in_flight.clear()
+
+
+agent_in_flight = InFlightLimiter()
+
+
+async def limit_agent_concurrency(current_user: User = Depends(get_current_user)):
+    """Dependency rejecting an agent call while the user already has agent_max_in_flight_per_user running."""
+    limit = settings.agent_max_in_flight_per_user
+    if limit <= 0:
+        yield
+        return
+    if not agent_in_flight.acquire(current_user.id, limit):
+        logger.warning(f"Too many concurrent agent calls for user ID {current_user.id}")
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Another AI request is still running, please retry when it finishes",
+            headers={"Retry-After": "1"},
+        )
+    try:
+        yield
+    finally:
+        agent_in_flight.release(current_user.id)
@@ -1,34 +1,108 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, File, HTTPException, Query, Request, Response, UploadFile, status
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
+from typing import List, Optional
+from datetime import datetime
+import hashlib
+import io
 import logging
 
-from app.db.session import get_session
+from app.core.config import settings
+from app.db.session import get_session, get_read_session, get_async_session, get_async_read_session, use_primary_after_write
 from app.models.user_model import User
-from app.models.request_models import TaskCreateRequest, TaskUpdateRequest, TaskResponse
+from app.models.task_model import Priority
+from app.models.request_models import (
+    TaskCreateRequest, TaskUpdateRequest, TaskResponse, TaskFilters, TaskSort, TagMatch, TagCount,
+    TaskChangesResponse, TaskSearchResult, ArchivedTaskResponse, TaskStats, TaskCounts, MiniTaskPatchRequest, ExportFormat, ImportFormat, TaskImportResponse, BulkTaskCreateRequest, BulkTaskUpdateRequest, BulkTaskDeleteRequest, BulkTaskResponse
+)
 from app.services.task_service import TaskService
+from app.services.async_task_service import AsyncTaskService
+from app.services.task_import_service import TaskImportService
 from app.api.dependencies import get_current_user
+from app.api.idempotency import Idempotency, get_idempotency
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/tasks", tags=["tasks"])
 
 
-# Dependency injection function
-def get_task_service(session: Session = Depends(get_session)) -> TaskService:
+# Dependency injection functions
+def get_task_service(session: AsyncSession = Depends(get_async_session)) -> AsyncTaskService:
+    return AsyncTaskService(session)
+
+
+async def get_read_task_service(
+    session: AsyncSession = Depends(get_async_read_session),
+    current_user: User = Depends(get_current_user)
+) -> AsyncTaskService:
+    # Reads go to a replica unless the user has just written
+    use_primary_after_write(session, current_user.id)
+    return AsyncTaskService(session)
+
+
+def get_sync_task_service(
+    session: Session = Depends(get_read_session),
+    current_user: User = Depends(get_current_user)
+) -> TaskService:
+    # For streaming reads, which iterate query results in a worker thread
+    use_primary_after_write(session, current_user.id)
     return TaskService(session)
 
 
+def task_etag(request: Request, user_id: int, version: int) -> str:
+    """
+    Weak ETag of a task read: the user's data version plus the request path and
+    query, since filters and cursors select different representations.
+    """
+    target = hashlib.sha1(f"{request.url.path}?{request.url.query}".encode()).hexdigest()[:16]
+    return f'W/"{user_id}-{version}-{target}"'
+
+
+def is_not_modified(request: Request, etag: str) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    return any(tag.strip() in (etag, "*") for tag in if_none_match.split(","))
+
+
+def get_task_filters(
+    completed: Optional[bool] = None,
+    priority: Optional[Priority] = None,
+    due_before: Optional[datetime] = None,
+    due_after: Optional[datetime] = None,
+    created_before: Optional[datetime] = None,
+    created_after: Optional[datetime] = None,
+    tag: Optional[List[str]] = Query(None),
+    tag_match: TagMatch = TagMatch.ANY
+) -> TaskFilters:
+    return TaskFilters(
+        completed=completed,
+        priority=priority,
+        due_before=due_before,
+        due_after=due_after,
+        created_before=created_before,
+        created_after=created_after,
+        tags=tag,
+        tag_match=tag_match
+    )
+
+
 @router.post("/", response_model=TaskResponse, status_code=status.HTTP_201_CREATED)
-def create_task(
+async def create_task(
     task_data: TaskCreateRequest, 
-    service: TaskService = Depends(get_task_service),
-    current_user: User = Depends(get_current_user)
+    service: AsyncTaskService = Depends(get_task_service),
+    current_user: User = Depends(get_current_user),
+    idempotency: Idempotency = Depends(get_idempotency)
 ):
     """
     Create a new task for the authenticated user.
     """
     logger.info(f"User '{current_user.username}' creating new task: {task_data.title}")
+    replay = await idempotency.replay()
+    if replay is not None:
+        return replay
     try:
-        task = service.create_task(
+        task = await service.create_task(
             user_id=current_user.id,
             title=task_data.title,
             description=task_data.description,
@@ -38,6 +112,7 @@ def create_task(
             mini_tasks=task_data.mini_tasks
         )
         logger.info(f"Task created successfully with ID: {task.id} for user '{current_user.username}'")
+        await idempotency.complete(task, status.HTTP_201_CREATED)
         return task
     except ValueError as e:
         logger.warning(f"Invalid task data for user '{current_user.username}': {str(e)}")
@@ -47,19 +122,282 @@ def create_task(
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Internal server error")
 
 
+@router.post("/bulk", response_model=BulkTaskResponse)
+async def create_tasks_bulk(
+    request: BulkTaskCreateRequest,
+    service: AsyncTaskService = Depends(get_task_service),
+    current_user: User = Depends(get_current_user),
+    idempotency: Idempotency = Depends(get_idempotency)
+):
+    """
+    Create many tasks in one transaction. Each item is validated on its own;
+    the response reports the outcome of every item by its index.
+    """
+    logger.info(f"User '{current_user.username}' bulk creating {len(request.tasks)} tasks")
+    replay = await idempotency.replay()
+    if replay is not None:
+        return replay
+    try:
+        result = await service.create_tasks(current_user.id, request.tasks)
+        logger.info(f"Bulk create for user '{current_user.username}': {result.succeeded} created, {result.failed} failed")
+        await idempotency.complete(result)
+        return result
+    except ValueError as e:
+        logger.warning(f"Invalid bulk create request from user '{current_user.username}': {str(e)}")
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error bulk creating tasks for user '{current_user.username}': {e}", exc_info=True)
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Internal server error")
+
+
+@router.patch("/bulk", response_model=BulkTaskResponse)
+async def update_tasks_bulk(
+    request: BulkTaskUpdateRequest,
+    service: AsyncTaskService = Depends(get_task_service),
+    current_user: User = Depends(get_current_user),
+    idempotency: Idempotency = Depends(get_idempotency)
+):
+    """
+    Update many tasks in one transaction. Each item carries the task "id" and
+    the fields to change.
+    """
+    logger.info(f"User '{current_user.username}' bulk updating {len(request.tasks)} tasks")
+    replay = await idempotency.replay()
+    if replay is not None:
+        return replay
+    try:
+        result = await service.update_tasks(current_user.id, request.tasks)
+        logger.info(f"Bulk update for user '{current_user.username}': {result.succeeded} updated, {result.failed} failed")
+        await idempotency.complete(result)
+        return result
+    except ValueError as e:
+        logger.warning(f"Invalid bulk update request from user '{current_user.username}': {str(e)}")
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error bulk updating tasks for user '{current_user.username}': {e}", exc_info=True)
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Internal server error")
+
+
+@router.delete("/bulk", response_model=BulkTaskResponse)
+async def delete_tasks_bulk(
+    request: BulkTaskDeleteRequest,
+    service: AsyncTaskService = Depends(get_task_service),
+    current_user: User = Depends(get_current_user),
+    idempotency: Idempotency = Depends(get_idempotency)
+):
+    """
+    Delete many tasks by ID with a single statement.
+    """
+    logger.info(f"User '{current_user.username}' bulk deleting {len(request.ids)} tasks")
+    replay = await idempotency.replay()
+    if replay is not None:
+        return replay
+    try:
+        result = await service.delete_tasks(current_user.id, request.ids)
+        logger.info(f"Bulk delete for user '{current_user.username}': {result.succeeded} deleted, {result.failed} failed")
+        await idempotency.complete(result)
+        return result
+    except ValueError as e:
+        logger.warning(f"Invalid bulk delete request from user '{current_user.username}': {str(e)}")
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error bulk deleting tasks for user '{current_user.username}': {e}", exc_info=True)
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Internal server error")
+
+
+@router.post("/import", response_model=TaskImportResponse)
+def import_tasks(
+    file: UploadFile = File(...),
+    format: ImportFormat = ImportFormat.JSON,
+    session: Session = Depends(get_session),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Import tasks from an uploaded file in the sample_tasks.json format or as
+    NDJSON. The file is parsed incrementally and inserted in chunked
+    transactions; invalid records are skipped and listed in the report.
+    """
+    logger.info(f"User '{current_user.username}' importing tasks from '{file.filename}' as {format.value}")
+    use_primary_after_write(session, current_user.id)
+    try:
+        stream = io.TextIOWrapper(file.file, encoding="utf-8")
+        result = TaskImportService(session).import_tasks(current_user.id, stream, format)
+        logger.info(f"Import for user '{current_user.username}': {result.imported} imported, {result.failed} failed")
+        return result
+    except UnicodeDecodeError as e:
+        logger.warning(f"Undecodable import file from user '{current_user.username}': {str(e)}")
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Import file must be UTF-8 encoded")
+    except Exception as e:
+        logger.error(f"Error importing tasks for user '{current_user.username}': {e}", exc_info=True)
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Internal server error")
+
+
+@router.get("/changes", response_model=TaskChangesResponse)
+async def get_task_changes(
+    since: Optional[str] = None,
+    service: AsyncTaskService = Depends(get_read_task_service),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Delta sync: get the tasks created or modified and the IDs of tasks deleted
+    since `since`, a sync_token from an earlier response. Omit `since` for a
+    full sync. Store the returned sync_token for the next call.
+    """
+    logger.info(f"Fetching task changes since '{since}' for user '{current_user.username}'")
+    try:
+        changes = await service.get_changes(current_user.id, since)
+        logger.info(f"Returning {len(changes.changed)} changed and {len(changes.deleted)} deleted tasks for user '{current_user.username}'")
+        return changes
+    except ValueError as e:
+        logger.warning(f"Invalid sync request from user '{current_user.username}': {str(e)}")
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error fetching task changes for user '{current_user.username}': {e}", exc_info=True)
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Internal server error")
+
+
+@router.get("/export")
+def export_tasks(
+    format: ExportFormat = ExportFormat.NDJSON,
+    service: TaskService = Depends(get_sync_task_service),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Download every task of the authenticated user as NDJSON or CSV. Rows are
+    streamed as they are read, so memory use does not grow with the account.
+    """
+    logger.info(f"User '{current_user.username}' exporting tasks as {format.value}")
+    media_type = "application/x-ndjson" if format == ExportFormat.NDJSON else "text/csv"
+    return StreamingResponse(
+        service.export_tasks(current_user.id, format),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="tasks.{format.value}"'}
+    )
+
+
+@router.get("/tags", response_model=list[TagCount])
+async def get_tag_counts(
+    service: AsyncTaskService = Depends(get_read_task_service),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Get every tag used by the authenticated user with its number of tasks.
+    """
+    logger.info(f"Fetching tag counts for user '{current_user.username}'")
+    try:
+        return await service.get_tag_counts(current_user.id)
+    except Exception as e:
+        logger.error(f"Error fetching tag counts for user '{current_user.username}': {e}", exc_info=True)
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Internal server error")
+
+
+@router.get("/archive", response_model=list[ArchivedTaskResponse])
+async def get_archived_tasks(
+    response: Response,
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = None,
+    service: AsyncTaskService = Depends(get_read_task_service),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Get archived tasks of the authenticated user, newest first. The next
+    page's cursor is returned in the X-Next-Cursor header. Updating an
+    archived task moves it back to the active tasks.
+    """
+    logger.info(f"Fetching archived tasks for user '{current_user.username}'")
+    try:
+        tasks, next_cursor = await service.get_archived_tasks(current_user.id, limit, cursor)
+        if next_cursor:
+            response.headers["X-Next-Cursor"] = next_cursor
+        return tasks
+    except ValueError as e:
+        logger.warning(f"Invalid archive request from user '{current_user.username}': {str(e)}")
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error fetching archived tasks for user '{current_user.username}': {e}", exc_info=True)
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Internal server error")
+
+
+@router.get("/counts", response_model=TaskCounts)
+async def get_task_counts(
+    service: AsyncTaskService = Depends(get_read_task_service),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Get the authenticated user's task counts by status and priority. Served
+    from counters maintained on write, so it is cheap enough to poll.
+    """
+    logger.info(f"Fetching task counts for user '{current_user.username}'")
+    try:
+        return await service.get_counts(current_user.id)
+    except Exception as e:
+        logger.error(f"Error fetching task counts for user '{current_user.username}': {e}", exc_info=True)
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Internal server error")
+
+
+@router.get("/stats", response_model=TaskStats)
+async def get_task_stats(
+    service: AsyncTaskService = Depends(get_read_task_service),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Get dashboard statistics of the authenticated user's tasks.
+    """
+    logger.info(f"Fetching task stats for user '{current_user.username}'")
+    try:
+        return await service.get_stats(current_user.id)
+    except Exception as e:
+        logger.error(f"Error fetching task stats for user '{current_user.username}': {e}", exc_info=True)
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Internal server error")
+
+
+@router.get("/search", response_model=list[TaskSearchResult])
+async def search_tasks(
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    service: AsyncTaskService = Depends(get_read_task_service),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Full-text search over titles, descriptions, sub-tasks and tags of the
+    authenticated user's tasks, best matches first, each with a highlighted snippet.
+    """
+    logger.info(f"User '{current_user.username}' searching tasks")
+    try:
+        return await service.search_tasks(current_user.id, q, limit=limit, offset=offset)
+    except ValueError as e:
+        logger.warning(f"Invalid search from user '{current_user.username}': {str(e)}")
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error searching tasks for user '{current_user.username}': {e}", exc_info=True)
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Internal server error")
+
+
 @router.get("/{task_id}", response_model=TaskResponse)
-def get_task(
+async def get_task(
     task_id: int,
-    service: TaskService = Depends(get_task_service),
+    request: Request,
+    response: Response,
+    service: AsyncTaskService = Depends(get_read_task_service),
     current_user: User = Depends(get_current_user)
 ):
     """
     Get a specific task by ID, only if it belongs to the authenticated user.
+    Returns 304 Not Modified when If-None-Match carries the current ETag.
     """
     logger.info(f"User '{current_user.username}' requesting task with ID: {task_id}")
     try:
-        task = service.get_task_by_id(task_id, current_user.id)
+        etag = task_etag(request, current_user.id, await service.get_data_version(current_user.id))
+        if is_not_modified(request, etag):
+            logger.info(f"Task with ID {task_id} not modified for user '{current_user.username}'")
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+
+        task = await service.get_task_by_id(task_id, current_user.id, as_dict=settings.fast_json_responses)
         logger.info(f"Retrieved task with ID: {task_id} for user '{current_user.username}'")
+        if settings.fast_json_responses:
+            return ORJSONResponse(task, headers={"ETag": etag})
+        response.headers["ETag"] = etag
         return task
     except ValueError:
         logger.warning(f"Task with ID {task_id} not found for user '{current_user.username}'")
@@ -70,36 +408,84 @@ def get_task(
 
     
 @router.get("/", response_model=list[TaskResponse])
-def get_all_tasks(
-    service: TaskService = Depends(get_task_service),
+async def get_all_tasks(
+    request: Request,
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=500),
+    cursor: Optional[str] = None,
+    sort: Optional[TaskSort] = None,
+    filters: TaskFilters = Depends(get_task_filters),
+    service: AsyncTaskService = Depends(get_read_task_service),
     current_user: User = Depends(get_current_user)
 ):
     """
-    Get all tasks for the authenticated user.
+    Get tasks for the authenticated user.
+
+    Tasks can be filtered by completion, priority, due date and creation date
+    ranges and tags (repeat `tag`; `tag_match=all` requires every tag), and
+    ordered with `sort` (prefix with `-` for descending order).
+    Without `limit` every matching task is returned. With `limit`, tasks are
+    paginated by (sort column, id), due date first by default; pass the
+    `X-Next-Cursor` response header back as `cursor` to fetch the next page.
+    The header is absent on the last page.
+
+    Responses carry an ETag; sending it back in If-None-Match returns
+    304 Not Modified until one of the user's tasks changes.
     """
-    logger.info(f"Fetching all tasks for user '{current_user.username}'")
+    logger.info(f"Fetching tasks for user '{current_user.username}' (limit={limit}, sort={sort})")
+    fast = settings.fast_json_responses
     try:
-        tasks = service.get_all_tasks(current_user.id)
+        etag = task_etag(request, current_user.id, await service.get_data_version(current_user.id))
+        if is_not_modified(request, etag):
+            logger.info(f"Task list not modified for user '{current_user.username}'")
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+
+        next_cursor = None
+        if limit is None and cursor is None:
+            tasks = await service.get_all_tasks(current_user.id, filters=filters, sort=sort, as_dicts=fast)
+        else:
+            tasks, next_cursor = await service.get_tasks_page(
+                current_user.id,
+                limit or 100,
+                cursor,
+                filters=filters,
+                sort=sort or TaskSort.DUE_DATE,
+                as_dicts=fast
+            )
+        headers = {"ETag": etag}
+        if next_cursor:
+            headers["X-Next-Cursor"] = next_cursor
         logger.info(f"Retrieved {len(tasks)} tasks for user '{current_user.username}'")
+        if fast:
+            # Plain dicts encoded once by orjson, skipping response_model validation
+            return ORJSONResponse(tasks, headers=headers)
+        response.headers.update(headers)
         return tasks
+    except ValueError as e:
+        logger.warning(f"Invalid task list request from user '{current_user.username}': {str(e)}")
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     except Exception as e:
         logger.error(f"Error fetching all tasks for user '{current_user.username}': {e}", exc_info=True)
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Internal server error")
 
 
 @router.put("/{task_id}", response_model=TaskResponse)
-def update_task(
+async def update_task(
     task_id: int,
     task_data: TaskUpdateRequest,
-    service: TaskService = Depends(get_task_service),
-    current_user: User = Depends(get_current_user)
+    service: AsyncTaskService = Depends(get_task_service),
+    current_user: User = Depends(get_current_user),
+    idempotency: Idempotency = Depends(get_idempotency)
 ):
     """
     Update a task by ID, only if it belongs to the authenticated user.
     """
     logger.info(f"User '{current_user.username}' updating task with ID: {task_id}")
+    replay = await idempotency.replay()
+    if replay is not None:
+        return replay
     try:
-        task = service.update_task(
+        task = await service.update_task(
             task_id=task_id,
             user_id=current_user.id,
             title=task_data.title,
@@ -111,6 +497,7 @@ def update_task(
             mini_tasks=task_data.mini_tasks
         )
         logger.info(f"Task with ID {task_id} updated successfully for user '{current_user.username}'")
+        await idempotency.complete(task)
         return task
     except ValueError as e:
         if "not found" in str(e):
@@ -127,10 +514,38 @@ def update_task(
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Internal server error")
 
 
+@router.patch("/{task_id}/mini-tasks", response_model=TaskResponse)
+async def patch_mini_tasks(
+    task_id: int,
+    request: MiniTaskPatchRequest,
+    service: AsyncTaskService = Depends(get_task_service),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Apply mini-task operations to a task of the authenticated user. Operations
+    run in order and atomically: if one does not apply, none are saved.
+    """
+    logger.info(f"User '{current_user.username}' patching {len(request.operations)} mini-tasks of task {task_id}")
+    try:
+        task = await service.patch_mini_tasks(task_id, current_user.id, request.operations)
+        logger.info(f"Mini-tasks of task {task_id} updated successfully for user '{current_user.username}'")
+        return task
+    except ValueError as e:
+        if "not found" in str(e):
+            logger.warning(f"Task with ID {task_id} not found for user '{current_user.username}': {str(e)}")
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+        else:
+            logger.warning(f"Invalid mini-task patch for task {task_id} from user '{current_user.username}': {str(e)}")
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error patching mini-tasks of task {task_id} for user '{current_user.username}': {e}", exc_info=True)
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Internal server error")
+
+
 @router.delete("/{task_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_task(
+async def delete_task(
     task_id: int,
-    service: TaskService = Depends(get_task_service),
+    service: AsyncTaskService = Depends(get_task_service),
     current_user: User = Depends(get_current_user)
 ):
     """
@@ -138,7 +553,7 @@ def delete_task(
     """
     logger.info(f"User '{current_user.username}' deleting task with ID: {task_id}")
     try:
-        success = service.delete_task(task_id, current_user.id)
+        success = await service.delete_task(task_id, current_user.id)
         if not success:
             logger.warning(f"Task with ID {task_id} not found for deletion by user '{current_user.username}'")
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Task not found")
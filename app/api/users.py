@@ -1,20 +1,24 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
 import logging
 
-from app.db.session import get_session
-from app.schemas.user_schema import UserCreate, UserPublic, Token
+from app.db.session import get_async_session
+from app.schemas.user_schema import UserCreate, UserPublic, Token, RefreshRequest
 from app.services import user_service
+from app.api.rate_limit import rate_limit_by_ip
 
 router = APIRouter(prefix="/users", tags=["users"])
 logger = logging.getLogger(__name__)
 
-@router.post("/register", response_model=UserPublic, status_code=status.HTTP_201_CREATED)
-def register_user(user_in: UserCreate, db: Session = Depends(get_session)):
+@router.post(
+    "/register", response_model=UserPublic, status_code=status.HTTP_201_CREATED,
+    dependencies=[Depends(rate_limit_by_ip("register", "rate_limit_register"))]
+)
+async def register_user(user_in: UserCreate, db: AsyncSession = Depends(get_async_session)):
     """Register a new user."""
     try:
-        new_user = user_service.register_new_user(session=db, user_create=user_in)
+        new_user = await user_service.register_new_user(session=db, user_create=user_in)
         logger.info(f"User registered successfully: {new_user.username} (ID: {new_user.id})")
         return new_user
     except HTTPException as e:
@@ -28,11 +32,11 @@ def register_user(user_in: UserCreate, db: Session = Depends(get_session)):
         )
 
 
-@router.post("/login", response_model=Token)
-def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_session)):
+@router.post("/login", response_model=Token, dependencies=[Depends(rate_limit_by_ip("login", "rate_limit_login"))])
+async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_async_session)):
     """Authenticate user and return a JWT access token."""
     try:
-        token_data =  user_service.login_for_access_token(session=db, form_data=form_data)
+        token_data = await user_service.login_for_access_token(session=db, form_data=form_data)
         logger.info(f"Created access token for user: {form_data.username}")
         return token_data
     except HTTPException as e:
@@ -44,3 +48,34 @@ def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db:
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="An unexpected error occurred during login.",
         )
+
+
+@router.post("/refresh", response_model=Token, dependencies=[Depends(rate_limit_by_ip("refresh", "rate_limit_refresh"))])
+async def refresh_access_token(body: RefreshRequest, db: AsyncSession = Depends(get_async_session)):
+    """
+    Exchange a refresh token for a new access token without a password check.
+    The refresh token is rotated: the response carries its replacement.
+    """
+    try:
+        return await user_service.refresh_access_token(session=db, refresh_token=body.refresh_token)
+    except HTTPException as e:
+        raise e
+    except Exception as e:
+        logger.error(f"An unexpected error occurred during token refresh: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="An unexpected error occurred during token refresh.",
+        )
+
+
+@router.post("/logout", status_code=status.HTTP_204_NO_CONTENT)
+async def logout(body: RefreshRequest, db: AsyncSession = Depends(get_async_session)):
+    """Revoke a refresh token and every token rotated from the same login."""
+    try:
+        await user_service.logout(session=db, refresh_token=body.refresh_token)
+    except Exception as e:
+        logger.error(f"An unexpected error occurred during logout: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="An unexpected error occurred during logout.",
+        )
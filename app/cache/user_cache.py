@@ -0,0 +1,36 @@
+"""
+In-process cache of the users behind authenticated requests, so resolving
+the current user does not query the database on every request.
+
+Entries are copies of the user's columns; each hit builds a new detached User.
+Updates and deletes made through the ORM invalidate the entry; call
+invalidate_user() after changing a user any other way (e.g. a Core UPDATE).
+With several worker processes, a change made by one worker is seen by the
+others after at most user_cache_ttl_seconds.
+"""
+from typing import Optional
+from sqlalchemy import event
+from app.cache.memory_cache import TTLCache
+from app.core.config import settings
+from app.models.user_model import User
+
+user_cache = TTLCache(maxsize=settings.user_cache_size, ttl=settings.user_cache_ttl_seconds)
+
+
+def get_cached_user(user_id: int) -> Optional[User]:
+    fields = user_cache.get(user_id)
+    return User(**fields) if fields is not None else None
+
+
+def cache_user(user: User) -> None:
+    user_cache.set(user.id, {"id": user.id, "username": user.username, "hashed_password": user.hashed_password})
+
+
+def invalidate_user(user_id: int) -> None:
+    user_cache.delete(user_id)
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _invalidate_changed_user(mapper, connection, target: User) -> None:
+    invalidate_user(target.id)
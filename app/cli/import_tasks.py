@@ -0,0 +1,64 @@
+"""
+Import tasks for a user from a JSON file in the sample_tasks.json format or
+from NDJSON, e.g.:
+
+    python -m app.cli.import_tasks --username alice sample_tasks.json
+    python -m app.cli.import_tasks --username alice --format ndjson tasks.ndjson
+"""
+import argparse
+import sys
+from sqlmodel import Session
+
+from app.core.config import settings
+from app.db.session import engine, create_db_and_tables
+from app.models.request_models import ImportFormat
+from app.repositories import user_repository
+from app.services.task_import_service import TaskImportService
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Import tasks for a TaskPilot user")
+    parser.add_argument("file", help="Path to the JSON or NDJSON file")
+    parser.add_argument("--username", required=True, help="Owner of the imported tasks")
+    parser.add_argument(
+        "--format", choices=[f.value for f in ImportFormat],
+        help="File format (default: ndjson for .ndjson/.jsonl files, json otherwise)"
+    )
+    parser.add_argument(
+        "--chunk-size", type=int, default=settings.import_chunk_size,
+        help="Tasks inserted per transaction"
+    )
+    args = parser.parse_args(argv)
+
+    if args.format:
+        import_format = ImportFormat(args.format)
+    elif args.file.endswith((".ndjson", ".jsonl")):
+        import_format = ImportFormat.NDJSON
+    else:
+        import_format = ImportFormat.JSON
+    settings.import_chunk_size = args.chunk_size
+
+    create_db_and_tables()
+    with Session(engine) as session:
+        user = user_repository.get_user_by_username(session, username=args.username)
+        if not user:
+            print(f"User '{args.username}' not found", file=sys.stderr)
+            return 1
+
+        def report(imported: int, failed: int):
+            print(f"\r{imported} imported, {failed} failed", end="", file=sys.stderr, flush=True)
+
+        with open(args.file, encoding="utf-8") as stream:
+            result = TaskImportService(session).import_tasks(user.id, stream, import_format, on_progress=report)
+
+    print(file=sys.stderr)
+    for error in result.errors:
+        print(f"Record {error.record}: {error.error}", file=sys.stderr)
+    if result.failed > len(result.errors):
+        print(f"... and {result.failed - len(result.errors)} more errors", file=sys.stderr)
+    print(f"Imported {result.imported} tasks for '{args.username}', {result.failed} records failed")
+    return 0 if result.failed == 0 else 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,5 +1,5 @@
 from pydantic_settings import BaseSettings
-from typing import Optional
+from typing import List, Optional
 import os
 from pydantic import Field
 
@@ -11,11 +11,43 @@ class Settings(BaseSettings):
     """
     # Database
     database_url: str = "sqlite:///./taskpilot.db"
+    # Used by the async handlers; defaults to database_url with its dialect's
+    # async driver (sqlite+aiosqlite, postgresql+asyncpg)
+    async_database_url: Optional[str] = None
+    # Read replicas (e.g. Litestream restores) used by read-only handlers
+    database_replica_urls: List[str] = []
+    read_your_writes_seconds: float = 5.0  # Reads stay on the primary this long after a user's write
+    # Connection pool (not used for in-memory SQLite)
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
+    db_pool_timeout: int = 30  # Seconds to wait for a free connection
+    db_pool_recycle: int = 1800  # Seconds before a connection is replaced; -1 never
+    db_pool_pre_ping: bool = False
+    db_async_null_pool: bool = False  # Open a connection per async session, for processes with several event loops
+    # SQLite pragmas applied to every new connection; WAL lets readers and a
+    # writer work concurrently
+    sqlite_journal_mode: str = "WAL"
+    sqlite_synchronous: str = "NORMAL"  # Durable in WAL mode except on power loss
+    sqlite_busy_timeout_ms: int = 5000  # Wait for locks instead of failing with "database is locked"
+    sqlite_mmap_size: int = 268435456  # 256 MiB of the database file memory-mapped
+    sqlite_cache_size: int = -65536  # Page cache of each pooled connection; negative values are KiB (64 MiB)
+    sqlite_temp_store: str = "MEMORY"
       # Security
     secret_key: str = "your-secret-key-here"  # fallback value
     jwt_secret_key: str = "your-jwt-secret-key-change-this-in-production"
     jwt_algorithm: str = "HS256"
     jwt_access_token_expire_minutes: int = 30
+    refresh_token_expire_days: int = 30  # Refresh tokens let clients get access tokens without a password
+    refresh_token_purge_interval_seconds: int = 3600  # How often expired refresh tokens are deleted; 0 disables
+    bcrypt_rounds: int = 12  # Cost of new password hashes; older hashes are upgraded on login
+    # Passwords are hashed in a separate process pool so login bursts do not
+    # tie up the threads that serve other requests; 0 workers uses a thread
+    password_hash_workers: int = 2
+    password_hash_queue_depth: int = 32  # Hashes waiting for a worker before requests get a 503
+    token_cache_enabled: bool = True  # Reuse verified JWTs until they expire instead of decoding them per request
+    token_cache_size: int = 10000
+    user_cache_size: int = 10000  # Users kept in the in-process cache of get_current_user; 0 disables
+    user_cache_ttl_seconds: float = 60  # Bounds how stale a cached user can be across processes
       # AI Configuration
     ai_provider: str = "mock"  # openrouter, groq, huggingface, mock
     ai_api_key: Optional[str] = None
@@ -36,6 +68,31 @@ class Settings(BaseSettings):
     
     # API settings
     api_v1_prefix: str = "/api"
+    bulk_max_items: int = 1000  # Maximum number of items in one bulk task request
+    import_chunk_size: int = 1000  # Tasks inserted per transaction by imports
+    import_max_reported_errors: int = 100  # Per-record errors listed in an import report
+    import_max_record_size: int = 1048576  # Characters one JSON import record may span
+    export_batch_size: int = 500  # Rows fetched and written per chunk of a task export
+    archive_after_days: int = 30  # Completed tasks untouched this long move to the archive
+    archive_interval_seconds: int = 3600  # How often the archiver runs; 0 disables
+    archive_batch_size: int = 1000  # Tasks moved per archiver transaction
+    idempotency_ttl_seconds: int = 86400  # How long responses are kept for Idempotency-Key replays
+    idempotency_lock_seconds: int = 60  # After this, an unfinished request's key can be taken over
+    idempotency_purge_interval_seconds: int = 3600  # How often expired keys are deleted; 0 disables
+    stats_reconcile_interval_seconds: int = 3600  # How often task counters are checked for drift; 0 disables
+    # Rate limits as "<count>/<second|minute|hour|day>"; the count is also the
+    # allowed burst. An empty string disables a limit
+    rate_limit_enabled: bool = True
+    rate_limit_backend: str = "memory"  # memory (per process) or redis (shared by all instances)
+    rate_limit_login: str = "10/minute"  # Per client IP
+    # Reverse proxies (IPs or CIDR ranges) whose X-Forwarded-For is trusted for
+    # the client IP; without them every client behind a proxy shares its IP
+    trusted_proxies: List[str] = []
+    rate_limit_register: str = "5/minute"  # Per client IP
+    rate_limit_refresh: str = "30/minute"  # Per client IP
+    rate_limit_agent: str = "10/minute"  # Per user, across the AI endpoints
+    agent_max_in_flight_per_user: int = 1  # Concurrent AI requests per user in one process; 0 disables
+    fast_json_responses: bool = False  # Encode responses with orjson; task reads skip response_model validation
     
     class Config:
         env_file = ".env"
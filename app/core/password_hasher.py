@@ -0,0 +1,71 @@
+import asyncio
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from app.core.config import settings
+from app.core.security import hash_password, verify_and_rehash_password
+
+logger = logging.getLogger(__name__)
+
+
+class PasswordHasherBusy(Exception):
+    """Raised when every hashing worker is busy and the queue is full."""
+
+
+class PasswordHasher:
+    """
+    Runs bcrypt on a dedicated process pool with admission control.
+    At most `workers` hashes run at once and `queue_depth` more may wait;
+    further requests fail fast with PasswordHasherBusy instead of queueing.
+    """
+
+    def __init__(self, workers: int, queue_depth: int):
+        self.workers = workers
+        self.queue_depth = queue_depth
+        self._executor: ProcessPoolExecutor | None = None
+        self._in_flight = 0
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> ProcessPoolExecutor | None:
+        if self.workers > 0 and self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    # The pool starts once the server is running threads, which a
+                    # forked child would inherit mid-flight (e.g. holding a lock)
+                    start_method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.workers, mp_context=multiprocessing.get_context(start_method)
+                    )
+        return self._executor
+
+    async def _run(self, func, *args):
+        with self._lock:
+            if self._in_flight >= max(self.workers, 1) + self.queue_depth:
+                logger.warning(f"Password hashing saturated ({self._in_flight} in flight)")
+                raise PasswordHasherBusy()
+            self._in_flight += 1
+        try:
+            executor = self._get_executor()
+            if executor is None:
+                return await asyncio.to_thread(func, *args)
+            return await asyncio.get_running_loop().run_in_executor(executor, func, *args)
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+
+    async def hash(self, password: str) -> str:
+        return await self._run(hash_password, password, settings.bcrypt_rounds)
+
+    async def verify_and_update(self, password: str, hashed_password: str) -> tuple[bool, str | None]:
+        """Verify a password; also returns a new hash if the stored one uses an outdated cost."""
+        return await self._run(verify_and_rehash_password, password, hashed_password, settings.bcrypt_rounds)
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+password_hasher = PasswordHasher(settings.password_hash_workers, settings.password_hash_queue_depth)
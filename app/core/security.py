@@ -3,15 +3,26 @@ from passlib.context import CryptContext
 from jose import JWTError, jwt
 from app.core.config import settings
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=settings.bcrypt_rounds)
 
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+def hash_password(password: str, rounds: int) -> str:
+    # Runs in the workers of app.core.password_hasher, so the cost is passed
+    # in rather than read from settings in the worker process
+    return pwd_context.handler("bcrypt").using(rounds=rounds).hash(password)
 
 
-def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
+def verify_and_rehash_password(plain_password: str, hashed_password: str, rounds: int) -> tuple[bool, str | None]:
+    """
+    Verify a password and, when its hash was made with another cost, return a
+    new hash at `rounds` to store in its place. Runs in the hashing workers,
+    like hash_password.
+    """
+    if not pwd_context.verify(plain_password, hashed_password):
+        return False, None
+    if pwd_context.handler("bcrypt").from_string(hashed_password).rounds == rounds:
+        return True, None
+    return True, hash_password(plain_password, rounds)
 
 
 def create_access_token(data: dict, expires_delta: timedelta | None = None):
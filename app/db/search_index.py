@@ -0,0 +1,82 @@
+"""
+SQLite FTS5 index over task titles, descriptions, sub-task names and tags.
+
+task_fts holds one row per task (rowid = task.id) and is kept in sync by
+triggers on the task table, so every write path, including bulk Core
+statements, updates it in the same transaction. Each row also carries an
+owner token ("u<user_id>") so a search only walks the caller's postings.
+"""
+from sqlalchemy import event, text
+from app.models.task_model import Task
+
+_SEARCH_COLUMNS = """
+    new.id,
+    new.title,
+    coalesce(new.description, ''),
+    coalesce((SELECT group_concat(key, ' ') FROM json_each(new.mini_tasks)), ''),
+    coalesce((SELECT group_concat(value, ' ') FROM json_each(new.tags)), ''),
+    'u' || new.user_id
+"""
+
+_CREATE_STATEMENTS = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS task_fts USING fts5(
+        title, description, subtasks, tags, owner,
+        tokenize = 'unicode61 remove_diacritics 2',
+        prefix = '2 3'
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS task_fts_insert AFTER INSERT ON task BEGIN
+        INSERT INTO task_fts (rowid, title, description, subtasks, tags, owner)
+        VALUES ({_SEARCH_COLUMNS});
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS task_fts_update
+    AFTER UPDATE OF title, description, mini_tasks, tags ON task BEGIN
+        DELETE FROM task_fts WHERE rowid = old.id;
+        INSERT INTO task_fts (rowid, title, description, subtasks, tags, owner)
+        VALUES ({_SEARCH_COLUMNS});
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS task_fts_delete AFTER DELETE ON task BEGIN
+        DELETE FROM task_fts WHERE rowid = old.id;
+    END
+    """,
+]
+
+_REBUILD_STATEMENT = f"""
+    INSERT INTO task_fts (rowid, title, description, subtasks, tags, owner)
+    SELECT {_SEARCH_COLUMNS.replace("new.", "")} FROM task AS new
+"""
+
+
+def create_search_index(connection) -> bool:
+    """
+    Create the index and its triggers if missing, indexing existing tasks
+    when the index is new. Returns True if the index was created.
+    """
+    if connection.dialect.name != "sqlite":
+        return False
+    exists = connection.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'task_fts'")
+    ).first()
+    for statement in _CREATE_STATEMENTS:
+        connection.execute(text(statement))
+    if exists:
+        return False
+    connection.execute(text(_REBUILD_STATEMENT))
+    return True
+
+
+def drop_search_index(connection) -> None:
+    if connection.dialect.name == "sqlite":
+        connection.execute(text("DROP TABLE IF EXISTS task_fts"))
+
+
+# Follow the task table through metadata.create_all() / drop_all(); the
+# triggers themselves are dropped along with the task table
+event.listen(Task.__table__, "after_create", lambda target, connection, **kw: create_search_index(connection))
+event.listen(Task.__table__, "before_drop", lambda target, connection, **kw: drop_search_index(connection))
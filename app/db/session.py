@@ -1,13 +1,155 @@
+import random
+import time
+from sqlalchemy import CompoundSelect, MetaData, Select, event, inspect, text
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+from sqlalchemy.schema import CreateColumn, CreateTable
 from sqlmodel import SQLModel, create_engine, Session
+from sqlmodel.ext.asyncio.session import AsyncSession
 from app.core.config import settings
+from app.db.search_index import create_search_index
+from app.db.task_counters import create_task_counters
+from app.models.task_model import Task
 
 
-# Create the database engine
-engine = create_engine(
-    settings.database_url,
-    echo=settings.debug,  # Print SQL queries when debug=True
-    connect_args={"check_same_thread": False} if "sqlite" in settings.database_url else {}
-)
+def _is_sqlite(url: str) -> bool:
+    return url.startswith("sqlite")
+
+
+def _pool_options(url: str) -> dict:
+    # In-memory SQLite databases use a single shared connection, not a pool
+    if _is_sqlite(url) and (":memory:" in url or url.split("://", 1)[1] in ("", "/")):
+        return {}
+    return {
+        "pool_size": settings.db_pool_size,
+        "max_overflow": settings.db_max_overflow,
+        "pool_timeout": settings.db_pool_timeout,
+        "pool_recycle": settings.db_pool_recycle,
+        "pool_pre_ping": settings.db_pool_pre_ping,
+    }
+
+
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    """Tune every new SQLite connection; registered as a connect event."""
+    cursor = dbapi_connection.cursor()
+    cursor.execute(f"PRAGMA journal_mode={settings.sqlite_journal_mode}")
+    cursor.execute(f"PRAGMA synchronous={settings.sqlite_synchronous}")
+    cursor.execute(f"PRAGMA busy_timeout={int(settings.sqlite_busy_timeout_ms)}")
+    cursor.execute(f"PRAGMA mmap_size={int(settings.sqlite_mmap_size)}")
+    cursor.execute(f"PRAGMA cache_size={int(settings.sqlite_cache_size)}")
+    cursor.execute(f"PRAGMA temp_store={settings.sqlite_temp_store}")
+    cursor.close()
+
+
+def _create_engine(url: str):
+    sync_engine = create_engine(
+        url,
+        echo=settings.debug,  # Print SQL queries when debug=True
+        connect_args={"check_same_thread": False} if _is_sqlite(url) else {},
+        **_pool_options(url)
+    )
+    if _is_sqlite(url):
+        event.listen(sync_engine, "connect", set_sqlite_pragmas)
+    return sync_engine
+
+
+# Async drivers of the sync URLs database_url may use
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+}
+
+
+def get_async_url(url: str) -> str:
+    scheme, _, rest = url.partition("://")
+    return f"{ASYNC_DRIVERS.get(scheme, scheme)}://{rest}"
+
+
+def _create_async_engine(url: str):
+    # Pooled connections belong to the event loop that opened them; a process
+    # running several loops (e.g. the test client) opens one per session instead
+    new_engine = create_async_engine(
+        url,
+        echo=settings.debug,
+        **({"poolclass": NullPool} if settings.db_async_null_pool else _pool_options(url))
+    )
+    if _is_sqlite(url):
+        event.listen(new_engine.sync_engine, "connect", set_sqlite_pragmas)
+    return new_engine
+
+
+# Primary database engines; all writes go here
+engine = _create_engine(settings.database_url)
+async_database_url = settings.async_database_url or get_async_url(settings.database_url)
+async_engine = _create_async_engine(async_database_url)
+
+# Read replica engines, used by read sessions
+replica_engines = [_create_engine(url) for url in settings.database_replica_urls]
+async_replica_engines = [_create_async_engine(get_async_url(url)) for url in settings.database_replica_urls]
+
+# Monotonic time of each user's last committed write, for read-your-writes
+_last_write_at: dict[int, float] = {}
+
+
+def record_write(user_id: int) -> None:
+    now = time.monotonic()
+    if len(_last_write_at) > 10000:
+        # Forget users whose window has passed so the map stays small
+        for stale in [uid for uid, at in _last_write_at.items() if now - at >= settings.read_your_writes_seconds]:
+            del _last_write_at[stale]
+    _last_write_at[user_id] = now
+
+
+def wrote_recently(user_id: int) -> bool:
+    last_write = _last_write_at.get(user_id)
+    return last_write is not None and time.monotonic() - last_write < settings.read_your_writes_seconds
+
+
+class RoutingSession(Session):
+    """
+    Session that sends reads to one replica from info["replicas"], picked on
+    its first read, and writes to its primary bind. Once it writes, or with
+    info["sticky"] set, the session stays on the primary so it reads what it
+    wrote. Committed writes are recorded against info["user_id"].
+    """
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        if self._flushing or (clause is not None and not isinstance(clause, (Select, CompoundSelect))):
+            self.info["sticky"] = self.info["wrote"] = True
+        replicas = self.info.get("replicas")
+        if replicas and not self.info.get("sticky"):
+            # One replica per session, so all of its reads see the same snapshot
+            if "replica" not in self.info:
+                self.info["replica"] = random.choice(replicas)
+            return self.info["replica"]
+        return super().get_bind(mapper=mapper, clause=clause, **kw)
+
+
+@event.listens_for(RoutingSession, "after_commit")
+def _record_committed_write(session):
+    if session.info.pop("wrote", False) and session.info.get("user_id") is not None:
+        record_write(session.info["user_id"])
+
+
+def use_primary_after_write(session, user_id: int) -> None:
+    """
+    Attribute the session's writes to the user, and route its reads to the
+    primary if the user wrote recently (replicas may not have caught up).
+    """
+    session.info["user_id"] = user_id
+    if wrote_recently(user_id):
+        session.info["sticky"] = True
+
+
+def use_primary(session) -> bool:
+    """
+    Route the session's remaining reads to the primary. Returns True if its
+    reads went to a replica until now, i.e. reading again may see newer data.
+    """
+    on_replica = "replica" in session.info and not session.info.get("sticky")
+    session.info["sticky"] = True
+    return on_replica
 
 
 def create_db_and_tables():
@@ -15,11 +157,107 @@ def create_db_and_tables():
     Create database tables from SQLModel definitions
     """
     SQLModel.metadata.create_all(engine)
+    # create_all skips tables that already exist, so columns and indexes added
+    # to a model after its table was created have to be created explicitly
+    _add_missing_columns()
+    _migrate_task_table()
+    for table in SQLModel.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(engine, checkfirst=True)
+    # The task table may predate the search index and counters, or have been
+    # rebuilt without their triggers; they are created here
+    with engine.begin() as connection:
+        create_search_index(connection)
+        create_task_counters(connection)
+
+
+def _add_missing_columns():
+    """
+    Add model columns missing from existing tables. New columns must be
+    nullable or have a server default.
+    """
+    inspector = inspect(engine)
+    with engine.begin() as connection:
+        for table in SQLModel.metadata.sorted_tables:
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing:
+                    ddl = CreateColumn(column).compile(dialect=engine.dialect)
+                    connection.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {ddl}"))
+
+
+def _migrate_task_table():
+    """
+    Bring a task table created by an older version up to date: fill in
+    updated_at, and on SQLite rebuild the table with AUTOINCREMENT, which
+    SQLite cannot add to an existing table. Without it the id of the newest
+    task is reused once that task is deleted or archived.
+    """
+    with engine.begin() as connection:
+        connection.execute(text("UPDATE task SET updated_at = created_at WHERE updated_at IS NULL"))
+        if engine.dialect.name != "sqlite":
+            return
+        ddl = connection.execute(text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'task'")).scalar()
+        if "AUTOINCREMENT" in ddl.upper():
+            return
+
+        # Only the table is created here; indexes and triggers are recreated
+        # by create_db_and_tables once it has its final name
+        scratch = MetaData()
+        for foreign_key in Task.__table__.foreign_keys:
+            foreign_key.column.table.to_metadata(scratch)
+        new_table = Task.__table__.to_metadata(scratch, name="task_rebuilt")
+        columns = ", ".join(column.name for column in Task.__table__.c)
+        connection.execute(text("DROP TABLE IF EXISTS task_rebuilt"))
+        connection.execute(CreateTable(new_table))
+        connection.execute(text(f"INSERT INTO task_rebuilt ({columns}) SELECT {columns} FROM task"))
+        connection.execute(text("DROP TABLE task"))
+        connection.execute(text("ALTER TABLE task_rebuilt RENAME TO task"))
+        # Start after every id already handed out, including archived and
+        # deleted tasks that are no longer in the table
+        connection.execute(text("DELETE FROM sqlite_sequence WHERE name = 'task'"))
+        connection.execute(text("""
+            INSERT INTO sqlite_sequence (name, seq) SELECT 'task', max(
+                (SELECT coalesce(max(id), 0) FROM task),
+                (SELECT coalesce(max(id), 0) FROM task_archive),
+                (SELECT coalesce(max(task_id), 0) FROM task_tombstone)
+            )
+        """))
 
 
 def get_session():
     """
-    Dependency to get database session for FastAPI endpoints
+    Dependency to get database session for FastAPI endpoints.
+    Objects stay loaded after commit so handlers can keep using the current
+    user without another SELECT.
+    """
+    with RoutingSession(engine, expire_on_commit=False) as session:
+        yield session
+
+
+def get_read_session():
+    """
+    Dependency to get a database session that reads from a replica when
+    replicas are configured; see use_primary_after_write.
+    """
+    with RoutingSession(engine, expire_on_commit=False, info={"replicas": replica_engines}) as session:
+        yield session
+
+
+async def get_async_session():
+    """
+    Dependency to get an async database session for async endpoints.
+    """
+    async with AsyncSession(async_engine, expire_on_commit=False, sync_session_class=RoutingSession) as session:
+        yield session
+
+
+async def get_async_read_session():
+    """
+    Async counterpart of get_read_session.
     """
-    with Session(engine) as session:
+    replicas = [replica.sync_engine for replica in async_replica_engines]
+    async with AsyncSession(
+        async_engine, expire_on_commit=False, sync_session_class=RoutingSession, info={"replicas": replicas}
+    ) as session:
         yield session
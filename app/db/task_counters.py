@@ -0,0 +1,114 @@
+"""
+Triggers that maintain user_task_stats (see UserTaskStats) on every insert,
+delete and status/priority change of a task, in the writing transaction, so
+bulk Core statements and imports are counted like single writes.
+reconcile_task_stats() recomputes the counters from the task table.
+"""
+from sqlalchemy import event, text
+from app.models.task_model import Task
+
+
+def _deltas(row: str, sign: str) -> str:
+    # Assignments adding (sign "+") or removing (sign "-") one task row
+    return f"""
+        total = total {sign} 1,
+        completed = completed {sign} {row}.completed,
+        high = high {sign} ({row}.priority IS 'HIGH'),
+        medium = medium {sign} ({row}.priority IS 'MEDIUM'),
+        low = low {sign} ({row}.priority IS 'LOW'),
+        high_pending = high_pending {sign} ({row}.priority IS 'HIGH' AND NOT {row}.completed)
+    """
+
+
+_CREATE_STATEMENTS = [
+    f"""
+    CREATE TRIGGER IF NOT EXISTS task_stats_insert AFTER INSERT ON task BEGIN
+        INSERT INTO user_task_stats (user_id, total, completed, high, medium, low, high_pending)
+        VALUES (new.user_id, 0, 0, 0, 0, 0, 0)
+        ON CONFLICT (user_id) DO NOTHING;
+        UPDATE user_task_stats SET {_deltas("new", "+")} WHERE user_id = new.user_id;
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS task_stats_delete AFTER DELETE ON task BEGIN
+        UPDATE user_task_stats SET {_deltas("old", "-")} WHERE user_id = old.user_id;
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS task_stats_update AFTER UPDATE OF completed, priority, user_id ON task BEGIN
+        UPDATE user_task_stats SET {_deltas("old", "-")} WHERE user_id = old.user_id;
+        INSERT INTO user_task_stats (user_id, total, completed, high, medium, low, high_pending)
+        VALUES (new.user_id, 0, 0, 0, 0, 0, 0)
+        ON CONFLICT (user_id) DO NOTHING;
+        UPDATE user_task_stats SET {_deltas("new", "+")} WHERE user_id = new.user_id;
+    END
+    """,
+]
+
+_RECONCILE_STATEMENTS = [
+    """
+    INSERT INTO user_task_stats (user_id, total, completed, high, medium, low, high_pending)
+    SELECT
+        user_id,
+        count(*),
+        sum(completed),
+        sum(priority IS 'HIGH'),
+        sum(priority IS 'MEDIUM'),
+        sum(priority IS 'LOW'),
+        sum(priority IS 'HIGH' AND NOT completed)
+    FROM task
+    WHERE user_id IS NOT NULL
+    GROUP BY user_id
+    ON CONFLICT (user_id) DO UPDATE SET
+        total = excluded.total,
+        completed = excluded.completed,
+        high = excluded.high,
+        medium = excluded.medium,
+        low = excluded.low,
+        high_pending = excluded.high_pending
+    WHERE (total, completed, high, medium, low, high_pending) IS NOT
+        (excluded.total, excluded.completed, excluded.high, excluded.medium, excluded.low, excluded.high_pending)
+    """,
+    """
+    UPDATE user_task_stats
+    SET total = 0, completed = 0, high = 0, medium = 0, low = 0, high_pending = 0
+    WHERE total != 0 AND user_id NOT IN (SELECT user_id FROM task WHERE user_id IS NOT NULL)
+    """,
+]
+
+
+def create_task_counters(connection) -> bool:
+    """
+    Create the counter triggers if missing, computing the counters of
+    existing tasks when the triggers are new. Returns True if they were created.
+    """
+    if connection.dialect.name != "sqlite":
+        return False
+    exists = connection.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name = 'task_stats_insert'")
+    ).first()
+    if exists:
+        return False
+    _create_triggers(connection)
+    reconcile_task_stats(connection)
+    return True
+
+
+def _create_triggers(connection) -> None:
+    # SQLite resolves the tables a trigger body uses when it fires, so this
+    # may run before user_task_stats exists
+    if connection.dialect.name == "sqlite":
+        for statement in _CREATE_STATEMENTS:
+            connection.execute(text(statement))
+
+
+def reconcile_task_stats(connection) -> int:
+    """Rewrite counters that drifted from the task table; returns how many were fixed."""
+    fixed = 0
+    for statement in _RECONCILE_STATEMENTS:
+        fixed += connection.execute(text(statement)).rowcount
+    return fixed
+
+
+# A new task table has no rows to count, so only the triggers are needed
+event.listen(Task.__table__, "after_create", lambda target, connection, **kw: _create_triggers(connection))
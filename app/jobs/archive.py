@@ -0,0 +1,20 @@
+import logging
+from datetime import datetime, timedelta
+from sqlmodel import Session
+from app.core.config import settings
+from app.db.session import engine
+from app.repositories import task_repository
+
+logger = logging.getLogger(__name__)
+
+
+def archive_tasks_job() -> int:
+    """Move tasks completed more than archive_after_days ago to the archive."""
+    completed_before = datetime.utcnow() - timedelta(days=settings.archive_after_days)
+    with Session(engine) as session:
+        archived = task_repository.archive_completed_tasks(
+            session, completed_before, batch_size=settings.archive_batch_size
+        )
+    if archived:
+        logger.info(f"Archived {archived} tasks completed before {completed_before.isoformat()}")
+    return archived
@@ -0,0 +1,15 @@
+import logging
+from sqlmodel import Session
+from app.db.session import engine
+from app.repositories import idempotency_repository
+
+logger = logging.getLogger(__name__)
+
+
+def purge_idempotency_keys_job() -> int:
+    """Delete stored Idempotency-Key responses past their TTL."""
+    with Session(engine) as session:
+        purged = idempotency_repository.purge_expired_keys(session)
+    if purged:
+        logger.info(f"Purged {purged} expired idempotency keys")
+    return purged
@@ -0,0 +1,15 @@
+import logging
+from sqlmodel import Session
+from app.db.session import engine
+from app.repositories import refresh_token_repository
+
+logger = logging.getLogger(__name__)
+
+
+def purge_refresh_tokens_job() -> int:
+    """Delete refresh tokens past their expiry, revoked or not."""
+    with Session(engine) as session:
+        purged = refresh_token_repository.purge_expired_tokens(session)
+    if purged:
+        logger.info(f"Purged {purged} expired refresh tokens")
+    return purged
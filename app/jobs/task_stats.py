@@ -0,0 +1,14 @@
+import logging
+from app.db.session import engine
+from app.db.task_counters import reconcile_task_stats
+
+logger = logging.getLogger(__name__)
+
+
+def reconcile_task_stats_job() -> int:
+    """Fix per-user task counters that drifted from the task table."""
+    with engine.begin() as connection:
+        fixed = reconcile_task_stats(connection)
+    if fixed:
+        logger.warning(f"Reconciled drifted task counters of {fixed} users")
+    return fixed
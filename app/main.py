@@ -1,11 +1,19 @@
 from fastapi import FastAPI, Request
 from fastapi.exceptions import RequestValidationError
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 import logging
+from sqlmodel import Session
 from app.core.config import settings
-from app.db.session import create_db_and_tables
+from app.db.session import create_db_and_tables, engine
+from app.core.password_hasher import password_hasher
+from app.repositories import task_repository
 from app.api import tasks, agent, users
+from app.jobs.scheduler import PeriodicJob
+from app.jobs.task_stats import reconcile_task_stats_job
+from app.jobs.archive import archive_tasks_job
+from app.jobs.idempotency import purge_idempotency_keys_job
+from app.jobs.refresh_tokens import purge_refresh_tokens_job
 
 
 # Configure logging
@@ -15,11 +23,15 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Background jobs started with the app
+jobs: list[PeriodicJob] = []
+
 # Create FastAPI app
 app = FastAPI(
     title=settings.app_name,
     version=settings.app_version,
-    debug=settings.debug
+    debug=settings.debug,
+    default_response_class=ORJSONResponse if settings.fast_json_responses else JSONResponse
 )
 
 # Enable CORS for frontend development
@@ -28,7 +40,8 @@ app.add_middleware(
     allow_origins=["http://localhost:5173", "http://localhost"],
     allow_credentials=True,
     allow_methods=["*"],
-    allow_headers=["*"]
+    allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag", "Idempotent-Replayed"]
 )
 
 
@@ -48,6 +61,38 @@ def on_startup():
     Initialize database tables on app startup
     """
     create_db_and_tables()
+    with Session(engine) as session:
+        indexed = task_repository.backfill_task_tags(session)
+    if indexed:
+        logger.info(f"Indexed tags of {indexed} existing tasks")
+
+    if settings.stats_reconcile_interval_seconds > 0:
+        jobs.append(PeriodicJob(
+            "reconcile-task-stats", settings.stats_reconcile_interval_seconds, reconcile_task_stats_job
+        ))
+    if settings.archive_interval_seconds > 0:
+        jobs.append(PeriodicJob("archive-tasks", settings.archive_interval_seconds, archive_tasks_job))
+    if settings.idempotency_purge_interval_seconds > 0:
+        jobs.append(PeriodicJob(
+            "purge-idempotency-keys", settings.idempotency_purge_interval_seconds, purge_idempotency_keys_job
+        ))
+    if settings.refresh_token_purge_interval_seconds > 0:
+        jobs.append(PeriodicJob(
+            "purge-refresh-tokens", settings.refresh_token_purge_interval_seconds, purge_refresh_tokens_job
+        ))
+    for job in jobs:
+        job.start()
+
+
+@app.on_event("shutdown")
+def on_shutdown():
+    """
+    Stop background jobs and the password hashing workers
+    """
+    for job in jobs:
+        job.stop()
+    jobs.clear()
+    password_hasher.shutdown()
 
 
 # Include API routes
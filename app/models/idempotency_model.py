@@ -0,0 +1,26 @@
+from sqlmodel import SQLModel, Field
+from sqlalchemy import Index
+from datetime import datetime
+from typing import Optional
+
+
+class IdempotencyRecord(SQLModel, table=True):
+    """
+    A write request made with an Idempotency-Key header. While the request
+    runs status_code is NULL; afterwards the response is kept for replay
+    until expires_at. committed is set in the transaction of the write
+    itself, so a write whose response was never stored is not run again.
+    """
+    __tablename__ = "idempotency_key"
+    __table_args__ = (
+        Index("ix_idempotency_key_expires_at", "expires_at"),
+    )
+
+    user_id: int = Field(foreign_key="user.id", primary_key=True)
+    key: str = Field(primary_key=True)
+    fingerprint: str  # sha256 of method, path and body
+    status_code: Optional[int] = None
+    response_body: Optional[str] = None
+    committed: bool = Field(default=False, sa_column_kwargs={"server_default": "0"})
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    expires_at: datetime
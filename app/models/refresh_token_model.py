@@ -0,0 +1,24 @@
+from sqlmodel import SQLModel, Field
+from sqlalchemy import Index
+from datetime import datetime
+from typing import Optional
+
+
+class RefreshToken(SQLModel, table=True):
+    """
+    A refresh token issued at login. Only the token's sha256 is stored.
+    Each refresh revokes the token and issues its successor in the same
+    family; presenting a revoked token again revokes the whole family.
+    """
+    __tablename__ = "refresh_token"
+    __table_args__ = (
+        Index("ix_refresh_token_expires_at", "expires_at"),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    user_id: int = Field(foreign_key="user.id", index=True)
+    token_hash: str = Field(unique=True, index=True)
+    family_id: str = Field(index=True)  # Shared by a login's token and all its rotations
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    expires_at: datetime
+    revoked_at: Optional[datetime] = None
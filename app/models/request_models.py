@@ -1,7 +1,8 @@
-from pydantic import BaseModel, field_validator
-from typing import Optional, List, Dict, Union
+from pydantic import BaseModel, Field, field_validator, model_validator
+from typing import Any, Optional, List, Dict, Union
 from datetime import datetime
 from app.models.task_model import Priority
+from enum import Enum
 import json
 
 
@@ -44,6 +45,41 @@ class TaskUpdateRequest(BaseModel):
         return v
 
 
+class MiniTaskOp(str, Enum):
+    ADD = "add"        # Add a new mini-task, `done` defaults to false
+    REMOVE = "remove"
+    TOGGLE = "toggle"
+    SET = "set"        # Set the state of an existing mini-task to `done`
+    RENAME = "rename"  # Rename an existing mini-task to `new_name`, keeping its position
+
+
+class MiniTaskOperation(BaseModel):
+    op: MiniTaskOp
+    name: str
+    new_name: Optional[str] = None
+    done: Optional[bool] = None
+
+    @field_validator('name', 'new_name')
+    @classmethod
+    def check_name(cls, v):
+        if v is not None and not v.strip():
+            raise ValueError('Mini-task names must be non-empty')
+        return v
+
+    @model_validator(mode='after')
+    def check_arguments(self):
+        if self.op == MiniTaskOp.RENAME and self.new_name is None:
+            raise ValueError("rename needs a new_name")
+        if self.op == MiniTaskOp.SET and self.done is None:
+            raise ValueError("set needs done")
+        return self
+
+
+class MiniTaskPatchRequest(BaseModel):
+    # Applied in order, all or nothing
+    operations: List[MiniTaskOperation] = Field(min_length=1, max_length=100)
+
+
 class TaskResponse(BaseModel):
     id: int
     title: str
@@ -51,6 +87,120 @@ class TaskResponse(BaseModel):
     due_date: datetime
     completed: bool
     created_at: datetime
+    updated_at: Optional[datetime] = None
     priority: Optional[Priority] = None
     tags: Optional[List[str]] = None
     mini_tasks: Optional[Dict[str, bool]] = None
+
+
+class ArchivedTaskResponse(TaskResponse):
+    archived_at: datetime
+
+
+class TaskSearchResult(TaskResponse):
+    snippet: str  # Best matching excerpt, matched terms wrapped in <mark></mark>
+
+
+class TaskChangesResponse(BaseModel):
+    changed: List[TaskResponse]
+    deleted: List[int]
+    sync_token: str
+
+
+class ExportFormat(str, Enum):
+    NDJSON = "ndjson"
+    CSV = "csv"
+
+
+class ImportFormat(str, Enum):
+    JSON = "json"  # {"sample_tasks": [{"task_1": {...}}, ...]} or a plain array of tasks
+    NDJSON = "ndjson"
+
+
+class ImportRecordError(BaseModel):
+    record: int  # 1-based position of the record in the file
+    error: str
+
+
+class TaskImportResponse(BaseModel):
+    imported: int
+    failed: int
+    errors: List[ImportRecordError]  # Capped at import_max_reported_errors
+
+
+class TaskSort(str, Enum):
+    DUE_DATE = "due_date"
+    DUE_DATE_DESC = "-due_date"
+    CREATED_AT = "created_at"
+    CREATED_AT_DESC = "-created_at"
+
+
+class TagMatch(str, Enum):
+    ANY = "any"
+    ALL = "all"
+
+
+class TaskFilters(BaseModel):
+    completed: Optional[bool] = None
+    priority: Optional[Priority] = None
+    due_before: Optional[datetime] = None
+    due_after: Optional[datetime] = None
+    created_before: Optional[datetime] = None
+    created_after: Optional[datetime] = None
+    tags: Optional[List[str]] = None
+    tag_match: TagMatch = TagMatch.ANY
+
+
+class TagCount(BaseModel):
+    tag: str
+    count: int
+
+
+class TaskCounts(BaseModel):
+    total: int
+    completed: int
+    pending: int
+    completion_rate: float  # Percent of tasks completed
+    high_priority_pending: int
+    by_priority: Dict[str, int]  # "high", "medium", "low" and "none"
+
+
+class TaskStats(BaseModel):
+    total: int
+    completed: int
+    pending: int
+    completion_rate: float  # Percent of tasks completed
+    overdue: int  # Pending tasks due before now
+    due_this_week: int  # Pending tasks due from now until the end of the week (Sunday, UTC)
+    high_priority_pending: int
+    by_priority: Dict[str, int]  # "high", "medium", "low" and "none"
+    subtasks_total: int
+    subtasks_completed: int
+    subtask_completion_rate: float  # Percent of mini-tasks checked off
+    tags: List[TagCount]
+
+
+class BulkTaskCreateRequest(BaseModel):
+    # Items are validated one by one so a bad item does not fail the whole batch
+    tasks: List[Dict[str, Any]]
+
+
+class BulkTaskUpdateRequest(BaseModel):
+    tasks: List[Dict[str, Any]]
+
+
+class BulkTaskDeleteRequest(BaseModel):
+    ids: List[int]
+
+
+class BulkItemResult(BaseModel):
+    index: int
+    id: Optional[int] = None
+    status: str  # created, updated, deleted or error
+    error: Optional[str] = None
+
+
+class BulkTaskResponse(BaseModel):
+    succeeded: int
+    failed: int
+    results: List[BulkItemResult]
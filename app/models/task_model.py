@@ -1,6 +1,7 @@
 from sqlmodel import SQLModel, Field
+from sqlalchemy import Column, Index, JSON
 from datetime import datetime
-from typing import Optional
+from typing import Dict, List, Optional
 from enum import Enum
 
 
@@ -11,14 +12,109 @@ class Priority(str, Enum):
 
 
 class Task(SQLModel, table=True):
+    __table_args__ = (
+        # Back keyset pagination and the filters of the task list endpoint
+        Index("ix_task_user_due_id", "user_id", "due_date", "id"),
+        Index("ix_task_user_created_id", "user_id", "created_at", "id"),
+        Index("ix_task_user_completed_due", "user_id", "completed", "due_date"),
+        Index("ix_task_user_priority", "user_id", "priority"),
+        # Backs delta sync: tasks changed after a given revision
+        Index("ix_task_user_revision", "user_id", "revision"),
+        # Lets the archiver find long-completed tasks without a full scan
+        Index("ix_task_completed_updated", "completed", "updated_at"),
+        # Never reuse the id of a deleted task, so tombstones stay unambiguous
+        {"sqlite_autoincrement": True},
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     title: str
     description: Optional[str] = None
     due_date: Optional[datetime] = None
     completed: bool = False
     created_at: datetime = Field(default_factory=datetime.utcnow)
+    updated_at: Optional[datetime] = Field(default_factory=datetime.utcnow)
+    # User task data version of the write that last changed this task
+    revision: int = Field(default=0, sa_column_kwargs={"server_default": "0"})
     user_id: int | None = Field(default=None, foreign_key="user.id")
     
     priority: Optional[Priority] = None
-    tags: Optional[str] = None       # JSON array: '["work", "personal"]'
-    mini_tasks: Optional[str] = None # JSON object: '{"Setup env": true, "Write code": false}'
+    # JSON columns, decoded once when the row is loaded
+    # tags: ["work", "personal"]
+    tags: Optional[List[str]] = Field(default=None, sa_column=Column(JSON(none_as_null=True)))
+    # mini_tasks: {"Setup env": true, "Write code": false}
+    mini_tasks: Optional[Dict[str, bool]] = Field(default=None, sa_column=Column(JSON(none_as_null=True)))
+
+
+class ArchivedTask(SQLModel, table=True):
+    """
+    Cold storage for tasks completed long ago, moved out of the task table by
+    the archiver (app.jobs.archive). Same columns as Task, keeping its id.
+    """
+    __tablename__ = "task_archive"
+    __table_args__ = (
+        Index("ix_task_archive_user_id", "user_id", "id"),
+    )
+
+    id: int = Field(primary_key=True)
+    title: str
+    description: Optional[str] = None
+    due_date: Optional[datetime] = None
+    completed: bool = True
+    created_at: datetime
+    updated_at: Optional[datetime] = None
+    revision: int = 0
+    user_id: int = Field(foreign_key="user.id")
+    priority: Optional[Priority] = None
+    tags: Optional[List[str]] = Field(default=None, sa_column=Column(JSON(none_as_null=True)))
+    mini_tasks: Optional[Dict[str, bool]] = Field(default=None, sa_column=Column(JSON(none_as_null=True)))
+    archived_at: datetime = Field(default_factory=datetime.utcnow)
+
+
+class TaskTag(SQLModel, table=True):
+    """One row per (task, tag); the inverted index behind tag filters and counts."""
+    __tablename__ = "task_tag"
+    __table_args__ = (
+        Index("ix_task_tag_user_tag", "user_id", "tag"),
+    )
+
+    task_id: int = Field(foreign_key="task.id", primary_key=True)
+    tag: str = Field(primary_key=True)
+    user_id: int = Field(foreign_key="user.id")
+
+
+class UserTaskVersion(SQLModel, table=True):
+    """Per-user counter bumped by every task write; the source of task ETags."""
+    __tablename__ = "user_task_version"
+
+    user_id: int = Field(foreign_key="user.id", primary_key=True)
+    version: int = 0
+
+
+class UserTaskStats(SQLModel, table=True):
+    """
+    Per-user task counters, kept current by triggers on the task table
+    (app.db.task_counters) so dashboard counts are a primary-key lookup.
+    """
+    __tablename__ = "user_task_stats"
+
+    user_id: int = Field(foreign_key="user.id", primary_key=True)
+    total: int = 0
+    completed: int = 0
+    high: int = 0
+    medium: int = 0
+    low: int = 0
+    high_pending: int = 0
+
+
+class TaskTombstone(SQLModel, table=True):
+    """Records a deleted task so delta sync can report the deletion."""
+    __tablename__ = "task_tombstone"
+    __table_args__ = (
+        Index("ix_task_tombstone_user_revision", "user_id", "revision"),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    task_id: int
+    user_id: int = Field(foreign_key="user.id")
+    revision: int
+    deleted_at: datetime = Field(default_factory=datetime.utcnow)
@@ -0,0 +1,51 @@
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlmodel import select, update
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.models.user_model import User
+from app.schemas.user_schema import UserCreate
+from app.core.password_hasher import password_hasher
+from app.cache.user_cache import invalidate_user
+
+
+async def get_user_by_id(session: AsyncSession, user_id: int) -> User | None:
+    """Fetches a user from the database by their ID."""
+    return await session.get(User, user_id)
+
+
+async def get_user_by_username(session: AsyncSession, username: str) -> User | None:
+    """Fetches a user from the database by their username."""
+    statement = select(User).where(User.username == username)
+    result = await session.exec(statement)
+    return result.first()
+
+
+async def create_user(session: AsyncSession, user_create: UserCreate) -> User:
+    """Hashes the password and creates a new user in the database."""
+    # bcrypt is deliberately slow; keep it off the event loop and the request threads
+    hashed_password = await password_hasher.hash(user_create.password)
+    db_user = User(username=user_create.username, hashed_password=hashed_password)
+
+    session.add(db_user)
+    await session.commit()
+    await session.refresh(db_user)
+
+    return db_user
+
+
+async def authenticate_user(session: AsyncSession, username: str, password: str) -> User | None:
+    """Authenticates a user by checking username and password."""
+    db_user = await get_user_by_username(session, username=username)
+    if not db_user:
+        return None
+    valid, new_hash = await password_hasher.verify_and_update(password, db_user.hashed_password)
+    if not valid:
+        return None
+    if new_hash:
+        # The hash was made with an older bcrypt cost; store it at the current
+        # one. A Core UPDATE, since the ORM's user update hooks would revoke
+        # the user's refresh tokens over what is not a new password
+        await session.exec(update(User).where(User.id == db_user.id).values(hashed_password=new_hash))
+        await session.commit()
+        set_committed_value(db_user, "hashed_password", new_hash)
+        invalidate_user(db_user.id)
+    return db_user
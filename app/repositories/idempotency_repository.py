@@ -0,0 +1,88 @@
+from datetime import datetime
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session, delete, select, update
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.models.idempotency_model import IdempotencyRecord
+
+
+async def get_record(session: AsyncSession, user_id: int, key: str) -> IdempotencyRecord | None:
+    statement = select(IdempotencyRecord).where(
+        IdempotencyRecord.user_id == user_id, IdempotencyRecord.key == key
+    )
+    result = await session.exec(statement)
+    return result.first()
+
+
+async def reserve_key(
+    session: AsyncSession, user_id: int, key: str, fingerprint: str, expires_at: datetime
+) -> bool:
+    """
+    Insert an in-progress record for the key. Returns False if the key is
+    already taken, by an earlier or a concurrent request.
+    """
+    await session.exec(delete(IdempotencyRecord).where(
+        IdempotencyRecord.user_id == user_id,
+        IdempotencyRecord.key == key,
+        IdempotencyRecord.expires_at <= datetime.utcnow()
+    ))
+    session.add(IdempotencyRecord(user_id=user_id, key=key, fingerprint=fingerprint, expires_at=expires_at))
+    try:
+        await session.commit()
+    except IntegrityError:
+        await session.rollback()
+        return False
+    return True
+
+
+async def take_over_key(session: AsyncSession, user_id: int, key: str, started_before: datetime) -> bool:
+    """Claim an in-progress record whose request started before started_before and never finished."""
+    statement = (
+        update(IdempotencyRecord)
+        .where(
+            IdempotencyRecord.user_id == user_id,
+            IdempotencyRecord.key == key,
+            IdempotencyRecord.status_code.is_(None),
+            IdempotencyRecord.committed.is_(False),
+            IdempotencyRecord.created_at < started_before
+        )
+        .values(created_at=datetime.utcnow())
+    )
+    result = await session.exec(statement)
+    await session.commit()
+    return result.rowcount == 1
+
+
+async def complete_key(session: AsyncSession, user_id: int, key: str, status_code: int, response_body: str) -> None:
+    await session.exec(
+        update(IdempotencyRecord)
+        .where(IdempotencyRecord.user_id == user_id, IdempotencyRecord.key == key)
+        .values(status_code=status_code, response_body=response_body)
+    )
+    await session.commit()
+
+
+async def release_key(session: AsyncSession, user_id: int, key: str) -> None:
+    """Drop an in-progress record so the request can be retried, unless its write was committed."""
+    await session.exec(delete(IdempotencyRecord).where(
+        IdempotencyRecord.user_id == user_id,
+        IdempotencyRecord.key == key,
+        IdempotencyRecord.status_code.is_(None),
+        IdempotencyRecord.committed.is_(False)
+    ))
+    await session.commit()
+
+
+def mark_committed(session: Session, user_id: int, key: str) -> None:
+    """Flag the record as written; runs inside the write's transaction, which commits it."""
+    session.exec(
+        update(IdempotencyRecord)
+        .where(IdempotencyRecord.user_id == user_id, IdempotencyRecord.key == key)
+        .values(committed=True)
+    )
+
+
+def purge_expired_keys(session: Session) -> int:
+    """Delete every expired record; returns how many were deleted."""
+    result = session.exec(delete(IdempotencyRecord).where(IdempotencyRecord.expires_at <= datetime.utcnow()))
+    session.commit()
+    return result.rowcount
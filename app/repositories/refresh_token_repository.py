@@ -0,0 +1,97 @@
+import hashlib
+import secrets
+import uuid
+from datetime import datetime, timedelta
+from sqlalchemy import Connection, event
+from sqlmodel import Session, delete, select, update
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.core.config import settings
+from app.models.refresh_token_model import RefreshToken
+from app.models.user_model import User
+
+
+def _hash_token(token: str) -> str:
+    # Tokens are random 256-bit values, so a fast hash is enough to store them
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+async def create_refresh_token(session: AsyncSession, user_id: int, family_id: str | None = None) -> str:
+    """Store a new refresh token for the user and return it; starts a new family unless one is given."""
+    token = secrets.token_urlsafe(32)
+    session.add(RefreshToken(
+        user_id=user_id,
+        token_hash=_hash_token(token),
+        family_id=family_id or uuid.uuid4().hex,
+        expires_at=datetime.utcnow() + timedelta(days=settings.refresh_token_expire_days)
+    ))
+    await session.commit()
+    return token
+
+
+async def rotate_refresh_token(session: AsyncSession, token: str) -> tuple[int, str] | None:
+    """
+    Revoke a refresh token and issue its successor. Returns the user id and
+    the new token, or None if the token is unknown, expired or revoked.
+    Reusing a revoked token revokes its whole family, since either the
+    client or an attacker holds a stolen copy.
+    """
+    result = await session.exec(select(RefreshToken).where(RefreshToken.token_hash == _hash_token(token)))
+    record = result.first()
+    if record is None or record.expires_at <= datetime.utcnow():
+        return None
+
+    now = datetime.utcnow()
+    # Conditional update, so two concurrent refreshes cannot both succeed
+    revoked = await session.exec(
+        update(RefreshToken)
+        .where(RefreshToken.id == record.id, RefreshToken.revoked_at.is_(None))
+        .values(revoked_at=now)
+    )
+    if revoked.rowcount != 1:
+        await revoke_family(session, record.family_id)
+        return None
+    return record.user_id, await create_refresh_token(session, record.user_id, record.family_id)
+
+
+async def revoke_family(session: AsyncSession, family_id: str) -> None:
+    await session.exec(
+        update(RefreshToken)
+        .where(RefreshToken.family_id == family_id, RefreshToken.revoked_at.is_(None))
+        .values(revoked_at=datetime.utcnow())
+    )
+    await session.commit()
+
+
+async def revoke_refresh_token(session: AsyncSession, token: str) -> bool:
+    """Revoke a token and every token rotated from the same login; False if the token is unknown."""
+    result = await session.exec(select(RefreshToken).where(RefreshToken.token_hash == _hash_token(token)))
+    record = result.first()
+    if record is None:
+        return False
+    await revoke_family(session, record.family_id)
+    return True
+
+
+def revoke_user_tokens(connection: Connection, user_id: int) -> None:
+    """Revoke every refresh token of a user, in the transaction of the given connection."""
+    connection.execute(
+        update(RefreshToken)
+        .where(RefreshToken.user_id == user_id, RefreshToken.revoked_at.is_(None))
+        .values(revoked_at=datetime.utcnow())
+    )
+
+
+# A user changed through the ORM (e.g. a new password) or deleted loses every
+# login, in the same flush; a bcrypt rehash updates the row with a Core
+# statement and keeps them
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _revoke_tokens_of_changed_user(mapper, connection, target: User) -> None:
+    revoke_user_tokens(connection, target.id)
+
+
+def purge_expired_tokens(session: Session) -> int:
+    """Delete every expired token; returns how many were deleted."""
+    result = session.exec(delete(RefreshToken).where(RefreshToken.expires_at <= datetime.utcnow()))
+    session.commit()
+    return result.rowcount
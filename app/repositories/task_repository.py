@@ -1,12 +1,19 @@
-from sqlmodel import Session, select
-from app.models.task_model import Task
-from app.models.request_models import TaskUpdateRequest
-import json
+from datetime import datetime
+from typing import Iterator
+from sqlalchemy import case, column, literal, literal_column, table
+from sqlmodel import Session, select, and_, or_, func, delete, insert, update
+from app.models.task_model import ArchivedTask, Task, TaskTag, TaskTombstone, UserTaskStats, UserTaskVersion
+from app.models.request_models import (
+    TaskUpdateRequest, TaskFilters, TaskSort, TagMatch, MiniTaskOperation, MiniTaskOp
+)
 
 
 def create_task(session: Session, task: Task, user_id: int) -> Task:
     task.user_id = user_id
+    task.revision = bump_version(session, user_id)
     session.add(task)
+    session.flush()
+    _replace_task_tags(session, task.id, user_id, task.tags)
     session.commit()
     session.refresh(task)
     return task
@@ -17,39 +24,564 @@ def get_task_by_id(session: Session, task_id: int, user_id: int) -> Task | None:
     return session.exec(statement).first()
 
 
-def get_all_tasks(session: Session, user_id: int) -> list[Task]:
+def get_all_tasks(
+    session: Session,
+    user_id: int,
+    filters: TaskFilters | None = None,
+    sort: TaskSort | None = None,
+) -> list[Task]:
     statement = select(Task).where(Task.user_id == user_id)
+    if filters is not None:
+        statement = _apply_filters(statement, filters, user_id)
+    if sort is not None:
+        statement = _apply_sort(statement, sort)
     return session.exec(statement).all()
 
 
+def iter_tasks(session: Session, user_id: int, batch_size: int = 500) -> Iterator[Task]:
+    """
+    Stream the user's tasks in id order, fetching `batch_size` rows at a time
+    through a server-side cursor instead of loading the whole account.
+    """
+    statement = (
+        select(Task)
+        .where(Task.user_id == user_id)
+        .order_by(Task.id)
+        .execution_options(yield_per=batch_size)
+    )
+    yield from session.exec(statement)
+
+
+def get_tasks_page(
+    session: Session,
+    user_id: int,
+    limit: int,
+    after: tuple[datetime | None, int] | None = None,
+    filters: TaskFilters | None = None,
+    sort: TaskSort = TaskSort.DUE_DATE,
+) -> list[Task]:
+    """
+    Fetch up to `limit` tasks ordered by (sort column, id), starting after the
+    given (sort value, id) key. Served by the (user_id, <column>, id) indexes.
+    """
+    statement = select(Task).where(Task.user_id == user_id)
+    if filters is not None:
+        statement = _apply_filters(statement, filters, user_id)
+    if after is not None:
+        statement = statement.where(_after_key(sort, *after))
+    statement = _apply_sort(statement, sort).limit(limit)
+    return session.exec(statement).all()
+
+
+def get_tag_counts(session: Session, user_id: int) -> list[tuple[str, int]]:
+    """Count the user's tasks per tag, most used tags first."""
+    statement = (
+        select(TaskTag.tag, func.count())
+        .where(TaskTag.user_id == user_id)
+        .group_by(TaskTag.tag)
+        .order_by(func.count().desc(), TaskTag.tag)
+    )
+    return session.exec(statement).all()
+
+
+def get_task_counts(session: Session, user_id: int) -> UserTaskStats | None:
+    """The user's materialized task counters; None before their first task."""
+    return session.get(UserTaskStats, user_id)
+
+
+def get_task_stats(session: Session, user_id: int, now: datetime, week_end: datetime):
+    """
+    Aggregate the user's tasks per priority in one grouped query: counts of
+    all, completed, overdue and due-this-week tasks and of mini-tasks.
+    Returns one row per priority that has tasks.
+    """
+    pending = Task.completed.is_(False)
+    subtasks = select(func.count()).select_from(func.json_each(Task.mini_tasks)).scalar_subquery()
+    entries = func.json_each(Task.mini_tasks).table_valued("type")
+    subtasks_done = select(func.count()).where(entries.c.type == "true").scalar_subquery()
+
+    def count_where(*conditions):
+        return func.sum(case((and_(*conditions), 1), else_=0))
+
+    statement = (
+        select(
+            Task.priority,
+            func.count().label("total"),
+            count_where(Task.completed.is_(True)).label("completed"),
+            count_where(pending, Task.due_date < now).label("overdue"),
+            count_where(pending, Task.due_date >= now, Task.due_date < week_end).label("due_this_week"),
+            func.sum(subtasks).label("subtasks_total"),
+            func.sum(subtasks_done).label("subtasks_completed"),
+        )
+        .where(Task.user_id == user_id)
+        .group_by(Task.priority)
+    )
+    return session.exec(statement).all()
+
+
+# The FTS5 index maintained by app.db.search_index; rowid is the task id
+task_fts = table("task_fts", column("rowid"))
+# bm25 weights of title, description, subtasks, tags and owner
+_SEARCH_WEIGHTS = (10.0, 4.0, 2.0, 2.0, 0.0)
+
+
+def search_tasks(
+    session: Session,
+    user_id: int,
+    match: str,
+    limit: int,
+    offset: int = 0,
+    highlight: tuple[str, str] = ("[", "]"),
+) -> list[tuple[Task, str]]:
+    """
+    Run an FTS5 MATCH expression over the user's tasks, best matches first.
+    Returns each Task with a snippet of its best matching column, matched
+    terms wrapped in the `highlight` markers.
+    """
+    fts = literal_column("task_fts")
+    owner_match = f"owner:u{user_id} AND {{title description subtasks tags}}: ({match})"
+    snippet = func.snippet(fts, -1, highlight[0], highlight[1], "…", 12)
+    statement = (
+        select(Task, snippet)
+        .select_from(task_fts)
+        .join(Task, Task.id == task_fts.c.rowid)
+        .where(fts.op("MATCH")(owner_match), Task.user_id == user_id)
+        .order_by(func.bm25(fts, *_SEARCH_WEIGHTS), Task.id)
+        .limit(limit)
+        .offset(offset)
+    )
+    return session.exec(statement).all()
+
+
+def _apply_filters(statement, filters: TaskFilters, user_id: int):
+    if filters.completed is not None:
+        statement = statement.where(Task.completed == filters.completed)
+    if filters.priority is not None:
+        statement = statement.where(Task.priority == filters.priority)
+    if filters.due_before is not None:
+        statement = statement.where(Task.due_date < filters.due_before)
+    if filters.due_after is not None:
+        statement = statement.where(Task.due_date > filters.due_after)
+    if filters.created_before is not None:
+        statement = statement.where(Task.created_at < filters.created_before)
+    if filters.created_after is not None:
+        statement = statement.where(Task.created_at > filters.created_after)
+    if filters.tags:
+        tags = set(filters.tags)
+        tagged = select(TaskTag.task_id).where(TaskTag.user_id == user_id, TaskTag.tag.in_(tags))
+        if filters.tag_match == TagMatch.ALL:
+            tagged = tagged.group_by(TaskTag.task_id).having(func.count() == len(tags))
+        statement = statement.where(Task.id.in_(tagged))
+    return statement
+
+
+def _sort_column(sort: TaskSort):
+    return Task.created_at if sort in (TaskSort.CREATED_AT, TaskSort.CREATED_AT_DESC) else Task.due_date
+
+
+def _is_descending(sort: TaskSort) -> bool:
+    return sort.value.startswith("-")
+
+
+def _apply_sort(statement, sort: TaskSort):
+    column = _sort_column(sort)
+    if _is_descending(sort):
+        return statement.order_by(column.desc(), Task.id.desc())
+    return statement.order_by(column, Task.id)
+
+
+def _after_key(sort: TaskSort, after_value: datetime | None, after_id: int):
+    """Keyset predicate for rows that sort after (after_value, after_id)."""
+    column = _sort_column(sort)
+    # SQLite sorts NULLs first ascending and last descending
+    if _is_descending(sort):
+        if after_value is None:
+            return and_(column.is_(None), Task.id < after_id)
+        return or_(
+            column < after_value,
+            and_(column == after_value, Task.id < after_id),
+            column.is_(None),
+        )
+    if after_value is None:
+        return or_(and_(column.is_(None), Task.id > after_id), column.is_not(None))
+    return or_(column > after_value, and_(column == after_value, Task.id > after_id))
+
+
+def create_tasks(session: Session, tasks: list[Task], user_id: int) -> list[Task]:
+    """
+    Insert many tasks with one multi-row INSERT ... RETURNING and their tags
+    with one executemany, all in a single transaction. Returns detached Tasks
+    in input order.
+    """
+    revision = bump_version(session, user_id)
+    columns = [column.name for column in Task.__table__.c if column.name != "id"]
+    rows = []
+    for task in tasks:
+        task.user_id = user_id
+        task.revision = revision
+        rows.append({name: getattr(task, name) for name in columns})
+
+    # Rows of a multi-row INSERT get ascending ids in VALUES order, so sorting
+    # the RETURNING rows by id restores input order without falling back to
+    # one INSERT per row (which sort_by_parameter_order does on SQLite)
+    statement = insert(Task.__table__).returning(*Task.__table__.c)
+    returned = sorted(session.exec(statement, params=rows), key=lambda row: row.id)
+    saved_tasks = [Task(**row._mapping) for row in returned]
+
+    tag_rows = [
+        {"task_id": task.id, "user_id": user_id, "tag": tag}
+        for task in saved_tasks if task.tags
+        for tag in dict.fromkeys(task.tags)
+    ]
+    if tag_rows:
+        session.exec(insert(TaskTag.__table__), params=tag_rows)
+    session.commit()
+    return saved_tasks
+
+
 def update_task(
     session: Session, task_id: int, task_update: TaskUpdateRequest, user_id: int
 ) -> Task | None:
-    db_task = get_task_by_id(session, task_id=task_id, user_id=user_id)
-    if not db_task:
-        return None    # Only update fields that are explicitly provided and not None
+    """
+    Apply the provided fields with a single UPDATE ... RETURNING statement.
+    Returns a detached Task built from the returned row, or None if the task
+    does not exist or belongs to another user.
+    """
+    values = _update_values(task_update)
+    if not values:
+        return get_task_by_id(session, task_id=task_id, user_id=user_id)
+
+    revision = bump_version(session, user_id)
+    updated_task = _update_task_row(session, task_id, values, user_id, revision)
+    if updated_task is None:
+        session.rollback()
+        return None
+    session.commit()
+    return updated_task
+
+
+def update_tasks(
+    session: Session, updates: list[tuple[int, TaskUpdateRequest]], user_id: int
+) -> list[Task | None]:
+    """
+    Apply many updates in one transaction. Returns the updated Task, or None
+    for tasks that were not found, in input order.
+    """
+    revision = None
+    updated_tasks = []
+    for task_id, task_update in updates:
+        values = _update_values(task_update)
+        if not values:
+            updated_tasks.append(get_task_by_id(session, task_id=task_id, user_id=user_id))
+            continue
+        if revision is None:
+            revision = bump_version(session, user_id)
+        updated_tasks.append(_update_task_row(session, task_id, values, user_id, revision))
+    session.commit()
+    return updated_tasks
+
+
+def _update_values(task_update: TaskUpdateRequest) -> dict:
+    # Only update fields that are explicitly provided and not None
     task_data = task_update.model_dump(exclude_unset=True, exclude_none=True)
-    for key, value in task_data.items():
-        if hasattr(db_task, key):
-            # Convert tags and mini_tasks to JSON strings for database storage
-            if key == "tags" and value is not None:
-                setattr(db_task, key, json.dumps(value))
-            elif key == "mini_tasks" and value is not None:
-                setattr(db_task, key, json.dumps(value))
-            else:
-                setattr(db_task, key, value)
-
-    session.add(db_task)
+    return {key: value for key, value in task_data.items() if key in Task.__table__.c}
+
+
+def _update_task_row(
+    session: Session, task_id: int, values: dict, user_id: int, revision: int
+) -> Task | None:
+    statement = (
+        update(Task.__table__)
+        .where(Task.id == task_id, Task.user_id == user_id)
+        .values(**values, revision=revision, updated_at=datetime.utcnow())
+        .returning(*Task.__table__.c)
+    )
+    row = session.exec(statement).first()
+    if row is None:
+        # Updating an archived task brings it back into the task table
+        if not _restore_archived_task(session, task_id, user_id):
+            return None
+        row = session.exec(statement).first()
+
+    if "tags" in values:
+        _replace_task_tags(session, task_id, user_id, values["tags"])
+    return Task(**row._mapping)
+
+
+def patch_mini_tasks(
+    session: Session, task_id: int, operations: list[MiniTaskOperation], user_id: int
+) -> Task | None:
+    """
+    Apply mini-task operations in place with SQLite JSON functions, one UPDATE
+    per operation inside a single transaction, so only the changed keys travel
+    between the app and the database. Returns the updated Task, or None if the
+    task does not exist. Raises ValueError, leaving the task unchanged, if an
+    operation does not apply (e.g. toggling a mini-task that does not exist).
+    """
+    revision = bump_version(session, user_id)
+    now = datetime.utcnow()
+    row = None
+    for operation in operations:
+        value, condition = _mini_task_change(operation)
+        statement = (
+            update(Task.__table__)
+            .where(Task.id == task_id, Task.user_id == user_id, condition)
+            .values(mini_tasks=value, revision=revision, updated_at=now)
+            .returning(*Task.__table__.c)
+        )
+        row = session.exec(statement).first()
+        if row is None and _restore_archived_task(session, task_id, user_id):
+            row = session.exec(statement).first()
+        if row is None:
+            # Read the state the operation saw before undoing earlier operations
+            current = session.exec(
+                select(Task.id, Task.mini_tasks).where(Task.id == task_id, Task.user_id == user_id)
+            ).first()
+            session.rollback()
+            if current is None:
+                return None
+            mini_tasks = current.mini_tasks or {}
+            if operation.op == MiniTaskOp.ADD:
+                raise ValueError(f"Mini-task '{operation.name}' already exists")
+            if operation.op == MiniTaskOp.RENAME and operation.name in mini_tasks:
+                raise ValueError(f"Mini-task '{operation.new_name}' already exists")
+            raise ValueError(f"Mini-task '{operation.name}' does not exist")
     session.commit()
-    session.refresh(db_task)
-    return db_task
+    return Task(**row._mapping)
+
+
+def _mini_task_entries():
+    # Match mini-tasks on the key json_each decodes rather than a JSON path:
+    # json.dumps stores "Café" as "Caf\u00e9", which $."Café" does not match
+    return func.json_each(func.coalesce(Task.mini_tasks, "{}")).table_valued("key", "type")
+
+
+def _mini_task_type(name: str):
+    # JSON type of a mini-task ('true'/'false'), NULL if it does not exist
+    entries = _mini_task_entries()
+    return select(entries.c.type).where(entries.c.key == name).scalar_subquery()
+
+
+def _mini_task_change(operation: MiniTaskOperation):
+    """New mini_tasks value and the precondition of one operation."""
+    mini_tasks = func.coalesce(Task.mini_tasks, "{}")
+    exists = _mini_task_type(operation.name).is_not(None)
+
+    if operation.op == MiniTaskOp.ADD:
+        added = func.json_object(operation.name, func.json("true" if operation.done else "false"))
+        return func.json_patch(mini_tasks, added), _mini_task_type(operation.name).is_(None)
+    if operation.op == MiniTaskOp.RENAME and operation.new_name == operation.name:
+        return mini_tasks, exists
+
+    # Every other operation rebuilds the object so mini-tasks keep their position
+    entries = _mini_task_entries()
+    target = entries.c.key == operation.name
+    key = entries.c.key
+    done = case((entries.c.type == "true", "true"), else_="false")
+    if operation.op == MiniTaskOp.SET:
+        done = case((target, "true" if operation.done else "false"), else_=done)
+    elif operation.op == MiniTaskOp.TOGGLE:
+        done = case((target, case((entries.c.type == "true", "false"), else_="true")), else_=done)
+    elif operation.op == MiniTaskOp.RENAME:
+        key = case((target, operation.new_name), else_=key)
+    rebuilt = select(func.json_group_object(key, func.json(done)))
+
+    if operation.op == MiniTaskOp.REMOVE:
+        # Store NULL rather than an empty object once the last one is removed
+        return func.nullif(rebuilt.where(~target).scalar_subquery(), "{}"), exists
+    if operation.op == MiniTaskOp.RENAME:
+        return rebuilt.scalar_subquery(), and_(exists, _mini_task_type(operation.new_name).is_(None))
+    return rebuilt.scalar_subquery(), exists
 
 
 def delete_task(session: Session, task_id: int, user_id: int) -> bool:
-    db_task = get_task_by_id(session, task_id=task_id, user_id=user_id)
-    if not db_task:
-        return False
+    return bool(delete_tasks(session, [task_id], user_id))
+
+
+def delete_tasks(session: Session, task_ids: list[int], user_id: int) -> list[int]:
+    """
+    Delete the user's tasks among task_ids with one DELETE ... RETURNING and
+    leave a tombstone for each one. Returns the ids that were actually deleted.
+    """
+    revision = bump_version(session, user_id)
+    statement = (
+        delete(Task.__table__)
+        .where(Task.id.in_(task_ids), Task.user_id == user_id)
+        .returning(Task.id)
+    )
+    deleted_ids = list(session.exec(statement).scalars())
+    # Archived tasks already have a tombstone from when they were archived.
+    # Before the task table had AUTOINCREMENT a live task could reuse the id of
+    # an archived one; such an id only deletes the live task
+    archived_ids = list(session.exec(
+        delete(ArchivedTask.__table__)
+        .where(
+            ArchivedTask.id.in_(set(task_ids) - set(deleted_ids)),
+            ArchivedTask.user_id == user_id
+        )
+        .returning(ArchivedTask.id)
+    ).scalars())
+    if not deleted_ids:
+        if archived_ids:
+            session.commit()
+        else:
+            session.rollback()
+        return archived_ids
 
-    session.delete(db_task)
+    session.exec(delete(TaskTag).where(TaskTag.task_id.in_(deleted_ids), TaskTag.user_id == user_id))
+    now = datetime.utcnow()
+    session.exec(insert(TaskTombstone.__table__), params=[
+        {"task_id": task_id, "user_id": user_id, "revision": revision, "deleted_at": now}
+        for task_id in deleted_ids
+    ])
     session.commit()
+    return deleted_ids + archived_ids
+
+
+def get_archived_tasks_page(
+    session: Session, user_id: int, limit: int, before_id: int | None = None
+) -> list[ArchivedTask]:
+    """Archived tasks of the user, newest id first, starting below before_id."""
+    statement = select(ArchivedTask).where(ArchivedTask.user_id == user_id)
+    if before_id is not None:
+        statement = statement.where(ArchivedTask.id < before_id)
+    return session.exec(statement.order_by(ArchivedTask.id.desc()).limit(limit)).all()
+
+
+def archive_completed_tasks(session: Session, completed_before: datetime, batch_size: int = 1000) -> int:
+    """
+    Move tasks completed (last updated) before completed_before from task to
+    task_archive, one transaction per batch. Archived tasks leave tombstones
+    so delta sync clients drop them. Returns the number of tasks archived.
+    """
+    archived = 0
+    task_columns = [column.name for column in Task.__table__.c]
+    while True:
+        rows = session.exec(
+            select(Task.id, Task.user_id)
+            .where(
+                Task.completed.is_(True),
+                Task.updated_at < completed_before,
+                # Stays live if its id was reused from an archived task
+                ~select(ArchivedTask.id).where(ArchivedTask.id == Task.id).exists()
+            )
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            return archived
+
+        task_ids = [row.id for row in rows]
+        now = datetime.utcnow()
+        session.exec(
+            insert(ArchivedTask.__table__).from_select(
+                task_columns + ["archived_at"],
+                select(*Task.__table__.c, literal(now)).where(Task.id.in_(task_ids))
+            )
+        )
+        session.exec(delete(TaskTag).where(TaskTag.task_id.in_(task_ids)))
+        session.exec(delete(Task.__table__).where(Task.id.in_(task_ids)))
+
+        tombstones = []
+        for user_id in {row.user_id for row in rows}:
+            revision = bump_version(session, user_id)
+            tombstones += [
+                {"task_id": row.id, "user_id": user_id, "revision": revision, "deleted_at": now}
+                for row in rows if row.user_id == user_id
+            ]
+        session.exec(insert(TaskTombstone.__table__), params=tombstones)
+        session.commit()
+
+        archived += len(task_ids)
+        if len(rows) < batch_size:
+            return archived
+
+
+def _restore_archived_task(session: Session, task_id: int, user_id: int) -> bool:
+    """
+    Move an archived task back into the task table; the caller commits.
+    Not possible while a live task has reused its id.
+    """
+    if session.exec(select(Task.id).where(Task.id == task_id)).first() is not None:
+        return False
+    row = session.exec(
+        delete(ArchivedTask.__table__)
+        .where(ArchivedTask.id == task_id, ArchivedTask.user_id == user_id)
+        .returning(*ArchivedTask.__table__.c)
+    ).first()
+    if row is None:
+        return False
+
+    values = {key: value for key, value in row._mapping.items() if key in Task.__table__.c}
+    session.exec(insert(Task.__table__).values(**values))
+    _replace_task_tags(session, task_id, user_id, values["tags"])
+    # The task is live again; clients learn that from its next revision
+    session.exec(delete(TaskTombstone).where(TaskTombstone.task_id == task_id))
     return True
+
+
+def get_changes(
+    session: Session, user_id: int, since: int, until: int
+) -> tuple[list[Task], list[int]]:
+    """
+    Tasks written and ids of tasks deleted with a revision in (since, until].
+    since=0 selects every task, including rows written before revisions existed.
+    """
+    statement = select(Task).where(Task.user_id == user_id, Task.revision <= until)
+    if since:
+        statement = statement.where(Task.revision > since)
+    changed = session.exec(statement.order_by(Task.revision, Task.id)).all()
+    deleted = session.exec(
+        select(TaskTombstone.task_id)
+        .where(
+            TaskTombstone.user_id == user_id,
+            TaskTombstone.revision > since,
+            TaskTombstone.revision <= until
+        )
+        .order_by(TaskTombstone.revision, TaskTombstone.task_id)
+    ).all()
+    return changed, list(deleted)
+
+
+def get_version(session: Session, user_id: int) -> int:
+    """Current task data version of a user; 0 before their first write."""
+    version = session.exec(
+        select(UserTaskVersion.version).where(UserTaskVersion.user_id == user_id)
+    ).first()
+    return version or 0
+
+
+def bump_version(session: Session, user_id: int) -> int:
+    """Increment the user's task data version inside the caller's transaction."""
+    statement = (
+        update(UserTaskVersion.__table__)
+        .where(UserTaskVersion.user_id == user_id)
+        .values(version=UserTaskVersion.version + 1)
+        .returning(UserTaskVersion.version)
+    )
+    version = session.exec(statement).scalar()
+    if version is None:
+        version = 1
+        session.exec(insert(UserTaskVersion.__table__).values(user_id=user_id, version=version))
+    return version
+
+
+def backfill_task_tags(session: Session) -> int:
+    """
+    Populate task_tag for tasks created before the table existed.
+    Returns the number of tasks that were indexed.
+    """
+    indexed = select(TaskTag.task_id).distinct()
+    statement = select(Task).where(Task.tags.is_not(None), Task.id.not_in(indexed))
+    count = 0
+    for task in session.exec(statement).all():
+        _replace_task_tags(session, task.id, task.user_id, task.tags)
+        count += 1
+    session.commit()
+    return count
+
+
+def _replace_task_tags(session: Session, task_id: int, user_id: int, tags: list[str] | None) -> None:
+    """Rewrite a task's rows in task_tag; the caller commits."""
+    session.exec(delete(TaskTag).where(TaskTag.task_id == task_id))
+    for tag in dict.fromkeys(tags or []):
+        session.add(TaskTag(task_id=task_id, user_id=user_id, tag=tag))
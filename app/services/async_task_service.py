@@ -0,0 +1,140 @@
+import asyncio
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple, TypeVar, Union
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.models.task_model import Priority
+from app.models.request_models import (
+    TaskResponse, TaskFilters, TaskSort, TagCount, TaskChangesResponse, TaskSearchResult,
+    ArchivedTaskResponse, TaskStats, TaskCounts, MiniTaskOperation, BulkTaskResponse
+)
+from app.repositories import task_repository
+from app.services.task_service import TaskService
+
+T = TypeVar("T")
+
+
+class AsyncTaskService:
+    """
+    TaskService for async handlers. The business logic and task_repository
+    queries are shared with the sync stack and run through AsyncSession.run_sync,
+    so their database I/O goes through the async driver. Building and
+    validating unbounded lists of models runs in a worker thread instead, so
+    it does not hold up the event loop.
+    """
+
+    def __init__(self, db_session: AsyncSession):
+        self.db = db_session
+
+    async def _run(self, method: Callable[..., T], *args, **kwargs) -> T:
+        # Call a TaskService method on the sync session behind the async one
+        return await self.db.run_sync(lambda session: method(TaskService(session), *args, **kwargs))
+
+    async def _query(self, function: Callable[..., T], *args, **kwargs) -> T:
+        # Call a task_repository function on the sync session behind the async one
+        return await self.db.run_sync(lambda session: function(session, *args, **kwargs))
+
+    async def create_task(
+        self,
+        user_id: int,
+        title: str,
+        description: Optional[str] = None,
+        due_date: Optional[datetime] = None,
+        priority: Optional[Priority] = None,
+        tags: Optional[List[str]] = None,
+        mini_tasks: Optional[Dict[str, bool]] = None
+    ) -> TaskResponse:
+        return await self._run(
+            TaskService.create_task, user_id, title, description, due_date, priority, tags, mini_tasks
+        )
+
+    async def get_task_by_id(
+        self, task_id: int, user_id: int, as_dict: bool = False
+    ) -> Union[TaskResponse, Dict[str, Any]]:
+        return await self._run(TaskService.get_task_by_id, task_id, user_id, as_dict=as_dict)
+
+    async def get_tasks_page(
+        self,
+        user_id: int,
+        limit: int,
+        cursor: Optional[str] = None,
+        filters: Optional[TaskFilters] = None,
+        sort: TaskSort = TaskSort.DUE_DATE,
+        as_dicts: bool = False
+    ) -> Tuple[List[Union[TaskResponse, Dict[str, Any]]], Optional[str]]:
+        # Pages are bounded by limit, so they are converted in place
+        return await self._run(
+            TaskService.get_tasks_page, user_id, limit, cursor, filters=filters, sort=sort, as_dicts=as_dicts
+        )
+
+    async def get_all_tasks(
+        self,
+        user_id: int,
+        filters: Optional[TaskFilters] = None,
+        sort: Optional[TaskSort] = None,
+        as_dicts: bool = False
+    ) -> List[Union[TaskResponse, Dict[str, Any]]]:
+        tasks = await self._query(task_repository.get_all_tasks, user_id, filters=filters, sort=sort)
+        return await asyncio.to_thread(TaskService._to_responses, tasks, as_dicts)
+
+    async def get_archived_tasks(
+        self, user_id: int, limit: int, cursor: Optional[str] = None
+    ) -> Tuple[List[ArchivedTaskResponse], Optional[str]]:
+        return await self._run(TaskService.get_archived_tasks, user_id, limit, cursor)
+
+    async def get_data_version(self, user_id: int) -> int:
+        return await self._query(task_repository.get_version, user_id)
+
+    async def get_changes(self, user_id: int, sync_token: Optional[str] = None) -> TaskChangesResponse:
+        changes = await self._run(TaskService.load_changes, user_id, sync_token)
+        return await asyncio.to_thread(TaskService._changes_response, *changes)
+
+    async def get_tag_counts(self, user_id: int) -> List[TagCount]:
+        return await self._run(TaskService.get_tag_counts, user_id)
+
+    async def get_counts(self, user_id: int) -> TaskCounts:
+        return await self._run(TaskService.get_counts, user_id)
+
+    async def get_stats(self, user_id: int) -> TaskStats:
+        return await self._run(TaskService.get_stats, user_id)
+
+    async def search_tasks(self, user_id: int, query: str, limit: int, offset: int = 0) -> List[TaskSearchResult]:
+        return await self._run(TaskService.search_tasks, user_id, query, limit, offset=offset)
+
+    async def update_task(
+        self,
+        task_id: int,
+        user_id: int,
+        title: Optional[str] = None,
+        description: Optional[str] = None,
+        due_date: Optional[datetime] = None,
+        priority: Optional[Priority] = None,
+        completed: Optional[bool] = None,
+        tags: Optional[List[str]] = None,
+        mini_tasks: Optional[Dict[str, bool]] = None
+    ) -> TaskResponse:
+        return await self._run(
+            TaskService.update_task, task_id, user_id, title, description, due_date, priority, completed, tags, mini_tasks
+        )
+
+    async def patch_mini_tasks(
+        self, task_id: int, user_id: int, operations: List[MiniTaskOperation]
+    ) -> TaskResponse:
+        return await self._run(TaskService.patch_mini_tasks, task_id, user_id, operations)
+
+    async def delete_task(self, task_id: int, user_id: int) -> bool:
+        return await self._run(TaskService.delete_task, task_id, user_id)
+
+    async def create_tasks(self, user_id: int, items: List[Dict[str, Any]]) -> BulkTaskResponse:
+        TaskService._check_batch_size(items)
+        results, tasks, indexes = await asyncio.to_thread(TaskService._validate_creates, items)
+        saved_tasks = await self._query(task_repository.create_tasks, tasks, user_id) if tasks else []
+        return TaskService._created_response(results, indexes, saved_tasks)
+
+    async def update_tasks(self, user_id: int, items: List[Dict[str, Any]]) -> BulkTaskResponse:
+        TaskService._check_batch_size(items)
+        results, updates, indexes = await asyncio.to_thread(TaskService._validate_updates, items)
+        updated_tasks = await self._query(task_repository.update_tasks, updates, user_id) if updates else []
+        return TaskService._updated_response(results, indexes, updates, updated_tasks)
+
+    async def delete_tasks(self, user_id: int, task_ids: List[int]) -> BulkTaskResponse:
+        return await self._run(TaskService.delete_tasks, user_id, task_ids)
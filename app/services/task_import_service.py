@@ -0,0 +1,148 @@
+import json
+from typing import Any, Callable, Iterator, List, Optional, TextIO, Tuple
+from pydantic import ValidationError
+from sqlmodel import Session
+from app.core.config import settings
+from app.models.task_model import Task
+from app.models.request_models import (
+    ImportFormat, ImportRecordError, TaskCreateRequest, TaskImportResponse
+)
+from app.repositories import task_repository
+from app.services.task_service import TaskService
+import logging
+logger = logging.getLogger(__name__)
+
+# A record is (1-based position, parsed object or the error that prevented parsing)
+Record = Tuple[int, Any, Optional[str]]
+
+
+def iter_json_records(stream: TextIO, read_size: int = 64 * 1024) -> Iterator[Record]:
+    """
+    Incrementally parse the elements of the first JSON array in the stream,
+    e.g. the "sample_tasks" list of sample_tasks.json, without loading the
+    whole document. Parsing stops at the first malformed record, and at a
+    record longer than import_max_record_size characters.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ""
+    eof = False
+
+    def fill() -> bool:
+        nonlocal buffer, eof
+        data = stream.read(read_size)
+        if not data:
+            eof = True
+            return False
+        buffer += data
+        return True
+
+    # Skip to the opening bracket of the task array
+    while "[" not in buffer:
+        if not fill():
+            yield 1, None, "No JSON array of tasks found"
+            return
+    buffer = buffer[buffer.index("[") + 1:]
+
+    number = 0
+    while True:
+        stripped = buffer.lstrip().lstrip(",").lstrip()
+        if not stripped:
+            buffer = ""
+            if not fill():
+                yield number + 1, None, "Unexpected end of file inside the task array"
+                return
+            continue
+        buffer = stripped
+        if buffer[0] == "]":
+            return
+        try:
+            value, end = decoder.raw_decode(buffer)
+        except json.JSONDecodeError as e:
+            # Reading on only helps when the record was cut off by the end of
+            # the buffer; an error earlier in it is malformed input
+            truncated = len(buffer) - e.pos <= 16 or e.msg.startswith("Unterminated string")
+            if truncated and len(buffer) <= settings.import_max_record_size and not eof and fill():
+                continue
+            yield number + 1, None, f"Invalid JSON: {e.msg}"
+            return
+        number += 1
+        buffer = buffer[end:]
+        yield number, _unwrap(value), None
+
+
+def iter_ndjson_records(stream: TextIO) -> Iterator[Record]:
+    """Parse one JSON task per line; blank lines are skipped."""
+    number = 0
+    for line in stream:
+        if not line.strip():
+            continue
+        number += 1
+        try:
+            yield number, json.loads(line), None
+        except json.JSONDecodeError as e:
+            yield number, None, f"Invalid JSON: {e.msg}"
+
+
+def _unwrap(value: Any) -> Any:
+    # sample_tasks.json wraps every task as {"task_1": {...}}
+    if isinstance(value, dict) and len(value) == 1 and "title" not in value:
+        inner = next(iter(value.values()))
+        if isinstance(inner, dict):
+            return inner
+    return value
+
+
+class TaskImportService:
+
+    def __init__(self, db_session: Session):
+        self.db = db_session
+
+    def import_tasks(
+        self,
+        user_id: int,
+        stream: TextIO,
+        import_format: ImportFormat = ImportFormat.JSON,
+        on_progress: Optional[Callable[[int, int], None]] = None
+    ) -> TaskImportResponse:
+        """
+        Validate and insert tasks from a JSON or NDJSON stream in chunked
+        transactions of import_chunk_size tasks. Invalid records are skipped
+        and reported; on_progress(imported, failed) runs after every chunk.
+        """
+        if import_format == ImportFormat.NDJSON:
+            records = iter_ndjson_records(stream)
+        else:
+            records = iter_json_records(stream)
+
+        imported, failed = 0, 0
+        errors: List[ImportRecordError] = []
+        chunk: List[Task] = []
+
+        def flush():
+            nonlocal imported, chunk
+            if chunk:
+                task_repository.create_tasks(self.db, chunk, user_id)
+                imported += len(chunk)
+                chunk = []
+            if on_progress:
+                on_progress(imported, failed)
+
+        for number, value, parse_error in records:
+            try:
+                if parse_error:
+                    raise ValueError(parse_error)
+                data = TaskCreateRequest.model_validate(value)
+                chunk.append(TaskService._build_task(
+                    data.title, data.description, data.due_date, data.priority, data.tags, data.mini_tasks
+                ))
+            except (ValidationError, ValueError) as e:
+                failed += 1
+                if len(errors) < settings.import_max_reported_errors:
+                    errors.append(ImportRecordError(record=number, error=str(e)))
+                continue
+            if len(chunk) >= settings.import_chunk_size:
+                flush()
+        flush()
+
+        logger.info(f"Imported {imported} tasks for user {user_id}, {failed} records failed")
+        return TaskImportResponse(imported=imported, failed=failed, errors=errors)
@@ -1,13 +1,36 @@
+import base64
+import csv
+import html
+import io
 import json
-from typing import Optional, List, Dict
-from datetime import datetime
+import re
+import orjson
+from typing import Any, Iterator, Optional, List, Dict, Tuple, Union
+from datetime import datetime, time, timedelta
+from pydantic import ValidationError
 from sqlmodel import Session
+from app.core.config import settings
+from app.db.session import use_primary
 from app.models.task_model import Task, Priority
-from app.models.request_models import TaskResponse, TaskUpdateRequest
+from app.models.request_models import (
+    TaskCreateRequest, TaskResponse, TaskUpdateRequest, TaskFilters, TaskSort, TagCount,
+    TaskChangesResponse, TaskSearchResult, ArchivedTaskResponse, TaskStats, TaskCounts, MiniTaskOperation, ExportFormat, BulkItemResult, BulkTaskResponse
+)
 from app.repositories import task_repository
 import logging
 logger = logging.getLogger(__name__)
 
+# Snippet markers that cannot occur in task text; swapped for <mark> tags once
+# the snippet has been HTML-escaped
+SEARCH_HIGHLIGHT = ("\x02", "\x03")
+SEARCH_TERM_PATTERN = re.compile(r"\w+")
+
+EXPORT_CSV_COLUMNS = [
+    "id", "title", "description", "due_date", "completed", "created_at",
+    "updated_at", "priority", "tags", "mini_tasks"
+]
+
+
 class TaskService:
     
     def __init__(self, db_session: Session):
@@ -26,44 +49,17 @@ class TaskService:
         """
         Create a new task with business logic validation
         """
-        # Validate required fields
-        if not title or not title.strip():
-            raise ValueError("Title is required and cannot be empty")
-        
-        if not due_date:
-            raise ValueError("Due date is required")
-        
-        # Convert complex types to JSON strings for storage
-        tags_json = json.dumps(tags) if tags else None
-        mini_tasks_json = json.dumps(mini_tasks) if mini_tasks else None
-        
-        # Create task object
-        task = Task(
-            title=title.strip(),
-            description=description.strip() if description else None,
-            due_date=due_date,
-            priority=priority,
-            tags=tags_json,
-            mini_tasks=mini_tasks_json
-        )
+        task = self._build_task(title, description, due_date, priority, tags, mini_tasks)
         
         # Save via repository
         saved_task = task_repository.create_task(self.db, task, user_id)
         
         # Convert back to response format with proper JSON objects
-        return TaskResponse(
-            id=saved_task.id,
-            title=saved_task.title,
-            description=saved_task.description,
-            due_date=saved_task.due_date,
-            completed=saved_task.completed,
-            created_at=saved_task.created_at,
-            priority=saved_task.priority,
-            tags=json.loads(saved_task.tags) if saved_task.tags else None,
-            mini_tasks=json.loads(saved_task.mini_tasks) if saved_task.mini_tasks else None
-        )
+        return self._to_response(saved_task)
     
-    def get_task_by_id(self, task_id: int, user_id: int) -> TaskResponse:
+    def get_task_by_id(
+        self, task_id: int, user_id: int, as_dict: bool = False
+    ) -> Union[TaskResponse, Dict[str, Any]]:
         """
         Get a task by ID
         """
@@ -71,37 +67,218 @@ class TaskService:
         if not task:
             raise ValueError(f"Task with ID {task_id} not found")
         
-        return TaskResponse(
-            id=task.id,
-            title=task.title,
-            description=task.description,
-            due_date=task.due_date,
-            completed=task.completed,
-            created_at=task.created_at,
-            priority=task.priority,
-            tags=json.loads(task.tags) if task.tags else None,
-            mini_tasks=json.loads(task.mini_tasks) if task.mini_tasks else None
+        return self._to_dict(task) if as_dict else self._to_response(task)
+    
+    def get_tasks_page(
+        self,
+        user_id: int,
+        limit: int,
+        cursor: Optional[str] = None,
+        filters: Optional[TaskFilters] = None,
+        sort: TaskSort = TaskSort.DUE_DATE,
+        as_dicts: bool = False
+    ) -> Tuple[List[Union[TaskResponse, Dict[str, Any]]], Optional[str]]:
+        """
+        Get one page of tasks in the requested order, plus the cursor of the next page.
+        With as_dicts, tasks are returned as plain dicts ready for JSON encoding.
+        """
+        after = self._decode_cursor(cursor, sort) if cursor else None
+        # Fetch one extra row to find out whether another page exists
+        tasks = task_repository.get_tasks_page(
+            self.db, user_id, limit + 1, after, filters=filters, sort=sort
         )
+
+        next_cursor = None
+        if len(tasks) > limit:
+            tasks = tasks[:limit]
+            last = tasks[-1]
+            sort_value = last.created_at if sort in (TaskSort.CREATED_AT, TaskSort.CREATED_AT_DESC) else last.due_date
+            next_cursor = self._encode_cursor(sort, sort_value, last.id)
+
+        return self._to_responses(tasks, as_dicts), next_cursor
+
+    def get_all_tasks(
+        self,
+        user_id: int,
+        filters: Optional[TaskFilters] = None,
+        sort: Optional[TaskSort] = None,
+        as_dicts: bool = False
+    ) -> List[Union[TaskResponse, Dict[str, Any]]]:
+        """
+        Get all tasks, optionally filtered and sorted.
+        With as_dicts, tasks are returned as plain dicts ready for JSON encoding.
+        """
+        tasks = task_repository.get_all_tasks(self.db, user_id, filters=filters, sort=sort)
+        return self._to_responses(tasks, as_dicts)
     
-    def get_all_tasks(self, user_id: int) -> List[TaskResponse]:
+    def get_archived_tasks(
+        self, user_id: int, limit: int, cursor: Optional[str] = None
+    ) -> Tuple[List[ArchivedTaskResponse], Optional[str]]:
+        """
+        Get one page of archived tasks, newest first, plus the cursor of the next page
+        """
+        if cursor is not None and not cursor.isdigit():
+            raise ValueError("Invalid cursor")
+        before_id = int(cursor) if cursor else None
+        tasks = task_repository.get_archived_tasks_page(self.db, user_id, limit + 1, before_id)
+
+        next_cursor = None
+        if len(tasks) > limit:
+            tasks = tasks[:limit]
+            next_cursor = str(tasks[-1].id)
+
+        return [
+            ArchivedTaskResponse(**self._to_response(task).model_dump(), archived_at=task.archived_at)
+            for task in tasks
+        ], next_cursor
+
+    def export_tasks(self, user_id: int, export_format: ExportFormat) -> Iterator[bytes]:
         """
-        Get all tasks
+        Stream every task of the user as NDJSON or CSV, one chunk per batch of rows
         """
-        tasks = task_repository.get_all_tasks(self.db, user_id)
+        batch_size = settings.export_batch_size
+        tasks = task_repository.iter_tasks(self.db, user_id, batch_size=batch_size)
+
+        if export_format == ExportFormat.NDJSON:
+            chunk = []
+            for task in tasks:
+                chunk.append(orjson.dumps(self._to_dict(task)))
+                if len(chunk) == batch_size:
+                    yield b"\n".join(chunk) + b"\n"
+                    chunk = []
+            if chunk:
+                yield b"\n".join(chunk) + b"\n"
+            return
 
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(EXPORT_CSV_COLUMNS)
+        for count, task in enumerate(tasks, start=1):
+            row = self._to_dict(task)
+            row["tags"] = json.dumps(row["tags"]) if row["tags"] else ""
+            row["mini_tasks"] = json.dumps(row["mini_tasks"]) if row["mini_tasks"] else ""
+            row["priority"] = row["priority"].value if row["priority"] else ""
+            writer.writerow([row[column] for column in EXPORT_CSV_COLUMNS])
+            if count % batch_size == 0:
+                yield buffer.getvalue().encode()
+                buffer.seek(0)
+                buffer.truncate()
+        if buffer.tell():
+            yield buffer.getvalue().encode()
+
+    def get_data_version(self, user_id: int) -> int:
+        """
+        Get the user's task data version, which changes on every task write
+        """
+        return task_repository.get_version(self.db, user_id)
+
+    def get_changes(self, user_id: int, sync_token: Optional[str] = None) -> TaskChangesResponse:
+        """
+        Get tasks created, modified or deleted since the sync token was issued.
+        Without a token every task is returned.
+        """
+        return self._changes_response(*self.load_changes(user_id, sync_token))
+
+    def load_changes(
+        self, user_id: int, sync_token: Optional[str] = None
+    ) -> Tuple[List[Task], List[int], int, int]:
+        """
+        Load the rows behind get_changes: changed tasks, deleted ids, and the
+        revisions the token and the new token stand for
+        """
+        current = task_repository.get_version(self.db, user_id)
+        since = self._parse_sync_token(sync_token) if sync_token else 0
+        if since > current and use_primary(self.db):
+            # The token is newer than the replica, which has not caught up yet
+            current = task_repository.get_version(self.db, user_id)
+        if since > current:
+            raise ValueError("Sync token is not valid for this account; resync without a token")
+
+        changed, deleted = task_repository.get_changes(self.db, user_id, since, current)
+        return changed, deleted, since, current
+
+    def get_tag_counts(self, user_id: int) -> List[TagCount]:
+        """
+        Get the number of tasks per tag
+        """
         return [
-            TaskResponse(
-                id=task.id,
-                title=task.title,
-                description=task.description,
-                due_date=task.due_date,
-                completed=task.completed,
-                created_at=task.created_at,
-                priority=task.priority,                tags=json.loads(task.tags) if task.tags else None,
-                mini_tasks=json.loads(task.mini_tasks) if task.mini_tasks else None
-            ) for task in tasks
+            TagCount(tag=tag, count=count)
+            for tag, count in task_repository.get_tag_counts(self.db, user_id)
         ]
-    
+
+    def get_counts(self, user_id: int) -> TaskCounts:
+        """
+        Get task counts by status and priority from the user's counters row,
+        without scanning their tasks
+        """
+        counters = task_repository.get_task_counts(self.db, user_id)
+        total = counters.total if counters else 0
+        completed = counters.completed if counters else 0
+        by_priority = {
+            priority.value: getattr(counters, priority.value) if counters else 0
+            for priority in Priority
+        }
+        by_priority["none"] = total - sum(by_priority.values())
+
+        return TaskCounts(
+            total=total,
+            completed=completed,
+            pending=total - completed,
+            completion_rate=self._percent(completed, total),
+            high_priority_pending=counters.high_pending if counters else 0,
+            by_priority=by_priority
+        )
+
+    def get_stats(self, user_id: int) -> TaskStats:
+        """
+        Get task counts by status, priority and tag, overdue and due-this-week
+        counts and mini-task completion, aggregated by the database
+        """
+        now = datetime.utcnow()
+        week_end = datetime.combine(now.date() + timedelta(days=7 - now.weekday()), time.min)
+        rows = task_repository.get_task_stats(self.db, user_id, now, week_end)
+
+        by_priority = {priority.value: 0 for priority in Priority}
+        by_priority["none"] = 0
+        totals = dict.fromkeys(
+            ["total", "completed", "overdue", "due_this_week", "subtasks_total", "subtasks_completed"], 0
+        )
+        high_priority_pending = 0
+        for row in rows:
+            by_priority[row.priority.value if row.priority else "none"] = row.total
+            if row.priority == Priority.HIGH:
+                high_priority_pending = row.total - row.completed
+            for key in totals:
+                totals[key] += getattr(row, key) or 0
+
+        return TaskStats(
+            **totals,
+            pending=totals["total"] - totals["completed"],
+            completion_rate=self._percent(totals["completed"], totals["total"]),
+            high_priority_pending=high_priority_pending,
+            by_priority=by_priority,
+            subtask_completion_rate=self._percent(totals["subtasks_completed"], totals["subtasks_total"]),
+            tags=self.get_tag_counts(user_id)
+        )
+
+    def search_tasks(self, user_id: int, query: str, limit: int, offset: int = 0) -> List[TaskSearchResult]:
+        """
+        Full-text search over titles, descriptions, sub-tasks and tags.
+        Every word must match, as a prefix; best matches come first.
+        """
+        match = self._build_search_match(query)
+        rows = task_repository.search_tasks(
+            self.db, user_id, match, limit=limit, offset=offset, highlight=SEARCH_HIGHLIGHT
+        )
+        start, end = SEARCH_HIGHLIGHT
+        return [
+            TaskSearchResult(
+                **self._to_response(task).model_dump(),
+                snippet=html.escape(snippet).replace(start, "<mark>").replace(end, "</mark>")
+            )
+            for task, snippet in rows
+        ]
+
     def update_task(
         self,
         task_id: int,
@@ -117,6 +294,172 @@ class TaskService:
         """
         Update an existing task
         """
+        task_update = self._build_update(
+            title, description, due_date, priority, completed, tags, mini_tasks
+        )
+        
+        updated_task = task_repository.update_task(
+            session=self.db, 
+            task_id=task_id, 
+            task_update=task_update, 
+            user_id=user_id
+        )
+
+        if not updated_task:
+            raise ValueError(f"Task with ID {task_id} not found")
+        
+        return self._to_response(updated_task)
+    
+    def patch_mini_tasks(
+        self, task_id: int, user_id: int, operations: List[MiniTaskOperation]
+    ) -> TaskResponse:
+        """
+        Add, remove, toggle, set or rename mini-tasks without resending the checklist
+        """
+        updated_task = task_repository.patch_mini_tasks(self.db, task_id, operations, user_id)
+        if not updated_task:
+            raise ValueError(f"Task with ID {task_id} not found")
+
+        return self._to_response(updated_task)
+
+    def delete_task(self, task_id: int, user_id: int) -> bool:
+        """
+        Delete a task by ID
+        """
+        success = task_repository.delete_task(self.db, task_id, user_id)
+        return success
+
+    def create_tasks(self, user_id: int, items: List[Dict[str, Any]]) -> BulkTaskResponse:
+        """
+        Create many tasks in one transaction, validating each item on its own
+        """
+        self._check_batch_size(items)
+        results, tasks, indexes = self._validate_creates(items)
+        saved_tasks = task_repository.create_tasks(self.db, tasks, user_id) if tasks else []
+        return self._created_response(results, indexes, saved_tasks)
+
+    @staticmethod
+    def _validate_creates(
+        items: List[Dict[str, Any]]
+    ) -> Tuple[List[Optional[BulkItemResult]], List[Task], List[int]]:
+        # Per-item results so far (errors), the valid tasks and their indexes
+        results: List[Optional[BulkItemResult]] = [None] * len(items)
+        tasks, indexes = [], []
+        for index, item in enumerate(items):
+            try:
+                data = TaskCreateRequest.model_validate(item)
+                tasks.append(TaskService._build_task(
+                    data.title, data.description, data.due_date, data.priority, data.tags, data.mini_tasks
+                ))
+                indexes.append(index)
+            except (ValidationError, ValueError) as e:
+                results[index] = BulkItemResult(index=index, status="error", error=str(e))
+        return results, tasks, indexes
+
+    @staticmethod
+    def _created_response(
+        results: List[Optional[BulkItemResult]], indexes: List[int], saved_tasks: List[Task]
+    ) -> BulkTaskResponse:
+        for index, saved_task in zip(indexes, saved_tasks):
+            results[index] = BulkItemResult(index=index, id=saved_task.id, status="created")
+        return TaskService._bulk_response(results)
+
+    def update_tasks(self, user_id: int, items: List[Dict[str, Any]]) -> BulkTaskResponse:
+        """
+        Update many tasks in one transaction; every item needs an "id"
+        """
+        self._check_batch_size(items)
+        results, updates, indexes = self._validate_updates(items)
+        updated_tasks = task_repository.update_tasks(self.db, updates, user_id) if updates else []
+        return self._updated_response(results, indexes, updates, updated_tasks)
+
+    @staticmethod
+    def _validate_updates(
+        items: List[Dict[str, Any]]
+    ) -> Tuple[List[Optional[BulkItemResult]], List[Tuple[int, TaskUpdateRequest]], List[int]]:
+        # Per-item results so far (errors), the valid (id, update) pairs and their indexes
+        results: List[Optional[BulkItemResult]] = [None] * len(items)
+        updates, indexes = [], []
+        for index, item in enumerate(items):
+            try:
+                task_id = item.get("id") if isinstance(item, dict) else None
+                if not isinstance(task_id, int):
+                    raise ValueError("Each item needs an integer 'id'")
+                data = TaskUpdateRequest.model_validate({k: v for k, v in item.items() if k != "id"})
+                updates.append((task_id, TaskService._build_update(
+                    data.title, data.description, data.due_date, data.priority,
+                    data.completed, data.tags, data.mini_tasks
+                )))
+                indexes.append(index)
+            except (ValidationError, ValueError) as e:
+                results[index] = BulkItemResult(index=index, status="error", error=str(e))
+        return results, updates, indexes
+
+    @staticmethod
+    def _updated_response(
+        results: List[Optional[BulkItemResult]],
+        indexes: List[int],
+        updates: List[Tuple[int, TaskUpdateRequest]],
+        updated_tasks: List[Optional[Task]]
+    ) -> BulkTaskResponse:
+        for index, (task_id, _), updated_task in zip(indexes, updates, updated_tasks):
+            if updated_task is None:
+                results[index] = BulkItemResult(
+                    index=index, id=task_id, status="error", error=f"Task with ID {task_id} not found"
+                )
+            else:
+                results[index] = BulkItemResult(index=index, id=task_id, status="updated")
+        return TaskService._bulk_response(results)
+
+    def delete_tasks(self, user_id: int, task_ids: List[int]) -> BulkTaskResponse:
+        """
+        Delete many tasks with one statement
+        """
+        self._check_batch_size(task_ids)
+        deleted = set(task_repository.delete_tasks(self.db, task_ids, user_id)) if task_ids else set()
+        results = [
+            BulkItemResult(index=index, id=task_id, status="deleted")
+            if task_id in deleted
+            else BulkItemResult(index=index, id=task_id, status="error", error=f"Task with ID {task_id} not found")
+            for index, task_id in enumerate(task_ids)
+        ]
+        return self._bulk_response(results)
+
+    @staticmethod
+    def _build_task(
+        title: str,
+        description: Optional[str],
+        due_date: Optional[datetime],
+        priority: Optional[Priority],
+        tags: Optional[List[str]],
+        mini_tasks: Optional[Dict[str, bool]]
+    ) -> Task:
+        # Validate required fields
+        if not title or not title.strip():
+            raise ValueError("Title is required and cannot be empty")
+        
+        if not due_date:
+            raise ValueError("Due date is required")
+        
+        return Task(
+            title=title.strip(),
+            description=description.strip() if description else None,
+            due_date=due_date,
+            priority=priority,
+            tags=tags or None,
+            mini_tasks=mini_tasks or None
+        )
+
+    @staticmethod
+    def _build_update(
+        title: Optional[str],
+        description: Optional[str],
+        due_date: Optional[datetime],
+        priority: Optional[Priority],
+        completed: Optional[bool],
+        tags: Optional[List[str]],
+        mini_tasks: Optional[Dict[str, bool]]
+    ) -> TaskUpdateRequest:
         if title is not None and not title.strip():
             raise ValueError("Title cannot be empty")
 
@@ -133,37 +476,102 @@ class TaskService:
         if completed is not None:
             update_data["completed"] = completed
         if tags is not None:
-            update_data["tags"] = json.dumps(tags) if tags else None
+            update_data["tags"] = tags or None
         if mini_tasks is not None:
-            update_data["mini_tasks"] = json.dumps(mini_tasks) if mini_tasks else None
+            update_data["mini_tasks"] = mini_tasks or None
 
-        task_update = TaskUpdateRequest(**update_data)
-        
-        updated_task = task_repository.update_task(
-            session=self.db, 
-            task_id=task_id, 
-            task_update=task_update, 
-            user_id=user_id
-        )
+        return TaskUpdateRequest(**update_data)
 
-        if not updated_task:
-            raise ValueError(f"Task with ID {task_id} not found")
-        
+    @staticmethod
+    def _check_batch_size(items: list) -> None:
+        if len(items) > settings.bulk_max_items:
+            raise ValueError(f"A bulk request can contain at most {settings.bulk_max_items} items")
+
+    @staticmethod
+    def _bulk_response(results: List[BulkItemResult]) -> BulkTaskResponse:
+        failed = sum(1 for result in results if result.status == "error")
+        return BulkTaskResponse(succeeded=len(results) - failed, failed=failed, results=results)
+
+    @staticmethod
+    def _to_response(task: Task) -> TaskResponse:
         return TaskResponse(
-            id=updated_task.id,
-            title=updated_task.title,
-            description=updated_task.description,
-            due_date=updated_task.due_date,
-            completed=updated_task.completed,
-            created_at=updated_task.created_at,
-            priority=updated_task.priority,
-            tags=json.loads(updated_task.tags) if updated_task.tags else None,
-            mini_tasks=json.loads(updated_task.mini_tasks) if updated_task.mini_tasks else None
+            id=task.id,
+            title=task.title,
+            description=task.description,
+            due_date=task.due_date,
+            completed=task.completed,
+            created_at=task.created_at,
+            updated_at=task.updated_at,
+            priority=task.priority,
+            tags=task.tags,
+            mini_tasks=task.mini_tasks
         )
-    
-    def delete_task(self, task_id: int, user_id: int) -> bool:
-        """
-        Delete a task by ID
-        """
-        success = task_repository.delete_task(self.db, task_id, user_id)
-        return success
+
+    @staticmethod
+    def _to_responses(tasks: List[Task], as_dicts: bool = False) -> List[Union[TaskResponse, Dict[str, Any]]]:
+        convert = TaskService._to_dict if as_dicts else TaskService._to_response
+        return [convert(task) for task in tasks]
+
+    @staticmethod
+    def _changes_response(
+        changed: List[Task], deleted: List[int], since: int, current: int
+    ) -> TaskChangesResponse:
+        return TaskChangesResponse(
+            changed=[TaskService._to_response(task) for task in changed],
+            deleted=deleted if since else [],
+            sync_token=str(current)
+        )
+
+    @staticmethod
+    def _to_dict(task: Task) -> Dict[str, Any]:
+        # Same shape as TaskResponse, without pydantic validation
+        return {
+            "id": task.id,
+            "title": task.title,
+            "description": task.description,
+            "due_date": task.due_date,
+            "completed": task.completed,
+            "created_at": task.created_at,
+            "updated_at": task.updated_at,
+            "priority": task.priority,
+            "tags": task.tags,
+            "mini_tasks": task.mini_tasks
+        }
+
+    @staticmethod
+    def _percent(part: int, whole: int) -> float:
+        return round(part / whole * 100, 1) if whole else 0
+
+    @staticmethod
+    def _build_search_match(query: str) -> str:
+        # Quote every word so FTS5 operators and punctuation in user input are
+        # never interpreted; "term"* is a prefix query served by the prefix index
+        terms = SEARCH_TERM_PATTERN.findall(query)
+        if not terms:
+            raise ValueError("Search query must contain at least one word")
+        return " ".join(f'"{term}"*' for term in terms)
+
+    @staticmethod
+    def _parse_sync_token(sync_token: str) -> int:
+        if not sync_token.isdigit():
+            raise ValueError("Invalid sync token")
+        return int(sync_token)
+
+    @staticmethod
+    def _encode_cursor(sort: TaskSort, value: Optional[datetime], task_id: int) -> str:
+        payload = {"s": sort.value, "v": value.isoformat() if value else None, "i": task_id}
+        raw = json.dumps(payload, separators=(",", ":")).encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+    @staticmethod
+    def _decode_cursor(cursor: str, sort: TaskSort) -> Tuple[Optional[datetime], int]:
+        try:
+            raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+            payload = json.loads(raw)
+            value = datetime.fromisoformat(payload["v"]) if payload["v"] else None
+            cursor_sort, task_id = payload["s"], int(payload["i"])
+        except (ValueError, KeyError, TypeError):
+            raise ValueError("Invalid pagination cursor")
+        if cursor_sort != sort.value:
+            raise ValueError("Pagination cursor does not match the requested sort order")
+        return value, task_id
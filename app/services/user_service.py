@@ -1,17 +1,29 @@
 import logging
-from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
 from fastapi import HTTPException, status
 from app.schemas.user_schema import UserCreate
-from app.repositories import user_repository
+from app.repositories import async_user_repository, refresh_token_repository
 from app.core.security import create_access_token
+from app.core.password_hasher import PasswordHasherBusy
 from app.models.user_model import User
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def register_new_user(session: Session, user_create: UserCreate) -> User:
+# Seconds a client is asked to wait when password hashing is saturated
+HASHER_RETRY_AFTER = 1
+
+
+def _hasher_busy() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Too many concurrent sign-ins, please retry shortly",
+        headers={"Retry-After": str(HASHER_RETRY_AFTER)},
+    )
+
+async def register_new_user(session: AsyncSession, user_create: UserCreate) -> User:
     """Business logic to register a new user."""
-    db_user = user_repository.get_user_by_username(session, username=user_create.username)
+    db_user = await async_user_repository.get_user_by_username(session, username=user_create.username)
     if db_user:
         logger.warning(f"Registration attempt for existing username: {user_create.username}")
         raise HTTPException(
@@ -19,15 +31,21 @@ def register_new_user(session: Session, user_create: UserCreate) -> User:
             detail="Username already exists"
         )
     
-    new_user = user_repository.create_user(session, user_create=user_create)
+    try:
+        new_user = await async_user_repository.create_user(session, user_create=user_create)
+    except PasswordHasherBusy:
+        raise _hasher_busy()
     logger.info(f"New user registered: {new_user.username} (ID: {new_user.id})")
     return new_user
 
-def login_for_access_token(session: Session, form_data) -> dict:
+async def login_for_access_token(session: AsyncSession, form_data) -> dict:
     """Business logic to authenticate user and create access token."""
-    user = user_repository.authenticate_user(
-        session, username=form_data.username, password=form_data.password
-    )
+    try:
+        user = await async_user_repository.authenticate_user(
+            session, username=form_data.username, password=form_data.password
+        )
+    except PasswordHasherBusy:
+        raise _hasher_busy()
     if not user:
         logger.warning(f"Failed login attempt for username: {form_data.username}")
         raise HTTPException(
@@ -39,5 +57,29 @@ def login_for_access_token(session: Session, form_data) -> dict:
     access_token = create_access_token(
         data={"sub": user.username, "id": user.id}
     )
+    refresh_token = await refresh_token_repository.create_refresh_token(session, user_id=user.id)
     logger.info(f"User logged in successfully: {user.username}")
-    return {"access_token": access_token, "token_type": "bearer"}
+    return {"access_token": access_token, "token_type": "bearer", "refresh_token": refresh_token}
+
+async def refresh_access_token(session: AsyncSession, refresh_token: str) -> dict:
+    """Business logic to exchange a refresh token for a new access token and refresh token."""
+    rotated = await refresh_token_repository.rotate_refresh_token(session, token=refresh_token)
+    user = await async_user_repository.get_user_by_id(session, user_id=rotated[0]) if rotated else None
+    if not user:
+        logger.warning("Refresh attempted with an invalid, expired or revoked token")
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid refresh token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+    access_token = create_access_token(
+        data={"sub": user.username, "id": user.id}
+    )
+    logger.info(f"Access token refreshed for user: {user.username}")
+    return {"access_token": access_token, "token_type": "bearer", "refresh_token": rotated[1]}
+
+async def logout(session: AsyncSession, refresh_token: str) -> None:
+    """Business logic to revoke a refresh token along with every token rotated from the same login."""
+    if await refresh_token_repository.revoke_refresh_token(session, token=refresh_token):
+        logger.info("Refresh token revoked")
@@ -12,6 +12,11 @@ sys.path.insert(0, str(app_dir))
 # Test database configuration
 TEST_DATABASE_URL = "sqlite:///./test_taskpilot.db"
 
+# Read when app.db.session is imported, which test modules do at collection.
+# Pooled async connections are tied to the event loop that opened them, and
+# the test client runs a new loop for every request
+os.environ["DB_ASYNC_NULL_POOL"] = "true"
+
 @pytest.fixture(scope="session", autouse=True)
 def setup_test_environment():
     """Setup test environment before running tests"""
@@ -36,17 +41,43 @@ def clean_database():
     from app.db.session import engine
     from app.models.task_model import Task
     from app.models.user_model import User
+    from app.cache.user_cache import user_cache
+    from app.api.dependencies import token_cache
+    from app.api.rate_limit import memory_buckets, agent_in_flight
     from sqlmodel import SQLModel
     
     # Recreate all tables for each test
     SQLModel.metadata.drop_all(engine)
     SQLModel.metadata.create_all(engine)
+    # User ids are reused once the tables are recreated
+    user_cache.clear()
+    token_cache.clear()
+    memory_buckets.clear()
+    agent_in_flight.clear()
     
     yield
-    
+
     # Cleanup after each test if needed
     pass
 
+@pytest.fixture
+def make_auth_headers():
+    """Register and login a user, returning its authentication headers"""
+    from fastapi.testclient import TestClient
+    from app.main import app
+
+    client = TestClient(app)
+
+    def _make_auth_headers(username, password="testpassword123"):
+        user_data = {"username": username, "password": password}
+        client.post("/api/users/register", json=user_data)
+        response = client.post("/api/users/login", data=user_data)
+        token = response.json()["access_token"]
+
+        return {"Authorization": f"Bearer {token}"}
+
+    return _make_auth_headers
+
 # Pytest configuration
 pytest_plugins = []
 
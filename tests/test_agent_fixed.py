@@ -104,6 +104,31 @@ class TestAIAgent:
             # Should return some message about no tasks
             assert "no tasks" in str(data).lower() or "empty" in str(data).lower() or "summary" in data
 
+    def test_agent_rate_limit(self, auth_headers, monkeypatch):
+        """Test that AI calls beyond the per-user rate get 429 with Retry-After"""
+        from app.core.config import settings
+        monkeypatch.setattr(settings, "rate_limit_agent", "2/minute")
+
+        assert client.get("/api/agent/summary", headers=auth_headers).status_code == 200
+        assert client.get("/api/agent/recommendations", headers=auth_headers).status_code == 200
+        response = client.get("/api/agent/summary", headers=auth_headers)
+        assert response.status_code == 429
+        assert int(response.headers["Retry-After"]) > 0
+
+    def test_agent_in_flight_limit(self, auth_headers, monkeypatch):
+        """Test that a user cannot start more concurrent AI calls than allowed"""
+        from app.core.config import settings
+        from app.api.rate_limit import agent_in_flight
+        from app.api.dependencies import decode_token
+        user_id = decode_token(auth_headers["Authorization"].split()[1]).id
+
+        assert agent_in_flight.acquire(user_id, settings.agent_max_in_flight_per_user)
+        response = client.get("/api/agent/summary", headers=auth_headers)
+        assert response.status_code == 429
+        assert response.headers["Retry-After"] == "1"
+        agent_in_flight.release(user_id)
+        assert client.get("/api/agent/summary", headers=auth_headers).status_code == 200
+
 class TestMultiUserIsolation:
     """Test suite to ensure users can only access their own data"""
     
@@ -214,3 +239,29 @@ class TestMultiUserIsolation:
         assert response.status_code == 200
         task = response.json()
         assert task["title"] == "Original Task"
+
+
+class TestPromptFormatting:
+    """Test suite for the task details included in AI prompts"""
+
+    def test_format_task_details_includes_tags_and_subtasks(self):
+        """Test that decoded tags and mini-tasks are rendered in the prompt"""
+        from datetime import datetime
+        from app.agents.gpt_agent import format_task_details
+        from app.models.request_models import TaskResponse
+
+        task = TaskResponse(
+            id=1,
+            title="Release",
+            due_date=datetime(2030, 1, 1),
+            completed=False,
+            created_at=datetime(2025, 1, 1),
+            priority="high",
+            tags=["devops", "urgent"],
+            mini_tasks={"Tag build": True, "Publish notes": False}
+        )
+        details = format_task_details(task)
+
+        assert "Tags: devops, urgent" in details
+        assert "Sub-tasks: 1/2 completed" in details
+        assert "Publish notes" in details
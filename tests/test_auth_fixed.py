@@ -87,3 +87,180 @@ class TestUserAuthentication:
         headers = {"Authorization": "Bearer invalid-token"}
         response = client.get("/api/tasks/", headers=headers)
         assert response.status_code == 401
+
+    def test_current_user_is_cached_until_invalidated(self, test_user_data):
+        """Test that authenticated requests reuse the cached user until it is deleted"""
+        from sqlmodel import Session
+        from app.db.session import engine
+        from app.models.user_model import User
+        from app.cache.user_cache import user_cache
+
+        user_id = client.post("/api/users/register", json=test_user_data).json()["id"]
+        token = client.post("/api/users/login", data=test_user_data).json()["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+
+        assert client.get("/api/tasks/", headers=headers).status_code == 200
+        assert client.get("/api/tasks/", headers=headers).status_code == 200
+        assert user_cache.stats()["hits"] == 1
+
+        with Session(engine) as session:
+            session.delete(session.get(User, user_id))
+            session.commit()
+        assert user_cache.get(user_id) is None
+        assert client.get("/api/tasks/", headers=headers).status_code == 401
+
+    def test_verified_tokens_are_cached(self, test_user_data, monkeypatch):
+        """Test that a token is verified once and expired tokens are never cached"""
+        from datetime import timedelta
+        from app.core.config import settings
+        from app.core.security import create_access_token
+        from app.api.dependencies import token_cache
+
+        client.post("/api/users/register", json=test_user_data)
+        token = client.post("/api/users/login", data=test_user_data).json()["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+        client.get("/api/tasks/", headers=headers)
+        client.get("/api/tasks/", headers=headers)
+        assert token_cache.stats()["hits"] == 1
+        assert token_cache.stats()["size"] == 1
+        auth_stats = client.get("/api/agent/cache/stats").json()["auth_cache_stats"]
+        assert auth_stats["tokens"]["hits"] == 1
+        assert auth_stats["users"]["hits"] == 1
+
+        expired = create_access_token({"sub": test_user_data["username"], "id": 1}, timedelta(seconds=-1))
+        response = client.get("/api/tasks/", headers={"Authorization": f"Bearer {expired}"})
+        assert response.status_code == 401
+        assert token_cache.stats()["size"] == 1
+
+        monkeypatch.setattr(settings, "token_cache_enabled", False)
+        client.get("/api/tasks/", headers=headers)
+        assert token_cache.stats()["hits"] == 1
+
+    def test_login_rehashes_password_when_cost_changes(self, test_user_data, monkeypatch):
+        """Test that a login upgrades a hash made with another bcrypt cost"""
+        from sqlmodel import Session
+        from app.db.session import engine
+        from app.models.user_model import User
+        from app.core.config import settings
+
+        user_id = client.post("/api/users/register", json=test_user_data).json()["id"]
+        monkeypatch.setattr(settings, "bcrypt_rounds", 4)
+        assert client.post("/api/users/login", data=test_user_data).status_code == 200
+        with Session(engine) as session:
+            hashed_password = session.get(User, user_id).hashed_password
+        assert hashed_password.startswith("$2b$04$")
+        assert client.post("/api/users/login", data=test_user_data).status_code == 200
+
+    def test_login_rejected_when_hashing_is_saturated(self, test_user_data, monkeypatch):
+        """Test that logins fail fast with 503 when the hashing queue is full"""
+        from app.core.password_hasher import password_hasher
+
+        client.post("/api/users/register", json=test_user_data)
+        capacity = max(password_hasher.workers, 1) + password_hasher.queue_depth
+        monkeypatch.setattr(password_hasher, "_in_flight", capacity)
+        response = client.post("/api/users/login", data=test_user_data)
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == "1"
+
+    def test_hashing_workers_are_not_forked(self):
+        """Test that hashing workers start from a fresh process rather than a fork"""
+        import asyncio
+        from app.core.password_hasher import PasswordHasher
+        from app.core.security import pwd_context
+        hasher = PasswordHasher(workers=1, queue_depth=0)
+        try:
+            hashed = asyncio.run(hasher.hash("forkpassword123"))
+            assert hasher._get_executor()._mp_context.get_start_method() in ("forkserver", "spawn")
+        finally:
+            hasher.shutdown()
+        assert pwd_context.verify("forkpassword123", hashed)
+
+    def test_refresh_token_rotation_and_reuse(self, test_user_data):
+        """Test that refresh tokens rotate and that reusing an old one revokes the login"""
+        client.post("/api/users/register", json=test_user_data)
+        login = client.post("/api/users/login", data=test_user_data).json()
+        first_refresh = login["refresh_token"]
+
+        response = client.post("/api/users/refresh", json={"refresh_token": first_refresh})
+        assert response.status_code == 200
+        refreshed = response.json()
+        assert refreshed["refresh_token"] != first_refresh
+        headers = {"Authorization": f"Bearer {refreshed['access_token']}"}
+        assert client.get("/api/tasks/", headers=headers).status_code == 200
+
+        # The replaced token is rejected, and its reuse revokes its successor too
+        assert client.post("/api/users/refresh", json={"refresh_token": first_refresh}).status_code == 401
+        assert client.post("/api/users/refresh", json={"refresh_token": refreshed["refresh_token"]}).status_code == 401
+        assert client.post("/api/users/refresh", json={"refresh_token": "unknown"}).status_code == 401
+
+    def test_logout_revokes_refresh_token(self, test_user_data):
+        """Test that logout revokes only the login it belongs to"""
+        client.post("/api/users/register", json=test_user_data)
+        first = client.post("/api/users/login", data=test_user_data).json()["refresh_token"]
+        second = client.post("/api/users/login", data=test_user_data).json()["refresh_token"]
+
+        assert client.post("/api/users/logout", json={"refresh_token": first}).status_code == 204
+        assert client.post("/api/users/refresh", json={"refresh_token": first}).status_code == 401
+        assert client.post("/api/users/refresh", json={"refresh_token": second}).status_code == 200
+
+    def test_password_change_revokes_refresh_tokens(self, test_user_data, monkeypatch):
+        """Test that refresh tokens survive a bcrypt rehash but not a new password"""
+        from sqlmodel import Session
+        from app.db.session import engine
+        from app.models.user_model import User
+        from app.core.config import settings
+
+        user_id = client.post("/api/users/register", json=test_user_data).json()["id"]
+        first = client.post("/api/users/login", data=test_user_data).json()["refresh_token"]
+        monkeypatch.setattr(settings, "bcrypt_rounds", 4)
+        second = client.post("/api/users/login", data=test_user_data).json()["refresh_token"]
+        first = client.post("/api/users/refresh", json={"refresh_token": first}).json()["refresh_token"]
+
+        with Session(engine) as session:
+            user = session.get(User, user_id)
+            user.hashed_password = "new-password-hash"
+            session.commit()
+        assert client.post("/api/users/refresh", json={"refresh_token": first}).status_code == 401
+        assert client.post("/api/users/refresh", json={"refresh_token": second}).status_code == 401
+
+    def test_login_rate_limit(self, test_user_data, monkeypatch):
+        """Test that logins from one client beyond the configured rate get 429"""
+        from app.core.config import settings
+        monkeypatch.setattr(settings, "rate_limit_login", "2/minute")
+
+        client.post("/api/users/register", json=test_user_data)
+        assert client.post("/api/users/login", data=test_user_data).status_code == 200
+        assert client.post("/api/users/login", data={**test_user_data, "password": "wrong"}).status_code == 401
+        response = client.post("/api/users/login", data=test_user_data)
+        assert response.status_code == 429
+        assert 0 < int(response.headers["Retry-After"]) <= 30
+
+        monkeypatch.setattr(settings, "rate_limit_enabled", False)
+        assert client.post("/api/users/login", data=test_user_data).status_code == 200
+
+    def test_login_rate_limit_behind_trusted_proxy(self, test_user_data, monkeypatch):
+        """Test that clients behind a trusted proxy are limited by their forwarded IP"""
+        from app.core.config import settings
+        monkeypatch.setattr(settings, "rate_limit_login", "1/minute")
+        monkeypatch.setattr(settings, "trusted_proxies", ["172.28.0.10"])
+
+        async def behind_proxy(scope, receive, send):
+            # Every request reaches the app from the proxy's address
+            await app({**scope, "client": ("172.28.0.10", 50000)}, receive, send)
+
+        proxied = TestClient(behind_proxy)
+        client.post("/api/users/register", json=test_user_data)
+
+        def login(forwarded_for):
+            headers = {"X-Forwarded-For": forwarded_for}
+            return proxied.post("/api/users/login", data=test_user_data, headers=headers).status_code
+
+        assert login("198.51.100.1") == 200
+        assert login("198.51.100.2") == 200
+        assert login("198.51.100.1") == 429
+        # Only the hop the proxy appended counts; a forged address to its left does not
+        assert login("203.0.113.7, 198.51.100.2") == 429
+
+        # From an untrusted peer the header is ignored
+        assert client.post("/api/users/login", data=test_user_data, headers={"X-Forwarded-For": "198.51.100.3"}).status_code == 200
+        assert client.post("/api/users/login", data=test_user_data, headers={"X-Forwarded-For": "198.51.100.4"}).status_code == 429
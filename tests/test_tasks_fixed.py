@@ -14,23 +14,9 @@ class TestTaskManagement:
     """Test suite for task CRUD operations"""
     
     @pytest.fixture
-    def auth_headers(self):
+    def auth_headers(self, make_auth_headers):
         """Get authentication headers for testing"""
-        # Register and login a test user
-        user_data = {
-            "username": "taskuser",
-            "password": "taskpassword123"
-        }
-        client.post("/api/users/register", json=user_data)
-        
-        login_data = {
-            "username": user_data["username"],
-            "password": user_data["password"]
-        }
-        response = client.post("/api/users/login", data=login_data)
-        token = response.json()["access_token"]
-        
-        return {"Authorization": f"Bearer {token}"}
+        return make_auth_headers("taskuser")
     
     @pytest.fixture
     def sample_task_data(self):
@@ -130,6 +116,20 @@ class TestTaskManagement:
         assert set(data["tags"]) == set(update_data["tags"])
         assert data["mini_tasks"] == update_data["mini_tasks"]
     
+    def test_update_task_with_empty_body(self, auth_headers, sample_task_data):
+        """Test that an update without fields returns the task unchanged"""
+        create_response = client.post("/api/tasks/", json=sample_task_data, headers=auth_headers)
+        task = create_response.json()
+
+        response = client.put(f"/api/tasks/{task['id']}", json={}, headers=auth_headers)
+        assert response.status_code == 200
+        assert response.json() == task
+
+    def test_update_nonexistent_task(self, auth_headers):
+        """Test updating a non-existent task returns 404"""
+        response = client.put("/api/tasks/99999", json={"completed": True}, headers=auth_headers)
+        assert response.status_code == 404
+
     def test_delete_task(self, auth_headers, sample_task_data):
         """Test deleting a task"""
         # Create a task first
@@ -176,3 +176,1216 @@ class TestTaskManagement:
         }
         response = client.post("/api/tasks/", json=invalid_task, headers=auth_headers)
         assert response.status_code == 400  # Your app returns 400
+
+
+class TestTaskPagination:
+    """Test suite for cursor-based pagination of the task list"""
+
+    @pytest.fixture
+    def auth_headers(self, make_auth_headers):
+        """Get authentication headers for testing"""
+        return make_auth_headers("pageuser")
+
+    @pytest.fixture
+    def five_tasks(self, auth_headers):
+        """Create five tasks, two of them sharing a due date"""
+        due_dates = [
+            "2025-12-05T10:00:00",
+            "2025-12-01T10:00:00",
+            "2025-12-03T10:00:00",
+            "2025-12-03T10:00:00",
+            "2025-12-02T10:00:00",
+        ]
+        for i, due_date in enumerate(due_dates):
+            client.post(
+                "/api/tasks/",
+                json={"title": f"Task {i}", "due_date": due_date},
+                headers=auth_headers
+            )
+
+    def test_pages_cover_all_tasks_in_due_date_order(self, auth_headers, five_tasks):
+        """Test that following cursors returns every task exactly once, in order"""
+        seen = []
+        cursor = None
+        pages = 0
+        while True:
+            params = {"limit": 2}
+            if cursor:
+                params["cursor"] = cursor
+            response = client.get("/api/tasks/", params=params, headers=auth_headers)
+            assert response.status_code == 200
+            page = response.json()
+            assert len(page) <= 2
+            seen.extend(page)
+            pages += 1
+            cursor = response.headers.get("X-Next-Cursor")
+            if not cursor:
+                break
+
+        assert pages == 3
+        assert len({task["id"] for task in seen}) == 5
+        due_dates = [task["due_date"] for task in seen]
+        assert due_dates == sorted(due_dates)
+
+    def test_unpaginated_request_returns_everything(self, auth_headers, five_tasks):
+        """Test that omitting limit keeps returning the full list"""
+        response = client.get("/api/tasks/", headers=auth_headers)
+        assert response.status_code == 200
+        assert len(response.json()) == 5
+        assert "X-Next-Cursor" not in response.headers
+
+    def test_invalid_cursor(self, auth_headers):
+        """Test that a malformed cursor is rejected"""
+        response = client.get(
+            "/api/tasks/", params={"limit": 2, "cursor": "not-a-cursor"}, headers=auth_headers
+        )
+        assert response.status_code == 400
+
+
+class TestTaskFiltering:
+    """Test suite for server-side filtering and sorting of the task list"""
+
+    @pytest.fixture
+    def auth_headers(self, make_auth_headers):
+        """Get authentication headers for testing"""
+        return make_auth_headers("filteruser")
+
+    @pytest.fixture
+    def mixed_tasks(self, auth_headers):
+        """Create tasks with different priorities, due dates and completion states"""
+        tasks = [
+            {"title": "Old high", "due_date": "2020-01-01T09:00:00", "priority": "high"},
+            {"title": "Future high", "due_date": "2030-01-01T09:00:00", "priority": "high"},
+            {"title": "Future low", "due_date": "2030-06-01T09:00:00", "priority": "low"},
+        ]
+        ids = []
+        for task in tasks:
+            response = client.post("/api/tasks/", json=task, headers=auth_headers)
+            ids.append(response.json()["id"])
+        client.put(f"/api/tasks/{ids[1]}", json={"completed": True}, headers=auth_headers)
+        return ids
+
+    def test_filter_by_priority_and_completion(self, auth_headers, mixed_tasks):
+        """Test combining the priority and completed filters"""
+        response = client.get(
+            "/api/tasks/", params={"priority": "high", "completed": "false"}, headers=auth_headers
+        )
+        assert response.status_code == 200
+        assert [task["title"] for task in response.json()] == ["Old high"]
+
+    def test_filter_by_due_date_range(self, auth_headers, mixed_tasks):
+        """Test the due_before and due_after filters"""
+        response = client.get(
+            "/api/tasks/",
+            params={"due_after": "2025-01-01T00:00:00", "due_before": "2030-03-01T00:00:00"},
+            headers=auth_headers
+        )
+        assert response.status_code == 200
+        assert [task["title"] for task in response.json()] == ["Future high"]
+
+    def test_sort_descending_with_pagination(self, auth_headers, mixed_tasks):
+        """Test descending sort across pages"""
+        first = client.get("/api/tasks/", params={"sort": "-due_date", "limit": 2}, headers=auth_headers)
+        assert first.status_code == 200
+        assert [task["title"] for task in first.json()] == ["Future low", "Future high"]
+
+        second = client.get(
+            "/api/tasks/",
+            params={"sort": "-due_date", "limit": 2, "cursor": first.headers["X-Next-Cursor"]},
+            headers=auth_headers
+        )
+        assert [task["title"] for task in second.json()] == ["Old high"]
+        assert "X-Next-Cursor" not in second.headers
+
+    def test_cursor_rejected_for_different_sort(self, auth_headers, mixed_tasks):
+        """Test that a cursor cannot be reused with another sort order"""
+        first = client.get("/api/tasks/", params={"limit": 1}, headers=auth_headers)
+        response = client.get(
+            "/api/tasks/",
+            params={"sort": "created_at", "limit": 1, "cursor": first.headers["X-Next-Cursor"]},
+            headers=auth_headers
+        )
+        assert response.status_code == 400
+
+    def test_invalid_sort_key(self, auth_headers):
+        """Test that an unknown sort key is rejected"""
+        response = client.get("/api/tasks/", params={"sort": "title"}, headers=auth_headers)
+        assert response.status_code == 400
+
+
+class TestTaskTags:
+    """Test suite for tag filters and tag counts"""
+
+    @pytest.fixture
+    def auth_headers(self, make_auth_headers):
+        """Get authentication headers for testing"""
+        return make_auth_headers("taguser")
+
+    @pytest.fixture
+    def tagged_tasks(self, auth_headers):
+        """Create tasks with overlapping tags"""
+        tasks = [
+            {"title": "Deploy", "due_date": "2025-12-01T09:00:00", "tags": ["devops", "urgent"]},
+            {"title": "Monitoring", "due_date": "2025-12-02T09:00:00", "tags": ["devops"]},
+            {"title": "Hotfix", "due_date": "2025-12-03T09:00:00", "tags": ["urgent", "backend"]},
+        ]
+        ids = []
+        for task in tasks:
+            response = client.post("/api/tasks/", json=task, headers=auth_headers)
+            ids.append(response.json()["id"])
+        return ids
+
+    def test_filter_any_tag(self, auth_headers, tagged_tasks):
+        """Test that repeated tag parameters match tasks with any of the tags"""
+        response = client.get("/api/tasks/?tag=devops&tag=backend", headers=auth_headers)
+        assert response.status_code == 200
+        assert {task["title"] for task in response.json()} == {"Deploy", "Monitoring", "Hotfix"}
+
+    def test_filter_all_tags(self, auth_headers, tagged_tasks):
+        """Test that tag_match=all requires every tag"""
+        response = client.get("/api/tasks/?tag=devops&tag=urgent&tag_match=all", headers=auth_headers)
+        assert response.status_code == 200
+        assert [task["title"] for task in response.json()] == ["Deploy"]
+
+    def test_tag_counts_follow_updates_and_deletes(self, auth_headers, tagged_tasks):
+        """Test that tag counts stay in sync with task writes"""
+        client.put(f"/api/tasks/{tagged_tasks[1]}", json={"tags": ["ops"]}, headers=auth_headers)
+        client.delete(f"/api/tasks/{tagged_tasks[2]}", headers=auth_headers)
+
+        response = client.get("/api/tasks/tags", headers=auth_headers)
+        assert response.status_code == 200
+        counts = {item["tag"]: item["count"] for item in response.json()}
+        assert counts == {"devops": 1, "urgent": 1, "ops": 1}
+
+
+class TestBulkTaskOperations:
+    """Test suite for the bulk create, update and delete endpoints"""
+
+    @pytest.fixture
+    def auth_headers(self, make_auth_headers):
+        """Get authentication headers for testing"""
+        return make_auth_headers("bulkuser")
+
+    def test_bulk_create_reports_errors_per_item(self, auth_headers):
+        """Test that invalid items fail alone while the rest are created"""
+        payload = {"tasks": [
+            {"title": "First", "due_date": "2025-12-01T09:00:00", "tags": ["import"]},
+            {"title": "Missing due date"},
+            {"title": "Third", "due_date": "2025-12-03T09:00:00", "priority": "high"},
+        ]}
+        response = client.post("/api/tasks/bulk", json=payload, headers=auth_headers)
+        assert response.status_code == 200
+
+        data = response.json()
+        assert data["succeeded"] == 2
+        assert data["failed"] == 1
+        assert [result["status"] for result in data["results"]] == ["created", "error", "created"]
+
+        tasks = client.get("/api/tasks/", headers=auth_headers).json()
+        assert {task["title"] for task in tasks} == {"First", "Third"}
+        tags = client.get("/api/tasks/tags", headers=auth_headers).json()
+        assert tags == [{"tag": "import", "count": 1}]
+
+    def test_bulk_update_and_delete(self, auth_headers):
+        """Test completing and then deleting several tasks at once"""
+        payload = {"tasks": [
+            {"title": f"Task {i}", "due_date": "2025-12-01T09:00:00"} for i in range(3)
+        ]}
+        created = client.post("/api/tasks/bulk", json=payload, headers=auth_headers).json()
+        ids = [result["id"] for result in created["results"]]
+
+        updates = {"tasks": [{"id": task_id, "completed": True} for task_id in ids] + [{"id": 99999, "completed": True}]}
+        response = client.patch("/api/tasks/bulk", json=updates, headers=auth_headers)
+        assert response.status_code == 200
+        assert response.json()["succeeded"] == 3
+        assert response.json()["results"][3]["status"] == "error"
+        tasks = client.get("/api/tasks/", headers=auth_headers).json()
+        assert all(task["completed"] for task in tasks)
+
+        response = client.request("DELETE", "/api/tasks/bulk", json={"ids": ids[:2] + [99999]}, headers=auth_headers)
+        assert response.status_code == 200
+        assert response.json()["succeeded"] == 2
+        assert response.json()["failed"] == 1
+        assert [task["id"] for task in client.get("/api/tasks/", headers=auth_headers).json()] == [ids[2]]
+
+    def test_bulk_request_size_limit(self, auth_headers):
+        """Test that oversized batches are rejected"""
+        from app.core.config import settings
+        payload = {"ids": list(range(settings.bulk_max_items + 1))}
+        response = client.request("DELETE", "/api/tasks/bulk", json=payload, headers=auth_headers)
+        assert response.status_code == 400
+
+
+class TestFastSerialization:
+    """Test suite for the orjson response mode of task reads"""
+
+    @pytest.fixture
+    def auth_headers(self, make_auth_headers):
+        """Get authentication headers for testing"""
+        return make_auth_headers("fastuser")
+
+    def test_fast_mode_matches_validated_responses(self, auth_headers, monkeypatch):
+        """Test that task reads produce identical JSON with fast serialization on"""
+        from app.core.config import settings
+        for i in range(3):
+            client.post(
+                "/api/tasks/",
+                json={
+                    "title": f"Task {i}",
+                    "due_date": f"2025-12-0{i + 1}T09:00:00",
+                    "priority": "high",
+                    "tags": ["a", "b"],
+                    "mini_tasks": {"step": bool(i % 2)}
+                },
+                headers=auth_headers
+            )
+        validated_list = client.get("/api/tasks/", params={"limit": 2}, headers=auth_headers)
+        task_id = validated_list.json()[0]["id"]
+        validated_task = client.get(f"/api/tasks/{task_id}", headers=auth_headers)
+
+        monkeypatch.setattr(settings, "fast_json_responses", True)
+        fast_list = client.get("/api/tasks/", params={"limit": 2}, headers=auth_headers)
+        fast_task = client.get(f"/api/tasks/{task_id}", headers=auth_headers)
+
+        assert fast_list.status_code == 200
+        assert fast_list.json() == validated_list.json()
+        assert fast_list.headers["X-Next-Cursor"] == validated_list.headers["X-Next-Cursor"]
+        assert fast_task.json() == validated_task.json()
+
+
+class TestConditionalRequests:
+    """Test suite for ETag / If-None-Match support on task reads"""
+
+    @pytest.fixture
+    def auth_headers(self, make_auth_headers):
+        """Get authentication headers for testing"""
+        return make_auth_headers("etaguser")
+
+    def test_list_returns_304_until_a_write(self, auth_headers):
+        """Test that the list ETag holds until a task changes"""
+        create_response = client.post(
+            "/api/tasks/", json={"title": "Poll me", "due_date": "2025-12-01T09:00:00"}, headers=auth_headers
+        )
+        task_id = create_response.json()["id"]
+
+        first = client.get("/api/tasks/", headers=auth_headers)
+        etag = first.headers["ETag"]
+        conditional = {**auth_headers, "If-None-Match": etag}
+
+        second = client.get("/api/tasks/", headers=conditional)
+        assert second.status_code == 304
+        assert second.headers["ETag"] == etag
+
+        client.put(f"/api/tasks/{task_id}", json={"completed": True}, headers=auth_headers)
+        third = client.get("/api/tasks/", headers=conditional)
+        assert third.status_code == 200
+        assert third.headers["ETag"] != etag
+
+    def test_single_task_etag(self, auth_headers):
+        """Test conditional reads of a single task"""
+        create_response = client.post(
+            "/api/tasks/", json={"title": "Single", "due_date": "2025-12-01T09:00:00"}, headers=auth_headers
+        )
+        task_id = create_response.json()["id"]
+
+        first = client.get(f"/api/tasks/{task_id}", headers=auth_headers)
+        etag = first.headers["ETag"]
+        assert etag != client.get("/api/tasks/", headers=auth_headers).headers["ETag"]
+
+        response = client.get(f"/api/tasks/{task_id}", headers={**auth_headers, "If-None-Match": etag})
+        assert response.status_code == 304
+
+    def test_etags_are_per_user(self, auth_headers, make_auth_headers):
+        """Test that another user's writes do not invalidate the ETag"""
+        etag = client.get("/api/tasks/", headers=auth_headers).headers["ETag"]
+
+        other_headers = make_auth_headers("otheretaguser")
+        client.post(
+            "/api/tasks/",
+            json={"title": "Elsewhere", "due_date": "2025-12-01T09:00:00"},
+            headers=other_headers
+        )
+
+        response = client.get("/api/tasks/", headers={**auth_headers, "If-None-Match": etag})
+        assert response.status_code == 304
+
+
+class TestDeltaSync:
+    """Test suite for the delta sync endpoint"""
+
+    @pytest.fixture
+    def auth_headers(self, make_auth_headers):
+        """Get authentication headers for testing"""
+        return make_auth_headers("syncuser")
+
+    def _create(self, title, headers):
+        response = client.post(
+            "/api/tasks/", json={"title": title, "due_date": "2025-12-01T09:00:00"}, headers=headers
+        )
+        return response.json()["id"]
+
+    def test_changes_since_token(self, auth_headers):
+        """Test that only writes after the token are returned"""
+        kept = self._create("Kept", auth_headers)
+        edited = self._create("Edited", auth_headers)
+        removed = self._create("Removed", auth_headers)
+
+        full = client.get("/api/tasks/changes", headers=auth_headers)
+        assert full.status_code == 200
+        assert {task["id"] for task in full.json()["changed"]} == {kept, edited, removed}
+        token = full.json()["sync_token"]
+
+        client.put(f"/api/tasks/{edited}", json={"title": "Edited again"}, headers=auth_headers)
+        client.delete(f"/api/tasks/{removed}", headers=auth_headers)
+        added = self._create("Added", auth_headers)
+
+        delta = client.get("/api/tasks/changes", params={"since": token}, headers=auth_headers)
+        assert delta.status_code == 200
+        data = delta.json()
+        assert [task["id"] for task in data["changed"]] == [edited, added]
+        assert data["changed"][0]["title"] == "Edited again"
+        assert data["deleted"] == [removed]
+
+        empty = client.get("/api/tasks/changes", params={"since": data["sync_token"]}, headers=auth_headers)
+        assert empty.json()["changed"] == []
+        assert empty.json()["deleted"] == []
+
+    def test_invalid_sync_token(self, auth_headers):
+        """Test that malformed or foreign sync tokens are rejected"""
+        assert client.get("/api/tasks/changes", params={"since": "abc"}, headers=auth_headers).status_code == 400
+        assert client.get("/api/tasks/changes", params={"since": "999"}, headers=auth_headers).status_code == 400
+
+
+    def test_migrated_task_table_never_reuses_ids(self, auth_headers):
+        """Test that a task table from before delta sync is rebuilt with AUTOINCREMENT"""
+        from sqlalchemy import text
+        from app.db.session import engine, create_db_and_tables
+        with engine.begin() as connection:
+            connection.execute(text("DROP TABLE task"))
+            connection.execute(text("DROP TABLE task_fts"))
+            connection.execute(text("""
+                CREATE TABLE task (
+                    id INTEGER NOT NULL PRIMARY KEY, title VARCHAR NOT NULL, description VARCHAR,
+                    due_date DATETIME, completed BOOLEAN NOT NULL, created_at DATETIME NOT NULL,
+                    user_id INTEGER REFERENCES user (id), priority VARCHAR(6), tags VARCHAR, mini_tasks VARCHAR
+                )
+            """))
+            connection.execute(text(
+                "INSERT INTO task (id, title, completed, created_at, user_id) "
+                "VALUES (1, 'Old', 0, '2024-01-01 00:00:00', 1), (2, 'Older', 1, '2024-01-01 00:00:00', 1)"
+            ))
+        create_db_and_tables()
+
+        with engine.connect() as connection:
+            ddl = connection.execute(text("SELECT sql FROM sqlite_master WHERE name = 'task'")).scalar()
+            updated = connection.execute(text("SELECT updated_at FROM task ORDER BY id")).scalars().all()
+        assert "AUTOINCREMENT" in ddl
+        assert updated == ["2024-01-01 00:00:00"] * 2
+
+        newest = self._create("Newest", auth_headers)
+        assert newest == 3
+        client.delete(f"/api/tasks/{newest}", headers=auth_headers)
+        assert self._create("Next", auth_headers) == 4
+        # Indexes and triggers came back with the rebuilt table
+        results = client.get("/api/tasks/search", params={"q": "next"}, headers=auth_headers).json()
+        assert [task["id"] for task in results] == [4]
+
+class TestTaskExport:
+    """Test suite for the streaming task export"""
+
+    @pytest.fixture
+    def auth_headers(self, make_auth_headers):
+        """Get authentication headers for testing"""
+        return make_auth_headers("exportuser")
+
+    @pytest.fixture
+    def many_tasks(self, auth_headers, monkeypatch):
+        """Create more tasks than one export batch holds"""
+        from app.core.config import settings
+        monkeypatch.setattr(settings, "export_batch_size", 2)
+        payload = {"tasks": [
+            {
+                "title": f"Task {i}",
+                "due_date": "2025-12-01T09:00:00",
+                "priority": "low",
+                "tags": ["export"],
+                "mini_tasks": {"step, with comma": True}
+            }
+            for i in range(5)
+        ]}
+        client.post("/api/tasks/bulk", json=payload, headers=auth_headers)
+
+    def test_export_ndjson(self, auth_headers, many_tasks):
+        """Test that NDJSON export yields one task per line"""
+        import json
+        response = client.get("/api/tasks/export", params={"format": "ndjson"}, headers=auth_headers)
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("application/x-ndjson")
+
+        tasks = [json.loads(line) for line in response.text.splitlines()]
+        assert [task["title"] for task in tasks] == [f"Task {i}" for i in range(5)]
+        assert tasks[0]["tags"] == ["export"]
+        assert tasks[0]["mini_tasks"] == {"step, with comma": True}
+
+    def test_export_csv(self, auth_headers, many_tasks):
+        """Test that CSV export has a header row and one row per task"""
+        import csv
+        import io
+        response = client.get("/api/tasks/export", params={"format": "csv"}, headers=auth_headers)
+        assert response.status_code == 200
+        assert "attachment" in response.headers["content-disposition"]
+
+        rows = list(csv.DictReader(io.StringIO(response.text)))
+        assert len(rows) == 5
+        assert rows[0]["priority"] == "low"
+        assert rows[0]["mini_tasks"] == '{"step, with comma": true}'
+
+    def test_export_without_auth(self):
+        """Test that export requires authentication"""
+        response = client.get("/api/tasks/export")
+        assert response.status_code == 401
+
+
+class TestTaskImport:
+    """Test suite for the streaming task import"""
+
+    @pytest.fixture
+    def auth_headers(self, make_auth_headers):
+        """Get authentication headers for testing"""
+        return make_auth_headers("importuser")
+
+    def test_import_sample_tasks_file(self, auth_headers, monkeypatch):
+        """Test importing sample_tasks.json in chunks smaller than the file"""
+        from pathlib import Path
+        from app.core.config import settings
+        monkeypatch.setattr(settings, "import_chunk_size", 2)
+        content = (Path(__file__).parent.parent / "sample_tasks.json").read_bytes()
+
+        response = client.post(
+            "/api/tasks/import",
+            files={"file": ("sample_tasks.json", content, "application/json")},
+            headers=auth_headers
+        )
+        assert response.status_code == 200
+        assert response.json() == {"imported": 5, "failed": 0, "errors": []}
+
+        tasks = client.get("/api/tasks/", headers=auth_headers).json()
+        assert len(tasks) == 5
+        setup = next(task for task in tasks if task["title"] == "Setup CI/CD Pipeline")
+        assert setup["priority"] == "high"
+        assert "devops" in setup["tags"]
+        assert setup["mini_tasks"]["Setup automated testing"] is False
+
+    def test_import_ndjson_reports_bad_records(self, auth_headers):
+        """Test that invalid NDJSON records are reported without stopping the import"""
+        lines = [
+            '{"title": "First", "due_date": "2025-12-01T09:00:00"}',
+            '{"title": "No due date"}',
+            '',
+            'not json',
+            '{"title": "Second", "due_date": "2025-12-02T09:00:00", "tags": ["imported"]}',
+        ]
+        response = client.post(
+            "/api/tasks/import",
+            params={"format": "ndjson"},
+            files={"file": ("tasks.ndjson", "\n".join(lines).encode(), "application/x-ndjson")},
+            headers=auth_headers
+        )
+        assert response.status_code == 200
+        result = response.json()
+        assert result["imported"] == 2
+        assert result["failed"] == 2
+        assert [error["record"] for error in result["errors"]] == [2, 3]
+
+        tags = client.get("/api/tasks/tags", headers=auth_headers).json()
+        assert tags == [{"tag": "imported", "count": 1}]
+
+    def test_import_truncated_json(self, auth_headers):
+        """Test that records before a truncation point are still imported"""
+        content = b'[{"title": "Kept", "due_date": "2025-12-01T09:00:00"}, {"title": "Cut'
+        response = client.post(
+            "/api/tasks/import",
+            files={"file": ("tasks.json", content, "application/json")},
+            headers=auth_headers
+        )
+        assert response.status_code == 200
+        result = response.json()
+        assert result["imported"] == 1
+        assert result["failed"] == 1
+        assert result["errors"][0]["record"] == 2
+
+    def test_malformed_json_stops_without_reading_the_rest(self):
+        """Test that a malformed record does not make the parser buffer the whole file"""
+        import io
+        from app.services.task_import_service import iter_json_records
+        valid = '{"title": "Valid", "due_date": "2025-12-01T09:00:00"}, '
+        stream = io.StringIO('[{"title": "Kept"}, {"title": oops}, ' + valid * 10000 + ']')
+
+        records = list(iter_json_records(stream, read_size=1024))
+        assert [(number, error is None) for number, _, error in records] == [(1, True), (2, False)]
+        assert stream.tell() == 1024
+
+
+class TestTaskSearch:
+    """Test suite for full-text task search"""
+
+    @pytest.fixture
+    def auth_headers(self, make_auth_headers):
+        """Get authentication headers for testing"""
+        return make_auth_headers("searchuser")
+
+    @pytest.fixture
+    def tasks(self, auth_headers):
+        """Create tasks with searchable text in different fields"""
+        payload = {"tasks": [
+            {
+                "title": "Deploy release",
+                "description": "Roll out the <new> billing service",
+                "due_date": "2025-12-01T09:00:00",
+                "tags": ["ops"],
+                "mini_tasks": {"Notify support": False}
+            },
+            {
+                "title": "Write billing docs",
+                "due_date": "2025-12-02T09:00:00",
+                "tags": ["docs"]
+            },
+            {
+                "title": "Plan sprint",
+                "due_date": "2025-12-03T09:00:00",
+                "mini_tasks": {"Review backlog": False}
+            },
+        ]}
+        response = client.post("/api/tasks/bulk", json=payload, headers=auth_headers)
+        return [result["id"] for result in response.json()["results"]]
+
+    def test_search_ranks_title_matches_first(self, auth_headers, tasks):
+        """Test that a title match outranks a description match"""
+        response = client.get("/api/tasks/search", params={"q": "billing"}, headers=auth_headers)
+        assert response.status_code == 200
+        results = response.json()
+        assert [task["title"] for task in results] == ["Write billing docs", "Deploy release"]
+        assert "<mark>billing</mark>" in results[0]["snippet"]
+        # Task text is escaped before highlighting
+        assert "&lt;new&gt; <mark>billing</mark>" in results[1]["snippet"]
+
+    def test_search_subtasks_tags_and_prefixes(self, auth_headers, tasks):
+        """Test matching sub-task names, tags and word prefixes"""
+        response = client.get("/api/tasks/search", params={"q": "backl"}, headers=auth_headers)
+        assert [task["id"] for task in response.json()] == [tasks[2]]
+
+        response = client.get("/api/tasks/search", params={"q": "ops notify"}, headers=auth_headers)
+        assert [task["id"] for task in response.json()] == [tasks[0]]
+
+    def test_search_follows_updates_and_deletes(self, auth_headers, tasks):
+        """Test that the index tracks task updates and deletions"""
+        client.put(f"/api/tasks/{tasks[2]}", json={"title": "Plan roadmap"}, headers=auth_headers)
+        response = client.get("/api/tasks/search", params={"q": "roadmap"}, headers=auth_headers)
+        assert [task["id"] for task in response.json()] == [tasks[2]]
+
+        client.delete(f"/api/tasks/{tasks[2]}", headers=auth_headers)
+        response = client.get("/api/tasks/search", params={"q": "roadmap"}, headers=auth_headers)
+        assert response.json() == []
+
+    def test_search_pagination_and_isolation(self, auth_headers, tasks, make_auth_headers):
+        """Test limit/offset and that other users' tasks are never returned"""
+        response = client.get("/api/tasks/search", params={"q": "billing", "limit": 1, "offset": 1}, headers=auth_headers)
+        assert [task["title"] for task in response.json()] == ["Deploy release"]
+
+        other_headers = make_auth_headers("othersearcher")
+        response = client.get("/api/tasks/search", params={"q": "billing"}, headers=other_headers)
+        assert response.json() == []
+
+    def test_search_sanitizes_query(self, auth_headers, tasks):
+        """Test that FTS syntax in the query is treated as plain words"""
+        response = client.get("/api/tasks/search", params={"q": 'billing" OR NEAR(*'}, headers=auth_headers)
+        assert response.status_code == 200
+        assert response.json() == []
+
+        response = client.get("/api/tasks/search", params={"q": "**"}, headers=auth_headers)
+        assert response.status_code == 400
+
+
+class TestMiniTaskPatch:
+    """Test suite for incremental mini-task updates"""
+
+    @pytest.fixture
+    def auth_headers(self, make_auth_headers):
+        """Get authentication headers for testing"""
+        return make_auth_headers("minitaskuser")
+
+    @pytest.fixture
+    def task_id(self, auth_headers):
+        """Create a task with a checklist"""
+        task_data = {
+            "title": "Checklist task",
+            "due_date": "2025-12-01T09:00:00",
+            "mini_tasks": {"First": False, "Second": True, "Third": False}
+        }
+        response = client.post("/api/tasks/", json=task_data, headers=auth_headers)
+        return response.json()["id"]
+
+    def patch(self, task_id, operations, headers):
+        return client.patch(f"/api/tasks/{task_id}/mini-tasks", json={"operations": operations}, headers=headers)
+
+    def test_toggle_set_add_remove(self, auth_headers, task_id):
+        """Test applying several operations in one request"""
+        response = self.patch(task_id, [
+            {"op": "toggle", "name": "First"},
+            {"op": "set", "name": "Second", "done": False},
+            {"op": "add", "name": "Fourth, with é and 'quotes'"},
+            {"op": "remove", "name": "Third"},
+        ], auth_headers)
+        assert response.status_code == 200
+        assert response.json()["mini_tasks"] == {
+            "First": True, "Second": False, "Fourth, with é and 'quotes'": False
+        }
+
+        task = client.get(f"/api/tasks/{task_id}", headers=auth_headers).json()
+        assert task["mini_tasks"] == response.json()["mini_tasks"]
+
+    def test_rename_keeps_position(self, auth_headers, task_id):
+        """Test that a renamed mini-task keeps its place and state"""
+        response = self.patch(task_id, [{"op": "rename", "name": "Second", "new_name": "Middle"}], auth_headers)
+        assert response.status_code == 200
+        assert list(response.json()["mini_tasks"].items()) == [("First", False), ("Middle", True), ("Third", False)]
+
+    def test_failed_operation_rolls_back(self, auth_headers, task_id):
+        """Test that no operation is saved when one of them does not apply"""
+        response = self.patch(task_id, [
+            {"op": "toggle", "name": "First"},
+            {"op": "toggle", "name": "Missing"},
+        ], auth_headers)
+        assert response.status_code == 400
+        assert "Missing" in response.json()["detail"]
+
+        response = self.patch(task_id, [{"op": "rename", "name": "First", "new_name": "Third"}], auth_headers)
+        assert response.status_code == 400
+        assert "already exists" in response.json()["detail"]
+
+        task = client.get(f"/api/tasks/{task_id}", headers=auth_headers).json()
+        assert task["mini_tasks"] == {"First": False, "Second": True, "Third": False}
+
+    def test_remove_last_and_add_to_empty(self, auth_headers, task_id):
+        """Test emptying a checklist and starting a new one"""
+        response = self.patch(task_id, [
+            {"op": "remove", "name": name} for name in ("First", "Second", "Third")
+        ], auth_headers)
+        assert response.json()["mini_tasks"] is None
+
+        response = self.patch(task_id, [{"op": "add", "name": "Fresh", "done": True}], auth_headers)
+        assert response.json()["mini_tasks"] == {"Fresh": True}
+
+    def test_names_are_matched_as_stored(self, auth_headers):
+        """Test mini-tasks created with non-ASCII, quote and backslash names"""
+        task_data = {
+            "title": "Accented checklist",
+            "due_date": "2025-12-01T09:00:00",
+            "mini_tasks": {"Café": False, "ü": True, 'Say "hi"': False, "C:\\temp": False}
+        }
+        task_id = client.post("/api/tasks/", json=task_data, headers=auth_headers).json()["id"]
+
+        response = self.patch(task_id, [
+            {"op": "toggle", "name": "Café"},
+            {"op": "set", "name": "ü", "done": False},
+            {"op": "rename", "name": 'Say "hi"', "new_name": "Crème brûlée"},
+            {"op": "remove", "name": "C:\\temp"},
+        ], auth_headers)
+        assert response.status_code == 200
+        assert list(response.json()["mini_tasks"].items()) == [
+            ("Café", True), ("ü", False), ("Crème brûlée", False)
+        ]
+
+        response = self.patch(task_id, [{"op": "add", "name": "Café"}], auth_headers)
+        assert response.status_code == 400
+        assert "already exists" in response.json()["detail"]
+
+        stats = client.get("/api/tasks/stats", headers=auth_headers).json()
+        assert stats["subtasks_total"] == 3
+        assert stats["subtasks_completed"] == 1
+
+    def test_invalid_requests(self, auth_headers, task_id):
+        """Test validation errors and missing tasks"""
+        response = self.patch(task_id, [{"op": "add", "name": "   "}], auth_headers)
+        assert response.status_code == 400
+        response = self.patch(task_id, [{"op": "rename", "name": "First"}], auth_headers)
+        assert response.status_code == 400
+        response = self.patch(99999, [{"op": "toggle", "name": "First"}], auth_headers)
+        assert response.status_code == 404
+
+
+class TestTaskStats:
+    """Test suite for SQL-aggregated task statistics"""
+
+    @pytest.fixture
+    def auth_headers(self, make_auth_headers):
+        """Get authentication headers for testing"""
+        return make_auth_headers("statsuser")
+
+    def test_stats_for_new_user(self, auth_headers):
+        """Test that a user without tasks gets zeroed stats"""
+        response = client.get("/api/tasks/stats", headers=auth_headers)
+        assert response.status_code == 200
+        stats = response.json()
+        assert stats["total"] == 0
+        assert stats["completion_rate"] == 0
+        assert stats["by_priority"] == {"low": 0, "medium": 0, "high": 0, "none": 0}
+        assert stats["tags"] == []
+
+    def test_stats_counts(self, auth_headers):
+        """Test counts by status, priority and tag, due dates and mini-tasks"""
+        from datetime import datetime, timedelta
+        now = datetime.utcnow()
+        payload = {"tasks": [
+            {"title": "Overdue", "due_date": (now - timedelta(days=3)).isoformat(), "priority": "high",
+             "tags": ["work"], "mini_tasks": {"a": True, "b": False}},
+            {"title": "Soon", "due_date": (now + timedelta(minutes=5)).isoformat(), "priority": "high",
+             "tags": ["work", "urgent"]},
+            {"title": "Done", "due_date": (now - timedelta(days=1)).isoformat(), "priority": "low",
+             "mini_tasks": {"c": True, "d": True}},
+            {"title": "Later", "due_date": (now + timedelta(days=30)).isoformat()},
+        ]}
+        ids = [r["id"] for r in client.post("/api/tasks/bulk", json=payload, headers=auth_headers).json()["results"]]
+        client.put(f"/api/tasks/{ids[2]}", json={"completed": True}, headers=auth_headers)
+
+        stats = client.get("/api/tasks/stats", headers=auth_headers).json()
+        assert stats["total"] == 4
+        assert stats["completed"] == 1
+        assert stats["pending"] == 3
+        assert stats["completion_rate"] == 25.0
+        assert stats["overdue"] == 1
+        assert stats["due_this_week"] == 1
+        assert stats["high_priority_pending"] == 2
+        assert stats["by_priority"] == {"low": 1, "medium": 0, "high": 2, "none": 1}
+        assert stats["subtasks_total"] == 4
+        assert stats["subtasks_completed"] == 3
+        assert stats["subtask_completion_rate"] == 75.0
+        assert stats["tags"] == [{"tag": "work", "count": 2}, {"tag": "urgent", "count": 1}]
+
+
+class TestTaskCounts:
+    """Test suite for the per-user task counters"""
+
+    @pytest.fixture
+    def auth_headers(self, make_auth_headers):
+        """Get authentication headers for testing"""
+        return make_auth_headers("countsuser")
+
+    def test_counters_follow_writes(self, auth_headers):
+        """Test that creates, bulk writes, updates and deletes keep counters exact"""
+        response = client.get("/api/tasks/counts", headers=auth_headers)
+        assert response.status_code == 200
+        assert response.json()["total"] == 0
+
+        single = client.post("/api/tasks/", json={
+            "title": "Single", "due_date": "2025-12-01T09:00:00", "priority": "high"
+        }, headers=auth_headers).json()["id"]
+        bulk = client.post("/api/tasks/bulk", json={"tasks": [
+            {"title": "Bulk 1", "due_date": "2025-12-01T09:00:00", "priority": "high"},
+            {"title": "Bulk 2", "due_date": "2025-12-01T09:00:00", "priority": "low"},
+            {"title": "Bulk 3", "due_date": "2025-12-01T09:00:00"},
+        ]}, headers=auth_headers).json()["results"]
+
+        client.put(f"/api/tasks/{single}", json={"completed": True}, headers=auth_headers)
+        client.put(f"/api/tasks/{bulk[1]['id']}", json={"priority": "medium"}, headers=auth_headers)
+        client.delete(f"/api/tasks/{bulk[2]['id']}", headers=auth_headers)
+
+        counts = client.get("/api/tasks/counts", headers=auth_headers).json()
+        assert counts == {
+            "total": 3,
+            "completed": 1,
+            "pending": 2,
+            "completion_rate": 33.3,
+            "high_priority_pending": 1,
+            "by_priority": {"low": 0, "medium": 1, "high": 2, "none": 0},
+        }
+
+        stats = client.get("/api/tasks/stats", headers=auth_headers).json()
+        assert {key: stats[key] for key in counts} == counts
+
+    def test_reconcile_fixes_drift(self, auth_headers):
+        """Test that the reconciliation job rewrites drifted counters"""
+        from sqlalchemy import text
+        from app.db.session import engine
+        from app.jobs.task_stats import reconcile_task_stats_job
+
+        client.post("/api/tasks/", json={"title": "Task", "due_date": "2025-12-01T09:00:00"}, headers=auth_headers)
+        assert reconcile_task_stats_job() == 0
+
+        with engine.begin() as connection:
+            connection.execute(text("UPDATE user_task_stats SET total = 42, completed = 7"))
+        assert reconcile_task_stats_job() == 1
+
+        counts = client.get("/api/tasks/counts", headers=auth_headers).json()
+        assert counts["total"] == 1
+        assert counts["completed"] == 0
+
+
+class TestDatabaseTuning:
+    """Test suite for the SQLite connection settings"""
+
+    def test_sync_connections_use_wal(self):
+        """Test that new sync connections get the configured pragmas"""
+        from sqlalchemy import text
+        from app.db.session import engine
+
+        with engine.connect() as connection:
+            assert connection.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+            assert connection.execute(text("PRAGMA synchronous")).scalar() == 1  # NORMAL
+            assert connection.execute(text("PRAGMA busy_timeout")).scalar() == 5000
+            assert connection.execute(text("PRAGMA temp_store")).scalar() == 2  # MEMORY
+
+    def test_async_connections_use_wal(self):
+        """Test that async connections get the same pragmas"""
+        import asyncio
+        from sqlalchemy import text
+        from app.db.session import async_engine
+
+        async def read_pragmas():
+            async with async_engine.connect() as connection:
+                journal_mode = (await connection.execute(text("PRAGMA journal_mode"))).scalar()
+                busy_timeout = (await connection.execute(text("PRAGMA busy_timeout"))).scalar()
+                return journal_mode, busy_timeout
+
+        assert asyncio.run(read_pragmas()) == ("wal", 5000)
+
+    def test_async_connections_are_pooled_and_tuned(self, monkeypatch):
+        """Test that the async engine reuses connections, which keep their cache and mmap settings"""
+        import asyncio
+        from sqlalchemy import event, text
+        from app.core.config import settings
+        from app.db import session as db_session
+        opened = []
+
+        # The suite runs with DB_ASYNC_NULL_POOL; build the engine a server gets
+        monkeypatch.setattr(settings, "db_async_null_pool", False)
+        async_engine = db_session._create_async_engine(db_session.async_database_url)
+
+        async def connect_twice():
+            try:
+                for _ in range(2):
+                    async with async_engine.connect() as connection:
+                        cache_size = (await connection.execute(text("PRAGMA cache_size"))).scalar()
+                        mmap_size = (await connection.execute(text("PRAGMA mmap_size"))).scalar()
+                return cache_size, mmap_size
+            finally:
+                await async_engine.dispose()
+
+        def count(dbapi_connection, connection_record):
+            opened.append(dbapi_connection)
+
+        event.listen(async_engine.sync_engine, "connect", count)
+        assert asyncio.run(connect_twice()) == (settings.sqlite_cache_size, settings.sqlite_mmap_size)
+        assert async_engine.pool.size() == settings.db_pool_size
+        assert len(opened) == 1
+
+
+class TestAsyncTaskService:
+    """Test suite for the task service on the async session stack"""
+
+    def test_writes_and_reads_through_async_sessions(self):
+        """Test a task round trip through AsyncTaskService outside the API"""
+        import asyncio
+        from datetime import datetime
+        from app.db.session import get_async_session, get_async_read_session
+        from app.services.async_task_service import AsyncTaskService
+
+        user = {"username": "asyncuser", "password": "asyncpassword123"}
+        user_id = client.post("/api/users/register", json=user).json()["id"]
+
+        async def round_trip():
+            async for session in get_async_session():
+                service = AsyncTaskService(session)
+                created = await service.create_task(
+                    user_id, "Async task", due_date=datetime(2025, 12, 1, 9), mini_tasks={"Step": False}
+                )
+                await service.update_task(created.id, user_id, title="Async task, renamed")
+            async for session in get_async_read_session():
+                service = AsyncTaskService(session)
+                tasks = await service.get_all_tasks(user_id)
+                changes = await service.get_changes(user_id)
+            return created, tasks, changes
+
+        created, tasks, changes = asyncio.run(round_trip())
+        assert [task.title for task in tasks] == ["Async task, renamed"]
+        assert tasks[0].id == created.id
+        assert tasks[0].mini_tasks == {"Step": False}
+        assert [task.id for task in changes.changed] == [created.id]
+
+
+class TestReadReplicas:
+    """Test suite for read/write session routing"""
+
+    @pytest.fixture
+    def auth_headers(self, make_auth_headers):
+        """Get authentication headers for testing"""
+        return make_auth_headers("replicauser")
+
+    @pytest.fixture
+    def snapshot_replica(self, monkeypatch, tmp_path):
+        """Route reads to a replica file; returns a function that copies the primary into it"""
+        from app.db import session as db_session
+        url = f"sqlite:///{tmp_path / 'replica.db'}"
+        replica = db_session._create_engine(url)
+        async_replica = db_session._create_async_engine(db_session.get_async_url(url))
+        monkeypatch.setattr(db_session, "replica_engines", [replica])
+        monkeypatch.setattr(db_session, "async_replica_engines", [async_replica])
+
+        def snapshot():
+            with db_session.engine.connect() as source, replica.connect() as target:
+                source.connection.driver_connection.backup(target.connection.driver_connection)
+
+        yield snapshot
+        replica.dispose()
+
+    def titles(self, headers):
+        response = client.get("/api/tasks/", headers=headers)
+        assert response.status_code == 200
+        return sorted(task["title"] for task in response.json())
+
+    def test_reads_use_replica_except_after_writes(self, auth_headers, snapshot_replica, monkeypatch):
+        """Test that reads hit the replica, but see the primary right after a write"""
+        from app.core.config import settings
+        task = {"due_date": "2025-12-01T09:00:00"}
+        client.post("/api/tasks/", json={**task, "title": "Replicated"}, headers=auth_headers)
+        snapshot_replica()
+        client.post("/api/tasks/", json={**task, "title": "Not replicated yet"}, headers=auth_headers)
+
+        # Within the read-your-writes window reads go to the primary
+        monkeypatch.setattr(settings, "read_your_writes_seconds", 60)
+        assert self.titles(auth_headers) == ["Not replicated yet", "Replicated"]
+
+        # Afterwards they go to the replica, which lags behind
+        monkeypatch.setattr(settings, "read_your_writes_seconds", 0)
+        assert self.titles(auth_headers) == ["Replicated"]
+
+        snapshot_replica()
+        assert self.titles(auth_headers) == ["Not replicated yet", "Replicated"]
+
+
+    def test_changes_fall_back_to_primary_for_newer_tokens(self, auth_headers, snapshot_replica, monkeypatch):
+        """Test that a sync token from the primary is not rejected by a lagging replica"""
+        from app.core.config import settings
+        task = {"due_date": "2025-12-01T09:00:00"}
+        client.post("/api/tasks/", json={**task, "title": "Replicated"}, headers=auth_headers)
+        snapshot_replica()
+        client.post("/api/tasks/", json={**task, "title": "Not replicated yet"}, headers=auth_headers)
+
+        monkeypatch.setattr(settings, "read_your_writes_seconds", 60)
+        token = client.get("/api/tasks/changes", headers=auth_headers).json()["sync_token"]
+        added = client.post("/api/tasks/", json={**task, "title": "Added later"}, headers=auth_headers).json()["id"]
+
+        monkeypatch.setattr(settings, "read_your_writes_seconds", 0)
+        response = client.get("/api/tasks/changes", params={"since": token}, headers=auth_headers)
+        assert response.status_code == 200
+        assert [changed["id"] for changed in response.json()["changed"]] == [added]
+        assert int(response.json()["sync_token"]) > int(token)
+
+    def test_session_reads_from_one_replica(self):
+        """Test that every read of a session goes to the same replica"""
+        from sqlmodel import select
+        from app.db.session import RoutingSession, engine
+        from app.models.task_model import Task
+        replicas = [object() for _ in range(5)]
+
+        for _ in range(10):
+            with RoutingSession(engine, info={"replicas": replicas}) as session:
+                binds = {id(session.get_bind(clause=select(Task))) for _ in range(10)}
+                assert len(binds) == 1
+                assert session.info["replica"] in replicas
+
+class TestTaskArchive:
+    """Test suite for archiving completed tasks"""
+
+    @pytest.fixture
+    def auth_headers(self, make_auth_headers):
+        """Get authentication headers for testing"""
+        return make_auth_headers("archiveuser")
+
+    def create_tasks(self, headers, titles, completed_days_ago=None):
+        """Create completed tasks, last updated the given number of days ago"""
+        from sqlalchemy import text
+        from app.db.session import engine
+        payload = {"tasks": [
+            {"title": title, "due_date": "2025-12-01T09:00:00", "tags": ["archived-tag"]} for title in titles
+        ]}
+        ids = [r["id"] for r in client.post("/api/tasks/bulk", json=payload, headers=headers).json()["results"]]
+        if completed_days_ago is not None:
+            client.patch("/api/tasks/bulk", json={"tasks": [{"id": i, "completed": True} for i in ids]}, headers=headers)
+            with engine.begin() as connection:
+                connection.execute(
+                    text(f"UPDATE task SET updated_at = datetime('now', '-{completed_days_ago} days') WHERE id IN ({','.join(map(str, ids))})")
+                )
+        return ids
+
+    def test_archive_and_restore_on_update(self, auth_headers):
+        """Test that old completed tasks move to the archive and come back when updated"""
+        from app.jobs.archive import archive_tasks_job
+        old = self.create_tasks(auth_headers, ["Old done"], completed_days_ago=40)[0]
+        recent = self.create_tasks(auth_headers, ["Recent done"], completed_days_ago=1)[0]
+        pending = self.create_tasks(auth_headers, ["Pending"])[0]
+        token = client.get("/api/tasks/changes", headers=auth_headers).json()["sync_token"]
+
+        assert archive_tasks_job() == 1
+        active = client.get("/api/tasks/", headers=auth_headers).json()
+        assert sorted(task["id"] for task in active) == sorted([recent, pending])
+        assert client.get(f"/api/tasks/{old}", headers=auth_headers).status_code == 404
+        assert client.get("/api/tasks/counts", headers=auth_headers).json()["total"] == 2
+        changes = client.get("/api/tasks/changes", params={"since": token}, headers=auth_headers).json()
+        assert changes["deleted"] == [old]
+
+        archived = client.get("/api/tasks/archive", headers=auth_headers).json()
+        assert [task["id"] for task in archived] == [old]
+        assert archived[0]["title"] == "Old done"
+        assert archived[0]["tags"] == ["archived-tag"]
+        assert archived[0]["archived_at"]
+
+        # Updating the archived task restores it transparently
+        token = changes["sync_token"]
+        response = client.put(f"/api/tasks/{old}", json={"completed": False}, headers=auth_headers)
+        assert response.status_code == 200
+        assert response.json()["completed"] is False
+        assert client.get("/api/tasks/archive", headers=auth_headers).json() == []
+        assert client.get(f"/api/tasks/{old}", headers=auth_headers).status_code == 200
+        assert client.get("/api/tasks/tags", headers=auth_headers).json() == [{"tag": "archived-tag", "count": 3}]
+        changes = client.get("/api/tasks/changes", params={"since": token}, headers=auth_headers).json()
+        assert [task["id"] for task in changes["changed"]] == [old]
+        assert changes["deleted"] == []
+
+    def test_archive_pagination_and_delete(self, auth_headers):
+        """Test paging through the archive and deleting archived tasks"""
+        from app.jobs.archive import archive_tasks_job
+        ids = self.create_tasks(auth_headers, ["One", "Two", "Three"], completed_days_ago=60)
+        assert archive_tasks_job() == 3
+
+        response = client.get("/api/tasks/archive", params={"limit": 2}, headers=auth_headers)
+        assert [task["id"] for task in response.json()] == [ids[2], ids[1]]
+        cursor = response.headers["X-Next-Cursor"]
+        response = client.get("/api/tasks/archive", params={"limit": 2, "cursor": cursor}, headers=auth_headers)
+        assert [task["id"] for task in response.json()] == [ids[0]]
+        assert "X-Next-Cursor" not in response.headers
+        assert client.get("/api/tasks/archive", params={"cursor": "abc"}, headers=auth_headers).status_code == 400
+
+        assert client.delete(f"/api/tasks/{ids[0]}", headers=auth_headers).status_code == 204
+        assert len(client.get("/api/tasks/archive", headers=auth_headers).json()) == 2
+
+    def test_archived_id_reused_by_live_task(self, auth_headers):
+        """Test that an id shared by an archived and a live task (legacy tables) never loses the archived one"""
+        from datetime import datetime, timedelta
+        from sqlalchemy import insert
+        from app.db.session import engine
+        from app.jobs.archive import archive_tasks_job
+        from app.models.task_model import Task
+        archived = self.create_tasks(auth_headers, ["Archived"], completed_days_ago=40)[0]
+        assert archive_tasks_job() == 1
+        # What a task table without AUTOINCREMENT did: hand the id out again
+        long_ago = datetime.utcnow() - timedelta(days=40)
+        with engine.begin() as connection:
+            connection.execute(insert(Task.__table__).values(
+                id=archived, title="Reused", completed=True, due_date=long_ago,
+                created_at=long_ago, updated_at=long_ago, user_id=1
+            ))
+
+        # The live task stays put rather than clashing with the archived row
+        assert archive_tasks_job() == 0
+        response = client.put(f"/api/tasks/{archived}", json={"title": "Reused again"}, headers=auth_headers)
+        assert response.json()["title"] == "Reused again"
+
+        assert client.delete(f"/api/tasks/{archived}", headers=auth_headers).status_code == 204
+        assert [task["title"] for task in client.get("/api/tasks/archive", headers=auth_headers).json()] == ["Archived"]
+        # With the live task gone, the archived one can be restored
+        response = client.put(f"/api/tasks/{archived}", json={"completed": False}, headers=auth_headers)
+        assert response.json()["title"] == "Archived"
+
+    def test_migrated_tasks_are_archived(self, auth_headers):
+        """Test that tasks written before updated_at existed are archived once migrated"""
+        from sqlalchemy import text
+        from app.db.session import engine, create_db_and_tables
+        from app.jobs.archive import archive_tasks_job
+        ids = self.create_tasks(auth_headers, ["Legacy"], completed_days_ago=40)
+        with engine.begin() as connection:
+            connection.execute(text(
+                f"UPDATE task SET updated_at = NULL, created_at = datetime('now', '-90 days') WHERE id = {ids[0]}"
+            ))
+        create_db_and_tables()
+        assert archive_tasks_job() == 1
+
+
+class TestIdempotencyKeys:
+    """Test suite for Idempotency-Key handling on writes"""
+
+    @pytest.fixture
+    def auth_headers(self, make_auth_headers):
+        """Get authentication headers for testing"""
+        return make_auth_headers("idempotentuser")
+
+    def test_retried_create_is_replayed(self, auth_headers):
+        """Test that a retried create returns the first response without a duplicate"""
+        headers = {**auth_headers, "Idempotency-Key": "create-1"}
+        task_data = {"title": "Once", "due_date": "2025-12-01T09:00:00"}
+
+        first = client.post("/api/tasks/", json=task_data, headers=headers)
+        assert first.status_code == 201
+        retry = client.post("/api/tasks/", json=task_data, headers=headers)
+        assert retry.status_code == 201
+        assert retry.json() == first.json()
+        assert retry.headers["Idempotent-Replayed"] == "true"
+        assert len(client.get("/api/tasks/", headers=auth_headers).json()) == 1
+
+        # Without a key every request is a new write
+        client.post("/api/tasks/", json=task_data, headers=auth_headers)
+        assert len(client.get("/api/tasks/", headers=auth_headers).json()) == 2
+
+    def test_key_reused_for_different_request(self, auth_headers):
+        """Test that a key cannot be reused with another payload"""
+        headers = {**auth_headers, "Idempotency-Key": "reused"}
+        client.post("/api/tasks/", json={"title": "A", "due_date": "2025-12-01T09:00:00"}, headers=headers)
+        response = client.post("/api/tasks/", json={"title": "B", "due_date": "2025-12-01T09:00:00"}, headers=headers)
+        assert response.status_code == 422
+
+    def test_failed_request_can_be_retried(self, auth_headers):
+        """Test that errors are not stored, so a corrected retry runs"""
+        headers = {**auth_headers, "Idempotency-Key": "update-1"}
+        response = client.put("/api/tasks/99999", json={"title": "Missing"}, headers=headers)
+        assert response.status_code == 404
+
+        task_id = client.post("/api/tasks/", json={"title": "Task", "due_date": "2025-12-01T09:00:00"}, headers=auth_headers).json()["id"]
+        headers["Idempotency-Key"] = "update-2"
+        first = client.put(f"/api/tasks/{task_id}", json={"title": "Renamed"}, headers=headers)
+        client.put(f"/api/tasks/{task_id}", json={"title": "Changed again"}, headers=auth_headers)
+        retry = client.put(f"/api/tasks/{task_id}", json={"title": "Renamed"}, headers=headers)
+        assert retry.json() == first.json()
+        assert client.get(f"/api/tasks/{task_id}", headers=auth_headers).json()["title"] == "Changed again"
+
+    def test_committed_write_is_not_repeated_when_response_is_lost(self, auth_headers, monkeypatch):
+        """Test that a write whose response could not be stored is not run again on retry"""
+        from app.repositories import idempotency_repository
+        headers = {**auth_headers, "Idempotency-Key": "lost-response"}
+        task_data = {"title": "Once", "due_date": "2025-12-01T09:00:00"}
+
+        async def fail(*args, **kwargs):
+            raise RuntimeError("database is locked")
+
+        monkeypatch.setattr(idempotency_repository, "complete_key", fail)
+        assert client.post("/api/tasks/", json=task_data, headers=headers).status_code == 500
+        monkeypatch.undo()
+
+        assert client.post("/api/tasks/", json=task_data, headers=headers).status_code == 409
+        assert len(client.get("/api/tasks/", headers=auth_headers).json()) == 1
+
+    def test_bulk_create_and_expiry(self, auth_headers, monkeypatch):
+        """Test replay of bulk writes and that expired keys run again"""
+        from app.core.config import settings
+        from app.jobs.idempotency import purge_idempotency_keys_job
+        headers = {**auth_headers, "Idempotency-Key": "bulk-1"}
+        payload = {"tasks": [{"title": "Bulk", "due_date": "2025-12-01T09:00:00"}]}
+
+        first = client.post("/api/tasks/bulk", json=payload, headers=headers)
+        assert client.post("/api/tasks/bulk", json=payload, headers=headers).json() == first.json()
+        assert len(client.get("/api/tasks/", headers=auth_headers).json()) == 1
+
+        monkeypatch.setattr(settings, "idempotency_ttl_seconds", -1)
+        client.post("/api/tasks/bulk", json=payload, headers={**auth_headers, "Idempotency-Key": "bulk-2"})
+        assert purge_idempotency_keys_job() == 1
+        client.post("/api/tasks/bulk", json=payload, headers={**auth_headers, "Idempotency-Key": "bulk-2"})
+        assert len(client.get("/api/tasks/", headers=auth_headers).json()) == 3